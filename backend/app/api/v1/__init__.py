@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from . import expenses, income, budget, auth, users, categories, rates, analytics, reports, websocket, transactions, recurring, debts, ai_analytics, onboarding, export, gamification, goals, admin
+from . import expenses, income, budget, auth, users, categories, rates, analytics, reports, websocket, transactions, recurring, debts, ai_analytics, onboarding, export, gamification, goals, admin, sync
 
 router = APIRouter()
 
@@ -17,6 +17,7 @@ router.include_router(debts.router, tags=["Debts"])
 router.include_router(goals.router, prefix="/goals", tags=["Savings Goals"])
 router.include_router(ai_analytics.router, tags=["AI Analytics"])
 router.include_router(transactions.router, tags=["Transactions"])
+router.include_router(sync.router, prefix="/sync", tags=["Sync"])
 router.include_router(expenses.router, prefix="/expenses", tags=["Expenses"])
 router.include_router(income.router, prefix="/income", tags=["Income"])
 router.include_router(budget.router, prefix="/budget", tags=["Budget"])
@@ -1,14 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, text
+from datetime import date, datetime, timedelta, timezone
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 
 from ...database import get_db
-from ...models import User, Expense, Income
-from ...schemas import User as UserSchema
+from ...models import User
+from ...schemas import User as UserSchema, AdminUserPage
 from ...utils.auth import get_current_user
+from ...services.admin_metrics import admin_metrics
+from ...services.slow_queries import slow_query_log
+from ...services.websocket import ws_manager
+from ...services.user_directory import USER_NAME_EXPR, UserDirectoryService, name_pattern, parse_includes
 
 router = APIRouter()
 
@@ -37,16 +41,35 @@ async def get_users(
     query = select(User).order_by(User.user_id.desc()).limit(limit).offset(offset)
     
     if search:
-        search_term = f"%{search}%"
+        # То же выражение, что и у триграммного индекса idx_users_name_trgm
         query = query.where(
-            (User.username.ilike(search_term)) | 
-            (User.first_name.ilike(search_term)) |
-            (User.last_name.ilike(search_term))
+            text(f"{USER_NAME_EXPR} LIKE :pattern ESCAPE '\\'").bindparams(pattern=name_pattern(search))
         )
         
     result = await db.execute(query)
     return result.scalars().all()
 
+@router.get("/directory", response_model=AdminUserPage)
+async def get_user_directory(
+    search: Optional[str] = Query(None, description="Имя, username, user_id или telegram_chat_id"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[int] = Query(None, description="next_cursor предыдущей страницы"),
+    include: Optional[str] = Query(None, description="Доп. поля через запятую: subscription, activity"),
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_current_admin)
+):
+    """
+    Справочник пользователей с keyset-пагинацией (только для админов)
+    """
+    service = UserDirectoryService(db)
+    items, next_cursor = await service.search(
+        search=search,
+        limit=limit,
+        cursor=cursor,
+        include=parse_includes(include)
+    )
+    return {"items": items, "next_cursor": next_cursor, "has_more": next_cursor is not None}
+
 @router.post("/users/{user_id}/subscription")
 async def extend_subscription(
     user_id: int,
@@ -100,68 +123,74 @@ async def extend_subscription(
 
 @router.get("/stats")
 async def get_admin_stats(
+    refresh: bool = False,
     db: AsyncSession = Depends(get_db),
     admin: User = Depends(get_current_admin)
 ):
     """
-    Расширенная статистика для админки
+    Расширенная статистика для админки (снимок кэшируется на минуту)
+    """
+    return await admin_metrics.get_stats(db, refresh=refresh)
+
+@router.get("/stats/daily")
+async def get_admin_daily_stats(
+    days: int = Query(30, ge=1, le=365),
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_current_admin)
+) -> List[Dict[str, Any]]:
+    """
+    Регистрации и активные пользователи по дням
+    """
+    return await admin_metrics.daily_series(db, days=days)
+
+@router.post("/stats/daily/refresh")
+async def refresh_admin_daily_stats(
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_current_admin)
+):
+    """
+    Пересчитать дневные метрики за вчера и сегодня (обычно это делает n8n)
+    """
+    today = date.today()
+    days = [today - timedelta(days=1), today]
+    await admin_metrics.refresh_daily(db, days)
+    return {"status": "success", "days": [d.isoformat() for d in days]}
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(50, ge=1, le=500),
+    plans: bool = Query(True, description="Включить планы EXPLAIN"),
+    admin: User = Depends(get_current_admin)
+):
+    """
+    Медленные SQL-запросы этого процесса: последние записи и сводка по отпечаткам
+    """
+    return slow_query_log.snapshot(limit=limit, with_plans=plans)
+
+@router.post("/slow-queries/reset")
+async def reset_slow_queries(
+    admin: User = Depends(get_current_admin)
+):
+    """
+    Очистить журнал медленных запросов (например, после деплоя)
+    """
+    slow_query_log.clear()
+    return {"status": "success"}
+
+@router.get("/ws/presence/{user_id}")
+async def get_ws_presence(
+    user_id: int,
+    admin: User = Depends(get_current_admin)
+):
+    """
+    Подключен ли пользователь по WebSocket к любому worker (через backplane)
     """
-    now = datetime.now(timezone.utc).replace(tzinfo=None)
-    week_ago = now - timedelta(days=7)
-    month_ago = now - timedelta(days=30)
-    
-    # Общее количество пользователей
-    total_users = await db.scalar(select(func.count(User.user_id)))
-    
-    # Активные подписки (без админов)
-    active_subs = await db.scalar(
-        select(func.count(User.user_id))
-        .where(
-            (User.subscription_expires_at > now) &
-            (User.is_admin == False)
-        )
-    )
-    
-    # Новые пользователи за неделю
-    new_users_week = await db.scalar(
-        select(func.count(User.user_id))
-        .where(User.last_activity >= week_ago)
-    )
-    
-    # Новые пользователи за месяц
-    new_users_month = await db.scalar(
-        select(func.count(User.user_id))
-        .where(User.last_activity >= month_ago)
-    )
-    
-    # Истекшие подписки
-    expired_subs = await db.scalar(
-        select(func.count(User.user_id))
-        .where(
-            (User.subscription_expires_at.isnot(None)) &
-            (User.subscription_expires_at <= now)
-        )
-    )
-    
-    # Админы
-    admin_count = await db.scalar(
-        select(func.count(User.user_id))
-        .where(User.is_admin == True)
-    )
-    
-    # Доход (активные подписки * 300 сом)
-    SUBSCRIPTION_PRICE = 300
-    monthly_revenue = (active_subs or 0) * SUBSCRIPTION_PRICE
-    
     return {
-        "total_users": total_users,
-        "active_subscriptions": active_subs,
-        "expired_subscriptions": expired_subs,
-        "new_users_week": new_users_week,
-        "new_users_month": new_users_month,
-        "admin_count": admin_count,
-        "monthly_revenue": monthly_revenue,
-        "conversion_rate": round((active_subs / total_users * 100) if total_users > 0 else 0, 1)
+        "user_id": user_id,
+        "online": await ws_manager.is_user_online(user_id),
+        "connected_to_this_worker": ws_manager.is_user_connected(user_id),
+        "worker_id": ws_manager.worker_id,
+        "backplane": ws_manager.backplane.name,
     }
 
 @router.get("/users/{user_id}/stats")
@@ -174,14 +203,6 @@ async def get_user_stats(
     """
     Получить детальную статистику пользователя
     """
-    # Check if user exists
-    query = select(User).where(User.user_id == user_id)
-    result = await db.execute(query)
-    user = result.scalar_one_or_none()
-    
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     # Calculate date range
     now = datetime.now(timezone.utc).replace(tzinfo=None)
     if period == "week":
@@ -193,55 +214,8 @@ async def get_user_stats(
     else:
         start_date = now - timedelta(days=30)
     
-    # Get expenses
-    expenses_result = await db.execute(
-        select(func.sum(Expense.amount), func.count(Expense.id))
-        .where(
-            (Expense.user_id == user_id) &
-            (Expense.created_at >= start_date) &
-            (Expense.deleted_at.is_(None))
-        )
-    )
-    total_expenses, expense_count = expenses_result.first() or (0, 0)
-    
-    # Get income
-    income_result = await db.execute(
-        select(func.sum(Income.amount), func.count(Income.id))
-        .where(
-            (Income.user_id == user_id) &
-            (Income.created_at >= start_date) &
-            (Income.deleted_at.is_(None))
-        )
-    )
-    total_income, income_count = income_result.first() or (0, 0)
-    
-    # Get top category (by string, not by category_id)
-    top_category_result = await db.execute(
-        select(Expense.category, func.sum(Expense.amount).label('total'))
-        .where(
-            (Expense.user_id == user_id) &
-            (Expense.created_at >= start_date) &
-            (Expense.deleted_at.is_(None))
-        )
-        .group_by(Expense.category)
-        .order_by(func.sum(Expense.amount).desc())
-        .limit(1)
-    )
-    top_category_row = top_category_result.first()
-    top_category = top_category_row[0] if top_category_row else None
-    
-    # Calculate stats
-    total_expenses = float(total_expenses or 0)
-    total_income = float(total_income or 0)
-    balance = total_income - total_expenses
-    total_transactions = (expense_count or 0) + (income_count or 0)
-    average_expense = total_expenses / expense_count if expense_count > 0 else 0
+    stats = await admin_metrics.get_user_stats(db, user_id, start_date)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="User not found")
     
-    return {
-        "balance": balance,
-        "total_income": total_income,
-        "total_expenses": total_expenses,
-        "total_transactions": total_transactions,
-        "average_expense": average_expense,
-        "top_category": top_category
-    }
+    return stats
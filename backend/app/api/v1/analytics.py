@@ -2,14 +2,17 @@
 Analytics API endpoints
 Статистика, графики и аналитика
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
+from sqlalchemy import text, select, func, and_, desc
 from typing import Optional, Dict, Any
-from datetime import date, datetime, timedelta
+from datetime import date, timedelta
+import asyncio
+import logging
+import time
 
 from app.database import get_db
-from app.models.models import User
+from app.models.models import User, Expense, Income, ExchangeRate, Budget
 from app.schemas.analytics import (
     IncomeExpenseStatsSchema,
     TopCategorySchema,
@@ -18,7 +21,15 @@ from app.schemas.analytics import (
     BalanceTrendSchema
 )
 from app.utils.auth import get_current_user
+from app.utils.periods import CALENDAR_MONTH, month_of, previous_month, resolve_period
 from app.services.cache import cache_service
+from app.services.memory_cache import hybrid_cache
+from app.services.timeseries import balance_series, income_expense_series
+from app.services.response_cache import response_cache, PRIVATE_REVALIDATE
+from app.services.query_budget import query_budget
+from app.utils.serialization import FastJSONResponse
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -216,78 +227,33 @@ async def get_top_expense_categories(
 async def get_balance_trend(
     start_date: date = Query(..., description="Начальная дата"),
     end_date: date = Query(..., description="Конечная дата"),
+    group_by: str = Query("day", description="Группировка: day, week, month"),
+    max_points: Optional[int] = Query(None, ge=2, le=1000, description="Максимум точек (укрупняет группировку)"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Получить тренд баланса по дням (с конвертацией валют)
+    Получить тренд баланса (с конвертацией валют)
+
+    Ряд плотный: дни без операций возвращаются с нулями, cumulative_balance —
+    нарастающий итог с start_date. При max_points группировка укрупняется
+    до week/month, чтобы длинный диапазон не отдавался по дням.
     """
-    query = text("""
-        WITH latest_rates AS (
-            SELECT DISTINCT ON (from_currency, to_currency) 
-                from_currency, to_currency, rate
-            FROM exchange_rates 
-            ORDER BY from_currency, to_currency, date DESC
-        )
-        SELECT 
-            COALESCE(i.date, e.date) as date,
-            COALESCE(i.amount, 0) - COALESCE(e.amount, 0) as balance,
-            COALESCE(i.amount, 0) as income,
-            COALESCE(e.amount, 0) as expense
-        FROM (
-            SELECT date, SUM(
-                CASE 
-                    WHEN currency = 'KGS' THEN amount
-                    ELSE amount * COALESCE(
-                        (SELECT rate FROM latest_rates WHERE from_currency = inc.currency AND to_currency = 'KGS'),
-                        1
-                    )
-                END
-            ) as amount
-            FROM income inc
-            WHERE user_id = :user_id
-                AND date >= :start_date
-                AND date <= :end_date
-                AND deleted_at IS NULL
-            GROUP BY date
-        ) i
-        FULL OUTER JOIN (
-            SELECT date, SUM(
-                CASE 
-                    WHEN currency = 'KGS' THEN amount
-                    ELSE amount * COALESCE(
-                        (SELECT rate FROM latest_rates WHERE from_currency = exp.currency AND to_currency = 'KGS'),
-                        1
-                    )
-                END
-            ) as amount
-            FROM expenses exp
-            WHERE user_id = :user_id
-                AND date >= :start_date
-                AND date <= :end_date
-                AND deleted_at IS NULL
-            GROUP BY date
-        ) e ON i.date = e.date
-        ORDER BY COALESCE(i.date, e.date)
-    """)
-    
-    result = await db.execute(query, {
-        "user_id": current_user.user_id,
-        "start_date": start_date,
-        "end_date": end_date
-    })
-    
-    trend = result.fetchall()
-    
-    return [
+    series = await balance_series(
+        db, current_user.user_id, start_date, end_date,
+        bucket=group_by, max_points=max_points
+    )
+
+    return FastJSONResponse([
         {
-            "date": str(t[0]),
-            "balance": float(t[1]),
-            "income": float(t[2]),
-            "expense": float(t[3])
+            "date": point["period"],
+            "balance": point["balance"],
+            "income": point["income"],
+            "expense": point["expense"],
+            "cumulative_balance": point["cumulative_balance"]
         }
-        for t in trend
-    ]
+        for point in series
+    ])
 
 
 @router.get("/chart/income-expense", response_model=ChartDataResponse)
@@ -301,67 +267,15 @@ async def get_income_expense_chart(
     """
     Получить данные для графика доходов/расходов (с конвертацией валют)
     """
-    query = text("""
-        WITH latest_rates AS (
-            SELECT DISTINCT ON (from_currency, to_currency) 
-                from_currency, to_currency, rate
-            FROM exchange_rates 
-            ORDER BY from_currency, to_currency, date DESC
-        )
-        SELECT 
-            COALESCE(i.date, e.date) as date,
-            COALESCE(i.amount, 0) as income,
-            COALESCE(e.amount, 0) as expense
-        FROM (
-            SELECT date, SUM(
-                CASE 
-                    WHEN currency = 'KGS' THEN amount
-                    ELSE amount * COALESCE(
-                        (SELECT rate FROM latest_rates WHERE from_currency = inc.currency AND to_currency = 'KGS'),
-                        1
-                    )
-                END
-            ) as amount
-            FROM income inc
-            WHERE user_id = :user_id
-                AND date >= :start_date
-                AND date <= :end_date
-                AND deleted_at IS NULL
-            GROUP BY date
-        ) i
-        FULL OUTER JOIN (
-            SELECT date, SUM(
-                CASE 
-                    WHEN currency = 'KGS' THEN amount
-                    ELSE amount * COALESCE(
-                        (SELECT rate FROM latest_rates WHERE from_currency = exp.currency AND to_currency = 'KGS'),
-                        1
-                    )
-                END
-            ) as amount
-            FROM expenses exp
-            WHERE user_id = :user_id
-                AND date >= :start_date
-                AND date <= :end_date
-                AND deleted_at IS NULL
-            GROUP BY date
-        ) e ON i.date = e.date
-        ORDER BY COALESCE(i.date, e.date)
-    """)
+    series = await income_expense_series(
+        db, current_user.user_id, start_date, end_date, bucket=group_by
+    )
     
-    result = await db.execute(query, {
-        "user_id": current_user.user_id,
-        "start_date": start_date,
-        "end_date": end_date
+    return FastJSONResponse({
+        "labels": [str(point["period"]) for point in series],
+        "income": [point["income"] for point in series],
+        "expense": [point["expense"] for point in series]
     })
-    
-    data = result.fetchall()
-    
-    return {
-        "labels": [str(d[0]) for d in data],
-        "income": [float(d[1]) for d in data],
-        "expense": [float(d[2]) for d in data]
-    }
 
 
 @router.get("/chart/category-pie", response_model=Dict[str, float])
@@ -664,27 +578,10 @@ async def get_dashboard_data(
     
     Использует asyncio.gather() для параллельного выполнения независимых запросов
     """
-    import asyncio
-    from zoneinfo import ZoneInfo
-    from app.models.models import Expense, Income, ExchangeRate
-    from sqlalchemy import select, func, and_, desc
-    
     # Определяем даты на основе периода (в timezone пользователя)
-    user_tz = ZoneInfo("Asia/Bishkek")
-    today = datetime.now(user_tz).date()
-    
-    if period == "day":
-        start_date = today
-    elif period == "week":
-        start_date = today - timedelta(days=7)
-    elif period == "month":
-        start_date = today - timedelta(days=30)
-    elif period == "quarter":
-        start_date = today - timedelta(days=90)
-    elif period == "year":
-        start_date = today - timedelta(days=365)
-    else:
-        start_date = today - timedelta(days=30)  # default: month
+    resolved = resolve_period(current_user, period)
+    today = resolved.today
+    start_date = resolved.start
     
     week_ago = today - timedelta(days=7)
     
@@ -802,7 +699,7 @@ async def get_dashboard_data(
         balance = total_income - total_expense
         
         # Формируем ответ
-        return {
+        return FastJSONResponse({
             "balance": {
                 "total_income": total_income,
                 "total_expense": total_expense,
@@ -850,7 +747,7 @@ async def get_dashboard_data(
                 }
                 for rate in exchange_rates
             ]
-        }
+        })
         
     except HTTPException:
         raise
@@ -870,112 +767,32 @@ async def get_spending_trends(
     Получить тренды: сравнение текущего месяца с прошлым,
     динамика по неделям, изменения по категориям
     """
-    today = date.today()
+    resolved = resolve_period(current_user, CALENDAR_MONTH)
+    today = resolved.today
     
     # Текущий месяц
-    current_month_start = today.replace(day=1)
+    current_month_start = resolved.start
     current_month_end = today
     
     # Прошлый месяц
-    last_month_end = current_month_start - timedelta(days=1)
-    last_month_start = last_month_end.replace(day=1)
+    last_month_end = resolved.prev_end - timedelta(days=1)
+    last_month_start = resolved.prev_start
     
     # Количество дней в текущем месяце (для корректного сравнения)
     days_in_current = (today - current_month_start).days + 1
     
     try:
-        # Запрос сравнения месяцев
-        comparison_query = text("""
-            WITH latest_rates AS (
-                SELECT DISTINCT ON (from_currency, to_currency) 
-                    from_currency, to_currency, rate
-                FROM exchange_rates 
-                ORDER BY from_currency, to_currency, date DESC
-            ),
-            current_month AS (
-                SELECT 
-                    COALESCE(SUM(
-                        CASE 
-                            WHEN currency = 'KGS' THEN amount
-                            ELSE amount * COALESCE(
-                                (SELECT rate FROM latest_rates WHERE from_currency = e.currency AND to_currency = 'KGS'), 1
-                            )
-                        END
-                    ), 0) as total,
-                    COUNT(*) as count
-                FROM expenses e
-                WHERE user_id = :user_id 
-                AND date >= :current_start AND date <= :current_end
-                AND deleted_at IS NULL
-            ),
-            last_month AS (
-                SELECT 
-                    COALESCE(SUM(
-                        CASE 
-                            WHEN currency = 'KGS' THEN amount
-                            ELSE amount * COALESCE(
-                                (SELECT rate FROM latest_rates WHERE from_currency = e.currency AND to_currency = 'KGS'), 1
-                            )
-                        END
-                    ), 0) as total,
-                    COUNT(*) as count
-                FROM expenses e
-                WHERE user_id = :user_id 
-                AND date >= :last_start AND date <= :last_end
-                AND deleted_at IS NULL
-            ),
-            current_income AS (
-                SELECT COALESCE(SUM(
-                    CASE 
-                        WHEN currency = 'KGS' THEN amount
-                        ELSE amount * COALESCE(
-                            (SELECT rate FROM latest_rates WHERE from_currency = i.currency AND to_currency = 'KGS'), 1
-                        )
-                    END
-                ), 0) as total
-                FROM income i
-                WHERE user_id = :user_id 
-                AND date >= :current_start AND date <= :current_end
-                AND deleted_at IS NULL
-            ),
-            last_income AS (
-                SELECT COALESCE(SUM(
-                    CASE 
-                        WHEN currency = 'KGS' THEN amount
-                        ELSE amount * COALESCE(
-                            (SELECT rate FROM latest_rates WHERE from_currency = i.currency AND to_currency = 'KGS'), 1
-                        )
-                    END
-                ), 0) as total
-                FROM income i
-                WHERE user_id = :user_id 
-                AND date >= :last_start AND date <= :last_end
-                AND deleted_at IS NULL
-            )
-            SELECT 
-                (SELECT total FROM current_month) as current_expenses,
-                (SELECT count FROM current_month) as current_count,
-                (SELECT total FROM last_month) as last_expenses,
-                (SELECT count FROM last_month) as last_count,
-                (SELECT total FROM current_income) as current_income,
-                (SELECT total FROM last_income) as last_income
-        """)
-        
-        result = await db.execute(comparison_query, {
-            "user_id": current_user.user_id,
-            "current_start": current_month_start,
-            "current_end": current_month_end,
-            "last_start": last_month_start,
-            "last_end": last_month_end
-        })
-        comparison = result.fetchone()
+        # Сравнение месяцев: два месячных интервала одним запросом
+        last_point, current_point = await income_expense_series(
+            db, current_user.user_id, last_month_start, current_month_end, bucket="month"
+        )
         
-        current_expenses = float(comparison[0] or 0)
-        current_count = int(comparison[1] or 0)
-        last_expenses = float(comparison[2] or 0)
-        last_count = int(comparison[3] or 0)
-        current_income = float(comparison[4] or 0)
-        last_income = float(comparison[5] or 0)
+        current_expenses = current_point["expense"]
+        current_count = current_point["expense_count"]
+        last_expenses = last_point["expense"]
+        last_count = last_point["expense_count"]
+        current_income = current_point["income"]
+        last_income = last_point["income"]
         
         # Расчёт изменений в процентах
         expense_change = ((current_expenses - last_expenses) / last_expenses * 100) if last_expenses > 0 else 0
@@ -1113,9 +930,10 @@ async def get_spending_patterns(
     """
     Получить паттерны трат: по дням недели, по времени суток
     """
-    today = date.today()
     # Берём последние 3 месяца для анализа паттернов
-    start_date = today - timedelta(days=90)
+    resolved = resolve_period(current_user, "quarter")
+    today = resolved.today
+    start_date = resolved.start
     
     try:
         # Средние траты по дням недели
@@ -1226,7 +1044,7 @@ async def get_spending_patterns(
         
         top_result = await db.execute(top_days_query, {
             "user_id": current_user.user_id,
-            "start_date": today - timedelta(days=30)
+            "start_date": resolve_period(current_user, "month").start
         })
         top_days = top_result.fetchall()
         
@@ -1264,7 +1082,9 @@ async def get_spending_patterns(
 
 
 @router.get("/batch")
+@query_budget(4)  # пользователь + 3 параллельных запроса при промахе кэша
 async def get_batch_analytics(
+    request: Request,
     period: str = Query("month", description="Период: day, week, month, quarter, year"),
     include: str = Query("all", description="Что включить: all, dashboard, trends, patterns, budget"),
     current_user: User = Depends(get_current_user),
@@ -1275,50 +1095,30 @@ async def get_batch_analytics(
     
     Использует простые параллельные запросы вместо сложного CTE.
     """
-    import asyncio
-    import time as time_module
-    import logging
-    logger = logging.getLogger(__name__)
-    
-    start_time = time_module.time()
-    logger.warning(f"[BATCH] Started for user {current_user.user_id}, period={period}")
+    start_time = time.time()
+    logger.debug(f"[BATCH] Started for user {current_user.user_id}, period={period}")
     
-    from zoneinfo import ZoneInfo
-    from app.models.models import Expense, Income, ExchangeRate, Budget
-    from sqlalchemy import select, func, and_, desc, extract
-    from app.services.memory_cache import hybrid_cache
+    # Определяем даты в часовом поясе пользователя
+    resolved = resolve_period(current_user, period)
+    today = resolved.today
+    start_date = resolved.start
     
-    # Проверяем кэш
-    cache_key = hybrid_cache.make_key("batch", current_user.user_id, period, include)
-    cached = await hybrid_cache.get(cache_key)
+    # Проверяем кэш (границы в ключе — после местной полуночи ключ меняется)
+    cache_key = hybrid_cache.make_key("batch", current_user.user_id, *resolved.cache_key_parts(), include)
+    # Запись в кэше — уже сериализованное тело с ETag: повторный опрос получает 304
+    cached = await response_cache.get(cache_key)
     if cached:
-        logger.warning(f"[BATCH] Cache HIT in {time_module.time() - start_time:.3f}s")
-        return cached
-    
-    logger.warning(f"[BATCH] Cache MISS, executing queries...")
-    
-    # Определяем даты
-    user_tz = ZoneInfo("Asia/Bishkek")
-    today = datetime.now(user_tz).date()
+        logger.debug(f"[BATCH] Cache HIT in {time.time() - start_time:.3f}s")
+        return await response_cache.respond(request, cached, PRIVATE_REVALIDATE)
     
-    if period == "day":
-        start_date = today
-    elif period == "week":
-        start_date = today - timedelta(days=7)
-    elif period == "month":
-        start_date = today - timedelta(days=30)
-    elif period == "quarter":
-        start_date = today - timedelta(days=90)
-    elif period == "year":
-        start_date = today - timedelta(days=365)
-    else:
-        start_date = today - timedelta(days=30)
+    logger.debug(f"[BATCH] Cache MISS, executing queries...")
     
     # Даты для трендов
-    current_month_start = today.replace(day=1)
+    month_dates = month_of(today)
+    current_month_start = month_dates.start
+    last_month_start = previous_month(month_dates).start
     last_month_end = current_month_start - timedelta(days=1)
-    last_month_start = last_month_end.replace(day=1)
-    current_month = datetime.now().strftime("%Y-%m")
+    current_month = current_month_start.strftime("%Y-%m")
     
     try:
         # === ОДИН БОЛЬШОЙ SQL ЗАПРОС ДЛЯ ВСЕХ ДАННЫХ ===
@@ -1377,7 +1177,7 @@ async def get_batch_analytics(
                     CASE WHEN e.currency = 'KGS' THEN e.amount ELSE e.amount * COALESCE(r.rate, 1) END
                 ), 0) as total
                 FROM expenses e LEFT JOIN rates r ON r.from_currency = e.currency
-                WHERE e.user_id = :user_id AND EXTRACT(YEAR FROM e.date) = :year AND EXTRACT(MONTH FROM e.date) = :month AND e.deleted_at IS NULL
+                WHERE e.user_id = :user_id AND e.date >= :month_start AND e.date < :next_month_start AND e.deleted_at IS NULL
             ),
             top_cats AS (
                 SELECT e.category, SUM(CASE WHEN e.currency = 'KGS' THEN e.amount ELSE e.amount * COALESCE(r.rate, 1) END) as total, COUNT(*) as cnt
@@ -1425,7 +1225,7 @@ async def get_batch_analytics(
         """)
         
         # Выполняем 3 запроса вместо 10
-        query_start = time_module.time()
+        query_start = time.time()
         params = {
             "user_id": current_user.user_id,
             "start_date": start_date,
@@ -1433,8 +1233,7 @@ async def get_batch_analytics(
             "month_start": current_month_start,
             "prev_start": last_month_start,
             "prev_end": last_month_end,
-            "year": int(current_month.split("-")[0]),
-            "month": int(current_month.split("-")[1])
+            "next_month_start": month_dates.end
         }
         
         main_result, budget_result, rates_result = await asyncio.gather(
@@ -1443,7 +1242,7 @@ async def get_batch_analytics(
             db.execute(rates_query)
         )
         
-        logger.warning(f"[BATCH] Queries done in {time_module.time() - query_start:.3f}s")
+        logger.debug(f"[BATCH] Queries done in {time.time() - query_start:.3f}s")
         
         # Парсим результаты из одного большого запроса
         main_row = main_result.fetchone()
@@ -1543,10 +1342,10 @@ async def get_batch_analytics(
         }
         
         # Кэшируем на 5 минут (данные не меняются часто)
-        await hybrid_cache.set(cache_key, result, ttl=300)
+        entry = await response_cache.store(cache_key, result, ttl=300)
         
-        logger.warning(f"[BATCH] Completed in {time_module.time() - start_time:.3f}s")
-        return result
+        logger.debug(f"[BATCH] Completed in {time.time() - start_time:.3f}s")
+        return await response_cache.respond(request, entry, PRIVATE_REVALIDATE)
         
     except Exception as e:
         logger.error(f"[BATCH] Error: {str(e)}")
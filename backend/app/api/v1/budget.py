@@ -1,13 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, extract, func, desc, text
+from sqlalchemy import select, and_, func, desc, text
 from typing import Optional, List
-from datetime import datetime
 
 from ...database import get_db
 from ...models import Budget, Expense, User
 from ...schemas import BudgetCreate, BudgetUpdate, Budget as BudgetSchema
 from ...utils.auth import get_current_user
+from ...utils.periods import current_month as resolve_current_month, month_range
 
 router = APIRouter()
 
@@ -37,7 +37,7 @@ async def get_current_budget_status(
     db: AsyncSession = Depends(get_db)
 ):
     """Получить статус бюджета текущего месяца"""
-    current_month = datetime.now().strftime("%Y-%m")
+    current_month = resolve_current_month(current_user.timezone)
     
     # Получаем бюджет
     budget_query = select(Budget).where(
@@ -72,7 +72,7 @@ async def get_current_budget_status(
             }
     
     # Получаем сумму расходов за месяц с конвертацией валют
-    year, month_num = current_month.split("-")
+    month_dates = month_range(current_month)
     budget_currency = budget.currency or "KGS"
     
     # Запрос с конвертацией валют в валюту бюджета
@@ -103,15 +103,15 @@ async def get_current_budget_status(
         FROM expenses e
         WHERE e.user_id = :user_id 
         AND e.deleted_at IS NULL
-        AND EXTRACT(YEAR FROM e.date) = :year
-        AND EXTRACT(MONTH FROM e.date) = :month
+        AND e.date >= :month_start
+        AND e.date < :month_end
     """)
     
     expenses_result = await db.execute(expenses_query, {
         "user_id": current_user.user_id,
         "budget_currency": budget_currency,
-        "year": int(year),
-        "month": int(month_num)
+        "month_start": month_dates.start,
+        "month_end": month_dates.end
     })
     expenses_data = expenses_result.one()
     
@@ -231,6 +231,11 @@ async def get_budget_status(
     """Получить статус бюджета с расходами"""
     user_id = current_user.user_id
     
+    try:
+        month_dates = month_range(month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     # Получаем бюджет
     budget_query = select(Budget).where(
         and_(
@@ -246,7 +251,6 @@ async def get_budget_status(
         raise HTTPException(status_code=404, detail="Budget not found")
     
     # Получаем сумму расходов за месяц
-    year, month_num = month.split("-")
     expenses_query = select(
         func.sum(Expense.amount).label("total_spent"),
         func.count(Expense.id).label("transaction_count")
@@ -254,8 +258,8 @@ async def get_budget_status(
         and_(
             Expense.user_id == user_id,
             Expense.deleted_at.is_(None),
-            extract('year', Expense.date) == int(year),
-            extract('month', Expense.date) == int(month_num)
+            Expense.date >= month_dates.start,
+            Expense.date < month_dates.end
         )
     )
     
@@ -2,7 +2,7 @@
 Categories API endpoints
 CRUD для категорий из БД
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_, func
 from typing import List, Optional
@@ -16,9 +16,15 @@ from app.schemas.category import (
     CategoryListResponse
 )
 from app.utils.auth import get_current_user
+from app.services.memory_cache import hybrid_cache, categories_scope
+from app.services.response_cache import response_cache, PRIVATE_REVALIDATE, PUBLIC_HOUR
 
 router = APIRouter()
 
+# Дефолтные категории меняются только миграциями
+PUBLIC_CATEGORIES_TTL = 3600
+CATEGORIES_TTL = 600
+
 # Валюты (статические, не в БД)
 CURRENCIES = [
     {"code": "KGS", "name": "Кыргызский сом", "symbol": "сом", "flag": "🇰🇬"},
@@ -28,45 +34,78 @@ CURRENCIES = [
 ]
 
 
-# ===== ПУБЛИЧНЫЕ ЭНДПОИНТЫ (БЕЗ АВТОРИЗАЦИИ) =====
-# Для загрузки категорий в фронте ДО авторизации
+def _dump(categories) -> List[dict]:
+    return [CategoryResponse.model_validate(c).model_dump(mode="json") for c in categories]
 
-@router.get("/public/expenses", response_model=List[CategoryResponse])
-async def get_expense_categories_public(db: AsyncSession = Depends(get_db)):
-    """
-    Получить все дефолтные категории расходов (PUBLIC)
-    Не требует авторизации - используется для предзаполнения перед логином
-    """
+
+async def _user_cache_key(user_id: int, *parts) -> str:
+    """Ключ ответа с поколением категорий пользователя — запись меняет ключ и ETag"""
+    generation = await hybrid_cache.get_generation(categories_scope(user_id))
+    return hybrid_cache.make_key("categories", user_id, generation, *parts)
+
+
+async def _bump_categories(user_id: int) -> None:
+    await hybrid_cache.bump_generation(categories_scope(user_id))
+
+
+async def _fetch_defaults(db: AsyncSession, type: str) -> List[dict]:
+    """Дефолтные категории типа type"""
     query = select(Category).where(
         and_(
-            Category.type == "expense",
+            Category.type == type,
             Category.is_active == True,
             Category.user_id.is_(None)  # Только дефолтные категории
         )
     ).order_by(Category.sort_order, Category.name)
     
     result = await db.execute(query)
-    categories = result.scalars().all()
-    return categories
+    return _dump(result.scalars().all())
 
 
-@router.get("/public/income", response_model=List[CategoryResponse])
-async def get_income_categories_public(db: AsyncSession = Depends(get_db)):
-    """
-    Получить все дефолтные категории доходов (PUBLIC)
-    Не требует авторизации - используется для предзаполнения перед логином
-    """
+async def _fetch_available(db: AsyncSession, user_id: int, type: str) -> List[dict]:
+    """Дефолтные + пользовательские категории типа type"""
     query = select(Category).where(
         and_(
-            Category.type == "income",
+            Category.type == type,
             Category.is_active == True,
-            Category.user_id.is_(None)  # Только дефолтные категории
+            or_(
+                Category.user_id.is_(None),  # Дефолтные
+                Category.user_id == user_id  # Пользовательские
+            )
         )
-    ).order_by(Category.sort_order, Category.name)
+    ).order_by(Category.is_default.desc(), Category.sort_order, Category.name)
     
     result = await db.execute(query)
-    categories = result.scalars().all()
-    return categories
+    return _dump(result.scalars().all())
+
+
+# ===== ПУБЛИЧНЫЕ ЭНДПОИНТЫ (БЕЗ АВТОРИЗАЦИИ) =====
+# Для загрузки категорий в фронте ДО авторизации
+
+@router.get("/public/expenses", response_model=List[CategoryResponse])
+async def get_expense_categories_public(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Получить все дефолтные категории расходов (PUBLIC)
+    Не требует авторизации - используется для предзаполнения перед логином
+    """
+    return await response_cache.cached(
+        request, hybrid_cache.make_key("categories", "public", "expense"),
+        lambda: _fetch_defaults(db, "expense"),
+        ttl=PUBLIC_CATEGORIES_TTL, cache_control=PUBLIC_HOUR
+    )
+
+
+@router.get("/public/income", response_model=List[CategoryResponse])
+async def get_income_categories_public(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Получить все дефолтные категории доходов (PUBLIC)
+    Не требует авторизации - используется для предзаполнения перед логином
+    """
+    return await response_cache.cached(
+        request, hybrid_cache.make_key("categories", "public", "income"),
+        lambda: _fetch_defaults(db, "income"),
+        ttl=PUBLIC_CATEGORIES_TTL, cache_control=PUBLIC_HOUR
+    )
 
 
 @router.get("/currencies", response_model=List[dict])
@@ -79,6 +118,7 @@ async def get_currencies():
 
 @router.get("/expenses", response_model=List[CategoryResponse])
 async def get_expense_categories(
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -86,25 +126,16 @@ async def get_expense_categories(
     Получить все категории расходов для пользователя
     Включает дефолтные + пользовательские категории
     """
-    query = select(Category).where(
-        and_(
-            Category.type == "expense",
-            Category.is_active == True,
-            or_(
-                Category.user_id.is_(None),  # Дефолтные
-                Category.user_id == current_user.user_id  # Пользовательские
-            )
-        )
-    ).order_by(Category.is_default.desc(), Category.sort_order, Category.name)
-    
-    result = await db.execute(query)
-    categories = result.scalars().all()
-    
-    return categories
+    return await response_cache.cached(
+        request, await _user_cache_key(current_user.user_id, "expense"),
+        lambda: _fetch_available(db, current_user.user_id, "expense"),
+        ttl=CATEGORIES_TTL, cache_control=PRIVATE_REVALIDATE
+    )
 
 
 @router.get("/income", response_model=List[CategoryResponse])
 async def get_income_categories(
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -112,67 +143,36 @@ async def get_income_categories(
     Получить все категории доходов для пользователя
     Включает дефолтные + пользовательские категории
     """
-    query = select(Category).where(
-        and_(
-            Category.type == "income",
-            Category.is_active == True,
-            or_(
-                Category.user_id.is_(None),  # Дефолтные
-                Category.user_id == current_user.user_id  # Пользовательские
-            )
-        )
-    ).order_by(Category.is_default.desc(), Category.sort_order, Category.name)
-    
-    result = await db.execute(query)
-    categories = result.scalars().all()
-    
-    return categories
+    return await response_cache.cached(
+        request, await _user_cache_key(current_user.user_id, "income"),
+        lambda: _fetch_available(db, current_user.user_id, "income"),
+        ttl=CATEGORIES_TTL, cache_control=PRIVATE_REVALIDATE
+    )
 
 
 @router.get("/all", response_model=CategoryListResponse)
 async def get_all_categories(
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Получить все категории и валюты одним запросом
     """
-    # Запрос для расходов
-    expense_query = select(Category).where(
-        and_(
-            Category.type == "expense",
-            Category.is_active == True,
-            or_(
-                Category.user_id.is_(None),
-                Category.user_id == current_user.user_id
-            )
-        )
-    ).order_by(Category.is_default.desc(), Category.sort_order, Category.name)
-    
-    # Запрос для доходов
-    income_query = select(Category).where(
-        and_(
-            Category.type == "income",
-            Category.is_active == True,
-            or_(
-                Category.user_id.is_(None),
-                Category.user_id == current_user.user_id
-            )
-        )
-    ).order_by(Category.is_default.desc(), Category.sort_order, Category.name)
-    
-    expense_result = await db.execute(expense_query)
-    income_result = await db.execute(income_query)
-    
-    expense_categories = expense_result.scalars().all()
-    income_categories = income_result.scalars().all()
-    
-    return {
-        "expense_categories": expense_categories,
-        "income_categories": income_categories,
-        "total_expense": len(expense_categories),
-        "total_income": len(income_categories)
-    }
+    async def produce():
+        expense_categories = await _fetch_available(db, current_user.user_id, "expense")
+        income_categories = await _fetch_available(db, current_user.user_id, "income")
+        return {
+            "expense_categories": expense_categories,
+            "income_categories": income_categories,
+            "total_expense": len(expense_categories),
+            "total_income": len(income_categories)
+        }
+    
+    return await response_cache.cached(
+        request, await _user_cache_key(current_user.user_id, "all"), produce,
+        ttl=CATEGORIES_TTL, cache_control=PRIVATE_REVALIDATE
+    )
 
 
 @router.get("/currencies")
@@ -185,6 +185,7 @@ async def get_currencies():
 
 @router.get("/my", response_model=List[CategoryResponse])
 async def get_user_categories(
+    request: Request,
     type: Optional[str] = Query(None, pattern="^(expense|income)$"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
@@ -192,22 +193,26 @@ async def get_user_categories(
     """
     Получить только пользовательские категории (не дефолтные)
     """
-    query = select(Category).where(
-        and_(
-            Category.user_id == current_user.user_id,
-            Category.is_active == True
+    async def produce():
+        query = select(Category).where(
+            and_(
+                Category.user_id == current_user.user_id,
+                Category.is_active == True
+            )
         )
+        
+        if type:
+            query = query.where(Category.type == type)
+        
+        query = query.order_by(Category.sort_order, Category.name)
+        
+        result = await db.execute(query)
+        return _dump(result.scalars().all())
+    
+    return await response_cache.cached(
+        request, await _user_cache_key(current_user.user_id, "my", type), produce,
+        ttl=CATEGORIES_TTL, cache_control=PRIVATE_REVALIDATE
     )
-    
-    if type:
-        query = query.where(Category.type == type)
-    
-    query = query.order_by(Category.sort_order, Category.name)
-    
-    result = await db.execute(query)
-    categories = result.scalars().all()
-    
-    return categories
 
 
 @router.post("/", response_model=CategoryResponse, status_code=status.HTTP_201_CREATED)
@@ -263,6 +268,7 @@ async def create_category(
     
     db.add(new_category)
     await db.commit()
+    await _bump_categories(current_user.user_id)
     await db.refresh(new_category)
     
     return new_category
@@ -309,6 +315,7 @@ async def update_category(
         setattr(category, field, value)
     
     await db.commit()
+    await _bump_categories(current_user.user_id)
     await db.refresh(category)
     
     return category
@@ -351,6 +358,7 @@ async def delete_category(
     # Soft delete - деактивируем
     category.is_active = False
     await db.commit()
+    await _bump_categories(current_user.user_id)
     
     return {"message": f"Категория '{category.name}' удалена", "success": True}
 
@@ -382,5 +390,6 @@ async def restore_category(
     
     category.is_active = True
     await db.commit()
+    await _bump_categories(current_user.user_id)
     
     return {"message": f"Категория '{category.name}' восстановлена", "success": True}
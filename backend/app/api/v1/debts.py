@@ -3,11 +3,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, or_
 from sqlalchemy.orm import selectinload
 from typing import List, Optional
-from datetime import date, datetime, timedelta
+from datetime import date, datetime
 
 from ...database import get_db
-from ...models.models import Expense, Income
 from ...utils.auth import get_current_user_id
+from ...services.cache import cache_service
+from ...services.memory_cache import hybrid_cache, debts_scope, user_data_scope
+from ...services.summaries import cached_summary, debt_summary
+from ...services.balance_updates import apply_debt_payment
+from ...services.query_budget import query_budget
 
 router = APIRouter(prefix="/debts", tags=["debts"])
 
@@ -115,6 +119,20 @@ def debt_to_response(debt: Debt, today: date) -> DebtResponse:
     )
 
 
+async def _bump_debts(user_id: int) -> None:
+    """Сводка по долгам кэшируется по поколению — поднимаем после записи"""
+    await hybrid_cache.bump_generation(debts_scope(user_id))
+
+
+async def _invalidate_user_data(user_id: int) -> None:
+    """Платёж создал доход/расход — сбрасываем кэши транзакций и статистики"""
+    await cache_service.delete_pattern(f"stats:{user_id}:*")
+    await cache_service.delete_pattern(f"overview:{user_id}:*")
+    await hybrid_cache.delete_pattern(f"batch:{user_id}:*")
+    await hybrid_cache.delete_pattern(f"transactions:{user_id}:*")
+    await hybrid_cache.bump_generation(user_data_scope(user_id))
+
+
 @router.get("/", response_model=DebtListResponse)
 async def get_debts(
     db: AsyncSession = Depends(get_db),
@@ -157,37 +175,16 @@ async def get_debts(
 
 
 @router.get("/summary", response_model=DebtSummary)
+@query_budget(2)
 async def get_debt_summary(
     db: AsyncSession = Depends(get_db),
     user_id: int = Depends(get_current_user_id),
 ):
-    """Получить сводку по долгам"""
-    query = select(Debt).where(Debt.user_id == user_id)
-    result = await db.execute(query)
-    debts = result.scalars().all()
-    
+    """Получить сводку по долгам (суммы в KGS, разбивка по валютам)"""
     today = date.today()
-    week_later = today + timedelta(days=7)
-    
-    active_debts = [d for d in debts if not d.is_settled]
-    
-    total_given = sum(float(d.original_amount) for d in debts if d.debt_type == "given")
-    total_received = sum(float(d.original_amount) for d in debts if d.debt_type == "received")
-    total_given_remaining = sum(float(d.remaining_amount) for d in active_debts if d.debt_type == "given")
-    total_received_remaining = sum(float(d.remaining_amount) for d in active_debts if d.debt_type == "received")
-    
-    overdue_count = sum(1 for d in active_debts if d.due_date and d.due_date < today)
-    due_soon_count = sum(1 for d in active_debts if d.due_date and today <= d.due_date <= week_later)
-    
-    return DebtSummary(
-        total_given=total_given,
-        total_received=total_received,
-        total_given_remaining=total_given_remaining,
-        total_received_remaining=total_received_remaining,
-        net_balance=total_given_remaining - total_received_remaining,
-        active_debts_count=len(active_debts),
-        overdue_count=overdue_count,
-        due_soon_count=due_soon_count
+    return await cached_summary(
+        "debts", debts_scope(user_id), user_id, [today.isoformat()],
+        lambda: debt_summary(db, user_id, today),
     )
 
 
@@ -230,6 +227,7 @@ async def create_debt(
     
     db.add(debt)
     await db.commit()
+    await _bump_debts(user_id)
     await db.refresh(debt)
 
     # Avoid async lazy-loading (MissingGreenlet) when accessing `debt.payments`
@@ -263,6 +261,7 @@ async def update_debt(
         setattr(debt, field, value)
     
     await db.commit()
+    await _bump_debts(user_id)
     await db.refresh(debt)
     
     return debt_to_response(debt, date.today())
@@ -284,6 +283,7 @@ async def delete_debt(
     
     await db.delete(debt)
     await db.commit()
+    await _bump_debts(user_id)
     
     return {"success": True, "message": f"Долг '{debt.person_name}' удалён"}
 
@@ -296,71 +296,50 @@ async def add_payment(
     user_id: int = Depends(get_current_user_id),
 ):
     """Добавить платёж по долгу (частичный или полный возврат)"""
-    query = select(Debt).options(selectinload(Debt.payments)).where(Debt.id == debt_id, Debt.user_id == user_id)
-    result = await db.execute(query)
-    debt = result.scalar_one_or_none()
-    
-    if not debt:
-        raise HTTPException(status_code=404, detail="Долг не найден")
-    
-    if debt.is_settled:
-        raise HTTPException(status_code=400, detail="Долг уже погашен")
-    
     payment_amount = Decimal(str(data.amount))
 
-    if payment_amount > Decimal(debt.remaining_amount):
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Сумма платежа ({data.amount}) превышает остаток долга ({debt.remaining_amount})"
-        )
-    
-    # Создаём платёж
-    payment = DebtPayment(
-        debt_id=debt_id,
+    # Остаток, платёж и транзакция — одним оператором (UPDATE ... RETURNING + INSERT в CTE)
+    row = await apply_debt_payment(
+        db, user_id, debt_id,
         amount=payment_amount,
         payment_date=data.payment_date or date.today(),
         note=data.note,
+        create_transaction=data.create_transaction,
     )
-    
-    # Создаём транзакцию если нужно
-    if data.create_transaction:
-        if debt.debt_type == "given":
-            # Нам вернули долг = доход
-            transaction = Income(
-                user_id=user_id,
-                amount=float(payment_amount),
-                currency=debt.currency,
-                category="Возврат долга",
-                description=f"Возврат от {debt.person_name}" + (f": {data.note}" if data.note else ""),
-                date=data.payment_date or date.today(),
-            )
-        else:
-            # Мы вернули долг = расход
-            transaction = Expense(
-                user_id=user_id,
-                amount=float(payment_amount),
-                currency=debt.currency,
-                category="Возврат долга",
-                description=f"Возврат {debt.person_name}" + (f": {data.note}" if data.note else ""),
-                date=data.payment_date or date.today(),
-            )
-        db.add(transaction)
-        await db.flush()
-        payment.related_transaction_id = transaction.id
-    
-    db.add(payment)
-    
-    # Обновляем остаток долга
-    debt.remaining_amount = Decimal(debt.remaining_amount) - payment_amount
-    
-    # Если погашен полностью
-    if debt.remaining_amount <= 0:
-        debt.is_settled = True
-        debt.settled_at = datetime.now()
-        debt.remaining_amount = Decimal("0")
-    
+
+    if row is None:
+        result = await db.execute(
+            select(Debt.remaining_amount, Debt.is_settled).where(Debt.id == debt_id, Debt.user_id == user_id)
+        )
+        debt_state = result.first()
+        await db.rollback()
+        if not debt_state:
+            raise HTTPException(status_code=404, detail="Долг не найден")
+        if debt_state.is_settled:
+            raise HTTPException(status_code=400, detail="Долг уже погашен")
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Сумма платежа ({data.amount}) превышает остаток долга ({debt_state.remaining_amount})"
+        )
+
     await db.commit()
-    await db.refresh(debt)
+    await _bump_debts(user_id)
+    if row.related_transaction_id is not None:
+        await _invalidate_user_data(user_id)
+
+    # В ответе — только что добавленный платёж, а не вся история
+    debt = Debt(**{c.key: getattr(row, c.key) for c in Debt.__table__.columns})
+    debt.payments = [
+        DebtPayment(
+            id=row.payment_id,
+            debt_id=debt.id,
+            amount=row.payment_amount,
+            payment_date=row.payment_date,
+            note=row.payment_note,
+            related_transaction_id=row.related_transaction_id,
+            created_at=row.payment_created_at,
+        )
+    ]
     
     return debt_to_response(debt, date.today())
 
@@ -384,6 +363,7 @@ async def settle_debt(
     debt.remaining_amount = 0
     
     await db.commit()
+    await _bump_debts(user_id)
     await db.refresh(debt)
     
     return debt_to_response(debt, date.today())
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, extract
+from sqlalchemy import select, func, and_
 from typing import List, Optional
 from datetime import datetime, date
 
@@ -9,9 +9,10 @@ from ...models import Expense, User
 from ...schemas import ExpenseCreate, ExpenseUpdate, Expense as ExpenseSchema, PaginatedResponse
 from ...utils.auth import get_current_user
 from ...services.cache import cache_service
-from ...services.memory_cache import hybrid_cache
+from ...services.memory_cache import hybrid_cache, user_data_scope
 from ...services.websocket import ws_manager
 from ...services.gamification import GamificationService
+from ...utils.periods import month_range
 
 router = APIRouter()
 
@@ -41,6 +42,7 @@ async def create_expense(
     await cache_service.delete_pattern(f"overview:{current_user.user_id}:*")
     await hybrid_cache.delete_pattern(f"batch:{current_user.user_id}:*")
     await hybrid_cache.delete_pattern(f"transactions:{current_user.user_id}:*")
+    await hybrid_cache.bump_generation(user_data_scope(current_user.user_id))
     
     # Геймификация
     gamification = GamificationService(db)
@@ -166,6 +168,8 @@ async def update_expense(
     
     await db.commit()
     await db.refresh(expense)
+    
+    await hybrid_cache.bump_generation(user_data_scope(current_user.user_id))
     return expense
 
 
@@ -198,6 +202,7 @@ async def delete_expense(
     await cache_service.delete_pattern(f"overview:{current_user.user_id}:*")
     await hybrid_cache.delete_pattern(f"batch:{current_user.user_id}:*")
     await hybrid_cache.delete_pattern(f"transactions:{current_user.user_id}:*")
+    await hybrid_cache.bump_generation(user_data_scope(current_user.user_id))
     
     # WebSocket уведомление
     await ws_manager.send_personal_message({
@@ -230,11 +235,14 @@ async def get_expenses_summary(
     )
     
     if month:
-        year, month_num = month.split("-")
+        try:
+            month_dates = month_range(month)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         query = query.where(
             and_(
-                extract('year', Expense.date) == int(year),
-                extract('month', Expense.date) == int(month_num)
+                Expense.date >= month_dates.start,
+                Expense.date < month_dates.end
             )
         )
     
@@ -273,11 +281,14 @@ async def get_expenses_by_category(
     )
     
     if month:
-        year, month_num = month.split("-")
+        try:
+            month_dates = month_range(month)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         query = query.where(
             and_(
-                extract('year', Expense.date) == int(year),
-                extract('month', Expense.date) == int(month_num)
+                Expense.date >= month_dates.start,
+                Expense.date < month_dates.end
             )
         )
     
@@ -2,14 +2,21 @@
 Gamification API endpoints
 API для геймификации: профиль, достижения, ежедневные задания
 """
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, desc, func
 from typing import Optional
 
 from app.database import get_db
-from app.models.models import User
+from app.models.models import User, XPHistory, UserGamification
 from app.utils.auth import get_current_user
-from app.services.gamification import GamificationService
+from app.services.gamification import GamificationService, LEVEL_NAMES
+from app.services.memory_cache import hybrid_cache, user_data_scope
+from app.services.response_cache import response_cache, PRIVATE_REVALIDATE
+
+# Достижения разблокируются в основном операциями (меняют поколение данных);
+# остальные источники (стрики, настройки) догоняются по TTL
+ACHIEVEMENTS_TTL = 120
 
 router = APIRouter(prefix="/gamification", tags=["gamification"])
 
@@ -46,6 +53,7 @@ async def get_gamification_profile(
 
 @router.get("/achievements")
 async def get_achievements(
+    request: Request,
     lang: str = Query("ru", description="Language: ru, en, ky"),
     category: Optional[str] = Query(None, description="Filter by category"),
     current_user: User = Depends(get_current_user),
@@ -62,44 +70,52 @@ async def get_achievements(
     - special: Особые достижения
     - rare: Редкие достижения
     """
-    service = GamificationService(db)
-    achievements = await service.get_achievements(current_user.user_id, lang)
-    
-    # Фильтруем по категории если указана
-    if category:
-        achievements = [a for a in achievements if a["category"] == category]
-    
-    # Группируем по категориям
-    categories = {}
-    for ach in achievements:
-        cat = ach["category"]
-        if cat not in categories:
-            categories[cat] = {
-                "achievements": [],
-                "unlocked": 0,
-                "total": 0
-            }
-        categories[cat]["achievements"].append(ach)
-        categories[cat]["total"] += 1
-        if ach["unlocked"]:
-            categories[cat]["unlocked"] += 1
-    
-    # Общая статистика
-    total_unlocked = sum(1 for a in achievements if a["unlocked"])
-    total = len(achievements)
-    
-    return {
-        "success": True,
-        "data": {
-            "achievements": achievements,
-            "categories": categories,
-            "stats": {
-                "unlocked": total_unlocked,
-                "total": total,
-                "percentage": int((total_unlocked / total) * 100) if total > 0 else 0
+    async def produce():
+        service = GamificationService(db)
+        achievements = await service.get_achievements(current_user.user_id, lang)
+        
+        # Фильтруем по категории если указана
+        if category:
+            achievements = [a for a in achievements if a["category"] == category]
+        
+        # Группируем по категориям
+        categories = {}
+        for ach in achievements:
+            cat = ach["category"]
+            if cat not in categories:
+                categories[cat] = {
+                    "achievements": [],
+                    "unlocked": 0,
+                    "total": 0
+                }
+            categories[cat]["achievements"].append(ach)
+            categories[cat]["total"] += 1
+            if ach["unlocked"]:
+                categories[cat]["unlocked"] += 1
+        
+        # Общая статистика
+        total_unlocked = sum(1 for a in achievements if a["unlocked"])
+        total = len(achievements)
+        
+        return {
+            "success": True,
+            "data": {
+                "achievements": achievements,
+                "categories": categories,
+                "stats": {
+                    "unlocked": total_unlocked,
+                    "total": total,
+                    "percentage": int((total_unlocked / total) * 100) if total > 0 else 0
+                }
             }
         }
-    }
+    
+    generation = await hybrid_cache.get_generation(user_data_scope(current_user.user_id))
+    cache_key = hybrid_cache.make_key("achievements", current_user.user_id, generation, lang, category)
+    return await response_cache.cached(
+        request, cache_key, produce,
+        ttl=ACHIEVEMENTS_TTL, cache_control=PRIVATE_REVALIDATE
+    )
 
 
 @router.get("/achievements/{achievement_id}")
@@ -158,9 +174,6 @@ async def get_xp_history(
     db: AsyncSession = Depends(get_db)
 ):
     """Получить историю начисления XP"""
-    from sqlalchemy import select
-    from app.models.models import XPHistory
-    
     result = await db.execute(
         select(XPHistory)
         .where(XPHistory.user_id == current_user.user_id)
@@ -225,9 +238,6 @@ async def get_leaderboard(
     
     Показывает только уровни и streak других пользователей
     """
-    from sqlalchemy import select, desc
-    from app.models.models import UserGamification
-    
     result = await db.execute(
         select(UserGamification)
         .order_by(desc(UserGamification.total_xp))
@@ -253,11 +263,8 @@ async def get_leaderboard(
                 .scalar_subquery()
             ))
         )
-        from sqlalchemy import func
         user_position = (count_result.scalar() or 0) + 1
     
-    from app.services.gamification import LEVEL_NAMES
-    
     return {
         "success": True,
         "data": {
@@ -19,6 +19,10 @@ from app.schemas.goals import (
 )
 from app.utils.auth import get_current_user
 from app.services.cache import cache_service
+from app.services.memory_cache import hybrid_cache, goals_scope
+from app.services.summaries import cached_summary, goal_stats
+from app.services.balance_updates import apply_goal_contribution
+from app.services.query_budget import query_budget
 
 router = APIRouter()
 
@@ -49,6 +53,12 @@ def calculate_goal_fields(goal: SavingsGoal) -> dict:
     }
 
 
+async def _invalidate_goals(user_id: int) -> None:
+    """Сбросить список целей и поднять поколение сводки"""
+    await cache_service.delete_pattern(f"goals:{user_id}:*")
+    await hybrid_cache.bump_generation(goals_scope(user_id))
+
+
 def goal_to_response(goal: SavingsGoal) -> GoalResponse:
     """Преобразовать модель в response"""
     fields = calculate_goal_fields(goal)
@@ -116,46 +126,33 @@ async def get_goals(
 
 
 @router.get("/stats", response_model=GoalStatsResponse)
+@query_budget(3)
 async def get_goals_stats(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Получить статистику по целям"""
-    result = await db.execute(
-        select(SavingsGoal).where(SavingsGoal.user_id == current_user.user_id)
-    )
-    goals = result.scalars().all()
-    
-    active_goals = [g for g in goals if g.is_active and not g.is_completed]
-    completed_goals = [g for g in goals if g.is_completed]
-    
-    total_saved = sum(g.current_amount for g in goals)
-    total_target = sum(g.target_amount for g in active_goals)
-    overall_progress = (total_saved / total_target * 100) if total_target > 0 else 0
-    
-    # Ближайшая цель по дедлайну
-    nearest = None
-    goals_with_deadline = [g for g in active_goals if g.deadline]
-    if goals_with_deadline:
-        nearest_goal = min(goals_with_deadline, key=lambda x: x.deadline)
-        nearest = goal_to_response(nearest_goal)
-    
-    # Самая заполненная цель
-    most_funded = None
-    if active_goals:
-        most_funded_goal = max(active_goals, key=lambda x: x.current_amount / x.target_amount if x.target_amount > 0 else 0)
-        most_funded = goal_to_response(most_funded_goal)
-    
-    return GoalStatsResponse(
-        total_goals=len(goals),
-        active_goals=len(active_goals),
-        completed_goals=len(completed_goals),
-        total_saved=total_saved,
-        total_target=total_target,
-        overall_progress=round(overall_progress, 1),
-        nearest_goal=nearest,
-        most_funded=most_funded
-    )
+    """Получить статистику по целям (суммы в KGS)"""
+    user_id = current_user.user_id
+
+    async def produce():
+        stats = await goal_stats(db, user_id)
+        nearest_id = stats.pop("nearest_id")
+        most_funded_id = stats.pop("most_funded_id")
+        # Загружаются только цели для карточек, а не все цели пользователя
+        ids = {i for i in (nearest_id, most_funded_id) if i is not None}
+        by_id = {}
+        if ids:
+            result = await db.execute(select(SavingsGoal).where(SavingsGoal.id.in_(ids)))
+            by_id = {g.id: goal_to_response(g) for g in result.scalars().all()}
+        response = GoalStatsResponse(
+            **stats,
+            nearest_goal=by_id.get(nearest_id),
+            most_funded=by_id.get(most_funded_id),
+        )
+        return response.model_dump(mode="json")
+
+    # days_left / monthly_target зависят от даты — она в ключе
+    return await cached_summary("goals", goals_scope(user_id), user_id, [date.today().isoformat()], produce)
 
 
 @router.get("/{goal_id}", response_model=GoalWithContributions)
@@ -259,7 +256,7 @@ async def create_goal(
         await db.commit()
     
     # Invalidate cache
-    await cache_service.delete_pattern(f"goals:{current_user.user_id}:*")
+    await _invalidate_goals(current_user.user_id)
     
     return goal_to_response(goal)
 
@@ -294,7 +291,7 @@ async def update_goal(
     await db.refresh(goal)
     
     # Invalidate cache
-    await cache_service.delete_pattern(f"goals:{current_user.user_id}:*")
+    await _invalidate_goals(current_user.user_id)
     
     return goal_to_response(goal)
 
@@ -321,7 +318,7 @@ async def delete_goal(
     await db.commit()
     
     # Invalidate cache
-    await cache_service.delete_pattern(f"goals:{current_user.user_id}:*")
+    await _invalidate_goals(current_user.user_id)
 
 
 # ============================================
@@ -336,56 +333,48 @@ async def contribute_to_goal(
     db: AsyncSession = Depends(get_db)
 ):
     """Пополнить или снять со цели"""
-    result = await db.execute(
-        select(SavingsGoal).where(
-            SavingsGoal.id == goal_id,
-            SavingsGoal.user_id == current_user.user_id,
-            SavingsGoal.is_active == True
-        )
+    # Баланс меняется одним UPDATE ... RETURNING вместе с записью истории
+    row = await apply_goal_contribution(
+        db, current_user.user_id, goal_id,
+        amount=data.amount,
+        type=data.type.value,
+        note=data.note,
+        source=data.source.value,
     )
-    goal = result.scalar_one_or_none()
-    
-    if not goal:
-        raise HTTPException(status_code=404, detail="Goal not found or inactive")
-    
-    # Check if withdrawal is valid
-    if data.type == "withdraw" and data.amount > goal.current_amount:
+
+    if row is None:
+        result = await db.execute(
+            select(SavingsGoal.current_amount).where(
+                SavingsGoal.id == goal_id,
+                SavingsGoal.user_id == current_user.user_id,
+                SavingsGoal.is_active == True
+            )
+        )
+        current_amount = result.scalar_one_or_none()
+        await db.rollback()
+        if current_amount is None:
+            raise HTTPException(status_code=404, detail="Goal not found or inactive")
         raise HTTPException(
-            status_code=400, 
-            detail=f"Cannot withdraw {data.amount}. Current balance: {goal.current_amount}"
+            status_code=400,
+            detail=f"Cannot withdraw {data.amount}. Current balance: {current_amount}"
         )
-    
-    # Create contribution
-    contribution = GoalContribution(
+
+    await db.commit()
+
+    goal = SavingsGoal(**{c.key: getattr(row, c.key) for c in SavingsGoal.__table__.columns})
+    was_completed = row.was_completed
+    contribution = ContributionResponse(
+        id=row.contribution_id,
         goal_id=goal.id,
-        user_id=current_user.user_id,
         amount=data.amount,
         type=data.type.value,
         note=data.note,
-        source=data.source.value
+        source=data.source.value,
+        created_at=row.contribution_created_at
     )
-    db.add(contribution)
-    
-    # Update goal balance
-    if data.type == "deposit":
-        goal.current_amount += data.amount
-    else:
-        goal.current_amount -= data.amount
-    
-    # Check if completed
-    was_completed = goal.is_completed
-    if goal.current_amount >= goal.target_amount and not goal.is_completed:
-        goal.is_completed = True
-        goal.completed_at = datetime.utcnow()
-    
-    goal.updated_at = datetime.utcnow()
-    
-    await db.commit()
-    await db.refresh(goal)
-    await db.refresh(contribution)
     
     # Invalidate cache
-    await cache_service.delete_pattern(f"goals:{current_user.user_id}:*")
+    await _invalidate_goals(current_user.user_id)
     
     # Calculate XP (can be expanded with gamification service)
     xp_earned = 0
@@ -405,15 +394,7 @@ async def contribute_to_goal(
     return QuickDepositResponse(
         success=True,
         goal=goal_to_response(goal),
-        contribution=ContributionResponse(
-            id=contribution.id,
-            goal_id=contribution.goal_id,
-            amount=contribution.amount,
-            type=contribution.type,
-            note=contribution.note,
-            source=contribution.source,
-            created_at=contribution.created_at
-        ),
+        contribution=contribution,
         new_balance=goal.current_amount,
         progress_percent=round(goal.current_amount / goal.target_amount * 100, 1),
         is_completed=goal.is_completed,
@@ -511,7 +492,7 @@ async def mark_goal_complete(
     await db.commit()
     await db.refresh(goal)
     
-    await cache_service.delete_pattern(f"goals:{current_user.user_id}:*")
+    await _invalidate_goals(current_user.user_id)
     
     return goal_to_response(goal)
 
@@ -542,6 +523,6 @@ async def reactivate_goal(
     await db.commit()
     await db.refresh(goal)
     
-    await cache_service.delete_pattern(f"goals:{current_user.user_id}:*")
+    await _invalidate_goals(current_user.user_id)
     
     return goal_to_response(goal)
@@ -9,7 +9,7 @@ from ...models import Income, User
 from ...schemas import IncomeCreate, IncomeUpdate, Income as IncomeSchema, PaginatedResponse
 from ...utils.auth import get_current_user
 from ...services.cache import cache_service
-from ...services.memory_cache import hybrid_cache
+from ...services.memory_cache import hybrid_cache, user_data_scope
 from ...services.websocket import ws_manager
 from ...services.gamification import GamificationService
 
@@ -40,6 +40,7 @@ async def create_income(
     await cache_service.delete_pattern(f"overview:{current_user.user_id}:*")
     await hybrid_cache.delete_pattern(f"batch:{current_user.user_id}:*")
     await hybrid_cache.delete_pattern(f"transactions:{current_user.user_id}:*")
+    await hybrid_cache.bump_generation(user_data_scope(current_user.user_id))
     
     # Геймификация
     gamification = GamificationService(db)
@@ -165,6 +166,8 @@ async def update_income(
     
     await db.commit()
     await db.refresh(income)
+    
+    await hybrid_cache.bump_generation(user_data_scope(current_user.user_id))
     return income
 
 
@@ -196,6 +199,7 @@ async def delete_income(
     await cache_service.delete_pattern(f"overview:{current_user.user_id}:*")
     await hybrid_cache.delete_pattern(f"batch:{current_user.user_id}:*")
     await hybrid_cache.delete_pattern(f"transactions:{current_user.user_id}:*")
+    await hybrid_cache.bump_generation(user_data_scope(current_user.user_id))
     
     # WebSocket уведомление
     await ws_manager.send_personal_message({
@@ -1,15 +1,19 @@
 """
 API эндпоинты для онбординга пользователей
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text, update
 from datetime import datetime
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
 import json
 
 from ...database import get_db
 from ...models import User
 from ...utils.auth import get_current_user
+from ...services.memory_cache import hybrid_cache, categories_scope
+from ...services.response_cache import response_cache, PRIVATE_DAY
 from ...schemas.onboarding import (
     OnboardingStatus,
     Step1Currency,
@@ -77,8 +81,9 @@ BUSINESS_INCOME_CATEGORIES = [
 ]
 
 
+@lru_cache(maxsize=None)
 def get_categories_for_type(usage_type: str) -> CategoryTemplates:
-    """Получить шаблоны категорий для типа использования"""
+    """Получить шаблоны категорий для типа использования (кэшируется на процесс)"""
     if usage_type == "business":
         return CategoryTemplates(
             expense_categories=BUSINESS_EXPENSE_CATEGORIES,
@@ -91,6 +96,89 @@ def get_categories_for_type(usage_type: str) -> CategoryTemplates:
         )
 
 
+# === Провижининг категорий ===
+
+# Удаление старых категорий и вставка всего набора шаблонов одним запросом.
+# Колонки передаются массивами и разворачиваются через unnest.
+PROVISION_CATEGORIES_QUERY = text("""
+    WITH removed AS (
+        DELETE FROM categories WHERE user_id = :user_id
+    )
+    INSERT INTO categories (user_id, name, type, icon, color, is_default, is_active, sort_order)
+    SELECT :user_id, t.name, t.type, t.icon, t.color, false, true, t.sort_order
+    FROM unnest(
+        CAST(:names AS varchar[]),
+        CAST(:types AS varchar[]),
+        CAST(:icons AS varchar[]),
+        CAST(:colors AS varchar[]),
+        CAST(:sort_orders AS integer[])
+    ) AS t(name, type, icon, color, sort_order)
+""")
+
+
+@lru_cache(maxsize=None)
+def _render_template_rows(usage_type: str) -> Tuple[Tuple[str, str, str, str, str], ...]:
+    """Развернуть шаблоны в строки (code, name, type, icon, color) — расходы, затем доходы"""
+    templates = get_categories_for_type(usage_type)
+    return tuple(
+        (cat.code, cat.name, cat.type, cat.icon, cat.color)
+        for cat in (*templates.expense_categories, *templates.income_categories)
+    )
+
+
+def _build_provision_params(
+    user_id: int,
+    usage_type: str,
+    selected_codes: Optional[Iterable[str]] = None
+) -> dict:
+    """
+    Подготовить параметры для PROVISION_CATEGORIES_QUERY.
+    Выбранные категории расходов идут первыми, невыбранные — после них (+100).
+    Если selected_codes не передан, выбранными считаются все категории.
+    """
+    selected = None if selected_codes is None else set(selected_codes)
+    names, types, icons, colors, sort_orders = [], [], [], [], []
+    counters = {"expense": 1, "income": 1}
+    
+    for code, name, cat_type, icon, color in _render_template_rows(usage_type):
+        order = counters[cat_type]
+        is_selected = cat_type == "income" or selected is None or code in selected
+        if is_selected:
+            counters[cat_type] += 1
+        else:
+            order += 100
+        
+        names.append(name)
+        types.append(cat_type)
+        icons.append(icon)
+        colors.append(color)
+        sort_orders.append(order)
+    
+    return {
+        "user_id": user_id,
+        "names": names,
+        "types": types,
+        "icons": icons,
+        "colors": colors,
+        "sort_orders": sort_orders
+    }
+
+
+async def provision_categories(
+    db: AsyncSession,
+    user_id: int,
+    usage_type: str,
+    selected_codes: Optional[Iterable[str]] = None
+) -> int:
+    """
+    Пересоздать категории пользователя из шаблонов одним запросом.
+    Коммит остаётся на вызывающей стороне. Возвращает количество созданных категорий.
+    """
+    params = _build_provision_params(user_id, usage_type or "personal", selected_codes)
+    await db.execute(PROVISION_CATEGORIES_QUERY, params)
+    return len(params["names"])
+
+
 # === API Endpoints ===
 
 @router.get("/status", response_model=OnboardingStatus)
@@ -115,12 +203,21 @@ async def get_onboarding_status(
 @router.get("/categories/{usage_type}", response_model=CategoryTemplates)
 async def get_category_templates(
     usage_type: str,
+    request: Request,
     current_user: User = Depends(get_current_user)
 ):
     """Получить шаблоны категорий для типа использования"""
     if usage_type not in ["personal", "business"]:
         raise HTTPException(status_code=400, detail="Invalid usage type")
-    return get_categories_for_type(usage_type)
+    
+    async def produce():
+        return get_categories_for_type(usage_type).model_dump(mode="json")
+    
+    # Шаблоны статические — ответ сериализуется один раз на процесс/Redis
+    return await response_cache.cached(
+        request, hybrid_cache.make_key("onboarding_templates", usage_type), produce,
+        ttl=86400, cache_control=PRIVATE_DAY
+    )
 
 
 @router.post("/step/1", response_model=OnboardingStepResponse)
@@ -257,56 +354,13 @@ async def save_step4_categories(
 ):
     """Шаг 4: Создать категории на основе выбора"""
     
-    # Получаем тип использования
-    usage_type = current_user.usage_type or "personal"
-    templates = get_categories_for_type(usage_type)
-    
-    # Удаляем старые пользовательские категории (если есть)
-    delete_old = text("""
-        DELETE FROM categories WHERE user_id = :user_id
-    """)
-    await db.execute(delete_old, {"user_id": current_user.user_id})
-    
-    # Создаём категории расходов
-    sort_order = 1
-    for cat in templates.expense_categories:
-        is_selected = cat.code in data.selected_categories
-        order = sort_order if is_selected else sort_order + 100
-        
-        insert_cat = text("""
-            INSERT INTO categories (user_id, name, type, icon, color, is_default, is_active, sort_order)
-            VALUES (:user_id, :name, :type, :icon, :color, false, true, :sort_order)
-        """)
-        
-        await db.execute(insert_cat, {
-            "user_id": current_user.user_id,
-            "name": cat.name,
-            "type": cat.type,
-            "icon": cat.icon,
-            "color": cat.color,
-            "sort_order": order
-        })
-        
-        if is_selected:
-            sort_order += 1
-    
-    # Создаём категории доходов
-    sort_order = 1
-    for cat in templates.income_categories:
-        insert_cat = text("""
-            INSERT INTO categories (user_id, name, type, icon, color, is_default, is_active, sort_order)
-            VALUES (:user_id, :name, :type, :icon, :color, false, true, :sort_order)
-        """)
-        
-        await db.execute(insert_cat, {
-            "user_id": current_user.user_id,
-            "name": cat.name,
-            "type": cat.type,
-            "icon": cat.icon,
-            "color": cat.color,
-            "sort_order": sort_order
-        })
-        sort_order += 1
+    # Пересоздаём категории из шаблонов одним запросом
+    created = await provision_categories(
+        db,
+        current_user.user_id,
+        current_user.usage_type or "personal",
+        data.selected_categories
+    )
     
     # Обновляем шаг
     update_step = text("""
@@ -315,11 +369,12 @@ async def save_step4_categories(
     await db.execute(update_step, {"user_id": current_user.user_id})
     
     await db.commit()
+    await hybrid_cache.bump_generation(categories_scope(current_user.user_id))
     
     return OnboardingStepResponse(
         success=True,
         step=4,
-        message=f"Создано категорий: {len(templates.expense_categories) + len(templates.income_categories)}",
+        message=f"Создано категорий: {created}",
         next_step=5
     )
 
@@ -476,6 +531,7 @@ async def get_onboarding_summary(
 
 @router.post("/reset")
 async def reset_onboarding(
+    reset_categories: bool = Query(False, description="Пересоздать категории из шаблонов"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
@@ -491,6 +547,21 @@ async def reset_onboarding(
         WHERE telegram_chat_id = :user_id
     """)
     await db.execute(update_query, {"user_id": current_user.user_id})
+    
+    categories_created = 0
+    if reset_categories:
+        categories_created = await provision_categories(
+            db,
+            current_user.user_id,
+            current_user.usage_type or "personal"
+        )
+    
     await db.commit()
+    if reset_categories:
+        await hybrid_cache.bump_generation(categories_scope(current_user.user_id))
     
-    return {"success": True, "message": "Onboarding reset successfully"}
+    return {
+        "success": True,
+        "message": "Onboarding reset successfully",
+        "categories_created": categories_created
+    }
@@ -2,11 +2,12 @@
 Exchange Rates API endpoints
 Курсы валют и конвертация
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, desc, func
 from typing import List, Optional
 from datetime import date, datetime
+import logging
 
 from app.database import get_db
 from app.models.models import User, ExchangeRate
@@ -20,12 +21,20 @@ from app.schemas.rate import (
 )
 from app.utils.auth import get_current_user
 from app.services.currency import CurrencyService
+from app.services.memory_cache import hybrid_cache
+from app.services.response_cache import response_cache, PRIVATE_SHORT
+
+# Курсы обновляются раз в день (n8n ExchangeRates_Daily) и через POST /rates
+RATES_CACHE_TTL = 300
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
 @router.get("/latest", response_model=List[ExchangeRateSchema])
 async def get_latest_rates(
+    request: Request,
     from_currency: Optional[str] = Query(None, description="Фильтр по базовой валюте"),
     to_currency: Optional[str] = Query(None, description="Фильтр по целевой валюте"),
     current_user: User = Depends(get_current_user),
@@ -35,6 +44,19 @@ async def get_latest_rates(
     Получить актуальные курсы валют
     Возвращает последние курсы для каждой валютной пары
     """
+    cache_key = hybrid_cache.make_key("rates", "latest", from_currency, to_currency)
+    return await response_cache.cached(
+        request, cache_key,
+        lambda: _fetch_latest_rates(db, from_currency, to_currency),
+        ttl=RATES_CACHE_TTL, cache_control=PRIVATE_SHORT
+    )
+
+
+async def _fetch_latest_rates(
+    db: AsyncSession,
+    from_currency: Optional[str],
+    to_currency: Optional[str]
+) -> List[dict]:
     # Подзапрос для получения последней даты для каждой пары
     subquery = (
         select(
@@ -67,11 +89,12 @@ async def get_latest_rates(
     result = await db.execute(query)
     rates = result.scalars().all()
     
-    return rates
+    return [ExchangeRateSchema.model_validate(r).model_dump(mode="json") for r in rates]
 
 
 @router.get("/history", response_model=List[ExchangeRateSchema])
 async def get_rates_history(
+    request: Request,
     from_currency: str = Query(..., description="Базовая валюта"),
     to_currency: str = Query(..., description="Целевая валюта"),
     start_date: Optional[date] = Query(None, description="Начальная дата (YYYY-MM-DD)"),
@@ -82,6 +105,23 @@ async def get_rates_history(
     """
     Получить историю курсов валют
     """
+    cache_key = hybrid_cache.make_key(
+        "rates", "history", from_currency.upper(), to_currency.upper(), start_date, end_date
+    )
+    return await response_cache.cached(
+        request, cache_key,
+        lambda: _fetch_rates_history(db, from_currency, to_currency, start_date, end_date),
+        ttl=RATES_CACHE_TTL, cache_control=PRIVATE_SHORT
+    )
+
+
+async def _fetch_rates_history(
+    db: AsyncSession,
+    from_currency: str,
+    to_currency: str,
+    start_date: Optional[date],
+    end_date: Optional[date]
+) -> List[dict]:
     query = select(ExchangeRate).where(
         and_(
             ExchangeRate.from_currency == from_currency.upper(),
@@ -105,7 +145,7 @@ async def get_rates_history(
             detail=f"No rates found for {from_currency}/{to_currency}"
         )
     
-    return rates
+    return [ExchangeRateSchema.model_validate(r).model_dump(mode="json") for r in rates]
 
 
 @router.get("/{from_currency}/{to_currency}", response_model=ExchangeRateSchema)
@@ -234,9 +274,6 @@ async def convert_currency_batch(
             ]
         }
     """
-    import logging
-    logger = logging.getLogger(__name__)
-    
     logger.info(f"🔄 Batch conversion: {len(batch_request.conversions)} requests")
     
     # Извлекаем данные для batch обработки
@@ -329,6 +366,8 @@ async def create_rate(
     await db.commit()
     await db.refresh(rate)
     
+    await response_cache.invalidate("rates:*")
+    
     return rate
 
 
@@ -14,10 +14,18 @@ from ...schemas.recurring import (
     MarkPaidRequest,
 )
 from ...utils.auth import get_current_user_id
+from ...services.memory_cache import hybrid_cache, recurring_scope
+from ...services.summaries import cached_summary, upcoming_recurring
+from ...services.query_budget import query_budget
 
 router = APIRouter(prefix="/recurring", tags=["recurring-payments"])
 
 
+async def _bump_recurring(user_id: int) -> None:
+    """Инвалидировать кэш сводки регулярных платежей пользователя"""
+    await hybrid_cache.bump_generation(recurring_scope(user_id))
+
+
 def calculate_next_date(current_date: date, frequency: str, interval: int = 1) -> date:
     """Вычисляет следующую дату платежа на основе частоты"""
     if frequency == "daily":
@@ -101,6 +109,7 @@ async def get_recurring_payments(
 
 
 @router.get("/upcoming/summary")
+@query_budget(3)
 async def get_upcoming_summary(
     db: AsyncSession = Depends(get_db),
     user_id: int = Depends(get_current_user_id),
@@ -108,43 +117,10 @@ async def get_upcoming_summary(
 ):
     """Получить сводку предстоящих платежей на N дней"""
     today = date.today()
-    end_date = today + timedelta(days=days)
-    
-    query = select(RecurringPayment).where(
-        RecurringPayment.user_id == user_id,
-        RecurringPayment.is_active == True,
-        RecurringPayment.next_payment_date <= end_date
-    ).order_by(RecurringPayment.next_payment_date)
-    
-    result = await db.execute(query)
-    payments = result.scalars().all()
-    
-    # Группируем по валюте
-    totals_by_currency = {}
-    for p in payments:
-        if p.currency not in totals_by_currency:
-            totals_by_currency[p.currency] = 0
-        totals_by_currency[p.currency] += float(p.amount)
-    
-    # Ближайшие платежи
-    upcoming = []
-    for p in payments[:5]:
-        upcoming.append({
-            "id": p.id,
-            "title": p.title,
-            "amount": float(p.amount),
-            "currency": p.currency,
-            "category": p.category,
-            "next_payment_date": p.next_payment_date.isoformat(),
-            "days_until": (p.next_payment_date - today).days
-        })
-    
-    return {
-        "period_days": days,
-        "total_payments": len(payments),
-        "totals_by_currency": totals_by_currency,
-        "upcoming": upcoming
-    }
+    return await cached_summary(
+        "recurring", recurring_scope(user_id), user_id, [today.isoformat(), days],
+        lambda: upcoming_recurring(db, user_id, today, days),
+    )
 
 
 @router.get("/{payment_id}", response_model=RecurringPaymentResponse)
@@ -195,6 +171,7 @@ async def create_recurring_payment(
     
     db.add(payment)
     await db.commit()
+    await _bump_recurring(user_id)
     await db.refresh(payment)
     
     return payment_to_response(payment, date.today())
@@ -223,6 +200,7 @@ async def update_recurring_payment(
         setattr(payment, field, value)
     
     await db.commit()
+    await _bump_recurring(user_id)
     await db.refresh(payment)
     
     return payment_to_response(payment, date.today())
@@ -247,6 +225,7 @@ async def delete_recurring_payment(
     
     payment.is_active = False
     await db.commit()
+    await _bump_recurring(user_id)
     
     return {"success": True, "message": f"Платёж '{payment.title}' деактивирован"}
 
@@ -307,6 +286,7 @@ async def mark_payment_as_paid(
         payment.is_active = False
     
     await db.commit()
+    await _bump_recurring(user_id)
     await db.refresh(payment)
     
     return payment_to_response(payment, date.today())
@@ -5,10 +5,9 @@ Reports API endpoints
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
+from sqlalchemy import text, select, desc
 from typing import Optional, Dict, Any, List
 from datetime import date, datetime, timedelta
-import httpx
 import os
 import io
 import csv
@@ -21,6 +20,7 @@ from app.models.models import User, SavedReport
 from app.schemas.report import ReportRequest, ReportResponse, ReportType
 from app.utils.auth import get_current_user
 from app.config import settings, Settings
+from app.services.timeseries import balance_series
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +29,9 @@ router = APIRouter()
 # APITemplate.io настройки
 APITEMPLATE_BASE_URL = "https://rest.apitemplate.io/v2"
 
+# Точек в графике баланса отчёта (месяц — по дням, год — по неделям/месяцам)
+REPORT_TREND_MAX_POINTS = 62
+
 
 def _get_report_settings() -> Settings:
     """Load settings from environment/.env.
@@ -193,39 +196,10 @@ async def fetch_report_data(
     )
     top_categories = top_cat_result.fetchall()
     
-    # Тренд баланса - используем прямой запрос вместо функции
-    trend_query = text("""
-        SELECT 
-            COALESCE(i.date, e.date) as date,
-            COALESCE(i.amount, 0) as income,
-            COALESCE(e.amount, 0) as expense,
-            COALESCE(i.amount, 0) - COALESCE(e.amount, 0) as balance
-        FROM (
-            SELECT date, SUM(amount) as amount
-            FROM income
-            WHERE user_id = :user_id
-                AND date >= :start_date
-                AND date <= :end_date
-                AND deleted_at IS NULL
-            GROUP BY date
-        ) i
-        FULL OUTER JOIN (
-            SELECT date, SUM(amount) as amount
-            FROM expenses
-            WHERE user_id = :user_id
-                AND date >= :start_date
-                AND date <= :end_date
-                AND deleted_at IS NULL
-            GROUP BY date
-        ) e ON i.date = e.date
-        ORDER BY COALESCE(i.date, e.date)
-    """)
-    trend_result = await db.execute(trend_query, {
-        "user_id": user_id,
-        "start_date": start_date,
-        "end_date": end_date
-    })
-    trend = trend_result.fetchall()
+    # Тренд баланса: плотный ряд с нарастающим итогом, длинные периоды укрупняются
+    trend = await balance_series(
+        db, user_id, start_date, end_date, bucket="day", max_points=REPORT_TREND_MAX_POINTS
+    )
     
     # Все транзакции за период
     transactions_query = text("""
@@ -280,10 +254,11 @@ async def fetch_report_data(
         ],
         "balance_trend": [
             {
-                "date": str(t[0]),
-                "income": float(t[1]) if len(t) > 1 and t[1] is not None else 0.0,
-                "expense": float(t[2]) if len(t) > 2 and t[2] is not None else 0.0,
-                "balance": float(t[3]) if len(t) > 3 and t[3] is not None else 0.0
+                "date": str(t["period"]),
+                "income": t["income"],
+                "expense": t["expense"],
+                "balance": t["balance"],
+                "cumulative_balance": t["cumulative_balance"]
             }
             for t in trend
         ],
@@ -338,6 +313,9 @@ async def generate_pdf_via_apitemplate(
     logger.info(f"   URL: {url}")
     logger.info(f"   Data keys: {list(data.keys())}")
     
+    # httpx нужен только для PDF — не импортируем его при старте приложения
+    import httpx
+
     async with httpx.AsyncClient(timeout=60.0) as client:
         try:
             response = await client.post(url, json=payload, headers=headers)
@@ -614,8 +592,6 @@ async def get_report_history(
     """
     История сгенерированных отчётов
     """
-    from sqlalchemy import select, desc
-    
     # Получаем сохраненные отчеты
     query = select(SavedReport).where(
         SavedReport.user_id == current_user.user_id
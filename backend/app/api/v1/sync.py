@@ -0,0 +1,41 @@
+"""
+Sync API endpoints
+Дельта-синхронизация локального хранилища мини-приложения
+"""
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from app.database import get_db
+from app.models.models import User
+from app.schemas.sync import SyncResponse
+from app.utils.auth import get_current_user
+from app.utils.serialization import FastJSONResponse
+from app.services.sync import SyncService, parse_cursor, DEFAULT_LIMIT
+from app.services.query_budget import query_budget
+
+router = APIRouter()
+
+
+@router.get("", response_model=SyncResponse)
+@query_budget(9)  # пользователь, состояние, 6 сущностей, удаления
+async def get_changes(
+    since: Optional[str] = Query(None, description="Курсор из предыдущего ответа; пусто — полный снимок"),
+    limit: int = Query(DEFAULT_LIMIT, ge=1, le=2000, description="Максимум изменений в ответе"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Изменения expenses, income, categories, budgets, goals и debts после курсора
+
+    Клиент применяет upserted/deleted, сохраняет cursor и передаёт его в
+    следующий запрос. При has_more = true — сразу запросить следующую порцию.
+    При full = true — локальные данные заменяются снимком целиком.
+    """
+    try:
+        since_seq = parse_cursor(since)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync cursor")
+
+    result = await SyncService(db).changes(current_user.user_id, since=since_seq, limit=limit)
+    return FastJSONResponse(result, headers={"Cache-Control": "private, no-store"})
@@ -1,22 +1,34 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
 from sqlalchemy import select, union_all, func, literal, or_, update
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from datetime import date
 from decimal import Decimal
+import logging
 
 from app.database import get_db
 from app.models.models import User, Expense, Income
 from app.utils.auth import get_current_user
 from app.schemas.schemas import PaginatedResponse
-from app.services.memory_cache import hybrid_cache
+from app.services.cache import cache_service
+from app.services.memory_cache import hybrid_cache, user_data_scope
+from app.services.response_cache import response_cache, PRIVATE_REVALIDATE
+from app.services.query_budget import query_budget
+from app.utils.serialization import FastJSONResponse
+from app.services.search import TransactionSearchService, escape_like
+from app.schemas.search import SearchResponse
+from app.services.websocket import ws_manager
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
 
 @router.get("")
+@query_budget(3)  # пользователь, COUNT, страница
 async def get_transactions(
+    request: Request,
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(50, ge=1, le=100, description="Items per page"),
     type: Optional[str] = Query(None, description="Filter by type: 'expense' or 'income'"),
@@ -34,9 +46,6 @@ async def get_transactions(
     Транзакции возвращаются отсортированными по дате (сначала новые).
     Конвертация валют выполняется на фронтенде.
     """
-    import logging
-    logger = logging.getLogger(__name__)
-    
     # Кэшируем только первую страницу без поиска (основной кейс)
     cache_key = None
     if page == 1 and not search and not amount_min and not amount_max:
@@ -48,10 +57,13 @@ async def get_transactions(
             str(start_date) if start_date else "none",
             str(end_date) if end_date else "none"
         )
-        cached = await hybrid_cache.get(cache_key)
+        cached = await response_cache.get(cache_key)
         if cached:
-            logger.warning(f"[TRANSACTIONS] Cache HIT for user {current_user.user_id}")
-            return cached
+            logger.debug(f"[TRANSACTIONS] Cache HIT for user {current_user.user_id}")
+            return await response_cache.respond(request, cached, PRIVATE_REVALIDATE)
+    
+    # ILIKE по описанию обслуживается триграммным индексом (migrations/007)
+    search_pattern = f"%{escape_like(search)}%" if search else None
     
     # Базовый запрос для expenses
     expenses_query = select(
@@ -93,7 +105,7 @@ async def get_transactions(
         if end_date:
             expenses_query = expenses_query.where(Expense.date <= end_date)
         if search:
-            expenses_query = expenses_query.where(Expense.description.ilike(f"%{search}%"))
+            expenses_query = expenses_query.where(Expense.description.ilike(search_pattern, escape="\\"))
         if amount_min is not None:
             expenses_query = expenses_query.where(Expense.amount >= Decimal(str(amount_min)))
         if amount_max is not None:
@@ -106,7 +118,7 @@ async def get_transactions(
         
         # Пагинированный запрос
         skip = (page - 1) * page_size
-        final_query = expenses_query.order_by(Expense.date.desc()).offset(skip).limit(page_size)
+        final_query = expenses_query.order_by(Expense.date.desc(), Expense.created_at.desc()).offset(skip).limit(page_size)
         
     elif type == "income":
         # Только доходы
@@ -117,7 +129,7 @@ async def get_transactions(
         if end_date:
             income_query = income_query.where(Income.date <= end_date)
         if search:
-            income_query = income_query.where(Income.description.ilike(f"%{search}%"))
+            income_query = income_query.where(Income.description.ilike(search_pattern, escape="\\"))
         if amount_min is not None:
             income_query = income_query.where(Income.amount >= Decimal(str(amount_min)))
         if amount_max is not None:
@@ -130,7 +142,7 @@ async def get_transactions(
         
         # Пагинированный запрос
         skip = (page - 1) * page_size
-        final_query = income_query.order_by(Income.date.desc()).offset(skip).limit(page_size)
+        final_query = income_query.order_by(Income.date.desc(), Income.created_at.desc()).offset(skip).limit(page_size)
         
     else:
         # Применяем фильтры к отдельным запросам до объединения
@@ -144,8 +156,8 @@ async def get_transactions(
             expenses_query = expenses_query.where(Expense.date <= end_date)
             income_query = income_query.where(Income.date <= end_date)
         if search:
-            expenses_query = expenses_query.where(Expense.description.ilike(f"%{search}%"))
-            income_query = income_query.where(Income.description.ilike(f"%{search}%"))
+            expenses_query = expenses_query.where(Expense.description.ilike(search_pattern, escape="\\"))
+            income_query = income_query.where(Income.description.ilike(search_pattern, escape="\\"))
         if amount_min is not None:
             expenses_query = expenses_query.where(Expense.amount >= Decimal(str(amount_min)))
             income_query = income_query.where(Income.amount >= Decimal(str(amount_min)))
@@ -165,7 +177,8 @@ async def get_transactions(
         # Пагинированный запрос
         skip = (page - 1) * page_size
         final_query = combined_query.order_by(
-            combined_subquery.c.date.desc()
+            combined_subquery.c.date.desc(),
+            combined_subquery.c.created_at.desc()
         ).offset(skip).limit(page_size)
     
     result = await db.execute(final_query)
@@ -204,12 +217,47 @@ async def get_transactions(
         "has_prev": page > 1
     }
     
-    # Кэшируем на 5 минут
+    # Кэшируем на 5 минут (готовое тело с ETag)
     if cache_key:
-        await hybrid_cache.set(cache_key, result_data, ttl=300)
-        logger.warning(f"[TRANSACTIONS] Cached for user {current_user.user_id}")
+        entry = await response_cache.store(cache_key, result_data, ttl=300)
+        logger.debug(f"[TRANSACTIONS] Cached for user {current_user.user_id}")
+        return await response_cache.respond(request, entry, PRIVATE_REVALIDATE)
     
-    return result_data
+    # Словари уже «чистые» — кодируем напрямую, без jsonable_encoder
+    return FastJSONResponse(result_data)
+
+
+@router.get("/search", response_model=SearchResponse)
+async def search_transactions(
+    q: str = Query(..., min_length=1, max_length=200, description="Search query"),
+    type: Optional[str] = Query(None, description="Filter by type: 'expense' or 'income'"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    amount_min: Optional[float] = Query(None, description="Minimum amount"),
+    amount_max: Optional[float] = Query(None, description="Maximum amount"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Ранжированный поиск по описанию и категории транзакций.
+    Возвращает сниппеты с подсветкой (<mark>) и фасеты по категориям и суммам.
+    """
+    service = TransactionSearchService(db)
+    return await service.search(
+        current_user.user_id,
+        q,
+        type=type,
+        category=category,
+        start_date=start_date,
+        end_date=end_date,
+        amount_min=amount_min,
+        amount_max=amount_max,
+        limit=limit,
+        offset=offset,
+    )
 
 
 @router.delete("")
@@ -261,18 +309,16 @@ async def _clear_transactions(type: Optional[str], current_user: User, db: Async
 
     # Invalidate caches
     try:
-        from ...services.cache import cache_service
-        from ...services.memory_cache import hybrid_cache
         await cache_service.delete_pattern(f"stats:{current_user.user_id}:*")
         await cache_service.delete_pattern(f"overview:{current_user.user_id}:*")
         await hybrid_cache.delete_pattern(f"batch:{current_user.user_id}:*")
         await hybrid_cache.delete_pattern(f"transactions:{current_user.user_id}:*")
+        await hybrid_cache.bump_generation(user_data_scope(current_user.user_id))
     except Exception:
         pass
 
     # Websocket notification
     try:
-        from ...services.websocket import ws_manager
         await ws_manager.send_personal_message({
             "type": "transactions_cleared",
             "data": {"deleted_expenses": deleted_expenses, "deleted_income": deleted_income}
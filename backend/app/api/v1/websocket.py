@@ -64,12 +64,12 @@ async def websocket_endpoint(
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected normally: user_id={user_id}")
         if user_id:
-            ws_manager.disconnect(websocket, user_id)
+            await ws_manager.disconnect(websocket, user_id)
     
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
         if user_id:
-            ws_manager.disconnect(websocket, user_id)
+            await ws_manager.disconnect(websocket, user_id)
         try:
             await websocket.close()
         except:
@@ -78,8 +78,10 @@ async def websocket_endpoint(
 
 @router.get("/ws/stats")
 async def get_websocket_stats():
-    """Получить статистику WebSocket соединений"""
+    """Получить статистику WebSocket соединений (этого worker)"""
     return {
         "active_users": ws_manager.get_active_users_count(),
-        "active_connections": ws_manager.get_active_connections_count()
+        "active_connections": ws_manager.get_active_connections_count(),
+        "worker_id": ws_manager.worker_id,
+        "backplane": ws_manager.backplane.name
     }
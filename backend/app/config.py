@@ -39,6 +39,34 @@ class Settings(BaseSettings):
     # Redis (опционально, только для production)
     REDIS_URL: str = ""
     
+    # Количество процессов uvicorn (Procfile/railway.json: --workers $WEB_CONCURRENCY).
+    # Больше 1 — L1 кэши согласуются через Redis (services/memory_cache.py)
+    WEB_CONCURRENCY: int = 1
+    # Секунды, в течение которых поколение L1 не перечитывается из Redis (0 — каждый раз)
+    CACHE_L1_CHECK_INTERVAL: float = 0.0
+    
+    # Сжатие ответов (уровни: gzip 1-9, brotli 0-11)
+    COMPRESSION_MIN_SIZE: int = 500
+    GZIP_LEVEL: int = 5
+    BROTLI_QUALITY: int = 4
+    # Закэшированные ответы сжимаются один раз на версию — можно сильнее
+    CACHED_GZIP_LEVEL: int = 9
+    CACHED_BROTLI_QUALITY: int = 9
+    
+    # Метрики Prometheus на /metrics — только с Authorization: Bearer <METRICS_TOKEN>;
+    # без токена эндпоинт отдаёт 404 (кроме DEBUG, где он открыт)
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: str = ""
+    # Один отпечаток SQL столько раз за запрос — предупреждение о N+1
+    QUERY_REPEAT_THRESHOLD: int = 5
+    # Заголовки X-DB-Queries / X-DB-Time-Ms / X-DB-Max-Repeat (для tools/query_budget_check.py)
+    QUERY_DEBUG_HEADERS: bool = False
+    # Журнал медленных запросов (/api/v1/admin/slow-queries): порог в мс (0 — выключен),
+    # размер кольцевого буфера и фоновый EXPLAIN (без ANALYZE) для новых отпечатков
+    SLOW_QUERY_MS: int = 500
+    SLOW_QUERY_BUFFER: int = 200
+    SLOW_QUERY_EXPLAIN: bool = False
+    
     # APITemplate.io (для генерации PDF отчётов)
     APITEMPLATE_API_KEY: str = ""
     WEEKLY_TEMPLATE_ID: str = ""
@@ -1,12 +1,22 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
+from sqlalchemy import text
 from .config import settings
+from .database import engine
 from .api.v1 import router as api_v1_router
 from .services.cache import cache_service
 from .services.memory_cache import hybrid_cache
+from .services.metrics import metrics, instrument_engine, CONTENT_TYPE, WS_CONNECTIONS, WS_USERS
+from .services.slow_queries import slow_query_log
+from .services.websocket import ws_manager
+from .services.ws_backplane import RedisBackplane
+from .utils.compression import CompressionMiddleware
+from .utils.request_metrics import MetricsMiddleware
+from .utils.serialization import FastJSONResponse
 import logging
 import os
+import time
 
 # Настройка логирования - в продакшене только WARNING и выше
 log_level = logging.WARNING if not settings.DEBUG else logging.INFO
@@ -27,6 +37,7 @@ app = FastAPI(
     description="AIAccounter - Финансовый учёт с AI",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=FastJSONResponse,
 )
 
 allowed_origins = [
@@ -64,8 +75,35 @@ app.add_middleware(
     max_age=3600
 )
 
-# GZip compression для ответов > 500 байт
-app.add_middleware(GZipMiddleware, minimum_size=500)
+# Сжатие ответов > 500 байт (brotli/gzip по Accept-Encoding);
+# готовые сжатые тела из response_cache проходят без повторного сжатия
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.GZIP_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY
+)
+
+# Время SQL-операторов: метрики запроса и журнал медленных запросов
+instrument_engine(engine)
+slow_query_log.configure(
+    settings.SLOW_QUERY_MS,
+    explain=settings.SLOW_QUERY_EXPLAIN,
+    engine=engine,
+    capacity=settings.SLOW_QUERY_BUFFER
+)
+
+# Метрики снаружи остальных middleware: латентность включает CORS и сжатие
+if settings.METRICS_ENABLED:
+    WS_CONNECTIONS.set_function(ws_manager.get_active_connections_count)
+    WS_USERS.set_function(ws_manager.get_active_users_count)
+    if settings.WEB_CONCURRENCY > 1:
+        metrics.const_labels["worker"] = hybrid_cache.worker_id
+    app.add_middleware(
+        MetricsMiddleware,
+        repeat_threshold=settings.QUERY_REPEAT_THRESHOLD,
+        debug_headers=settings.QUERY_DEBUG_HEADERS
+    )
 
 # Подключаем API роуты
 app.include_router(api_v1_router, prefix=settings.API_V1_PREFIX)
@@ -84,10 +122,18 @@ async def startup_event():
     else:
         logger.info("⚡ Using in-memory cache (Redis not available)")
     
+    # Несколько workers: L1 сверяется с Redis, инвалидации рассылаются по pub/sub
+    if settings.WEB_CONCURRENCY > 1:
+        await hybrid_cache.enable_multiprocess(settings.CACHE_L1_CHECK_INTERVAL)
+    
+    # WebSocket: с Redis сообщения доходят до сокетов в других workers
+    if cache_service.backend == "redis":
+        await ws_manager.start(RedisBackplane(cache_service.redis))
+    else:
+        await ws_manager.start()
+    
     # Прогрев connection pool - создаём первое подключение к БД
     try:
-        from .database import engine
-        from sqlalchemy import text
         async with engine.connect() as conn:
             await conn.execute(text("SELECT 1"))
         logger.info("✅ Database connection pool warmed up")
@@ -99,6 +145,9 @@ async def startup_event():
 async def shutdown_event():
     """Очистка при остановке"""
     logger.info("🛑 Shutting down AIAccounter API...")
+    await ws_manager.stop()
+    await slow_query_log.close()
+    await hybrid_cache.close()
     await cache_service.disconnect()
 
 
@@ -116,8 +165,6 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Проверка здоровья приложения"""
-    from .database import engine
-    from sqlalchemy import text
     db_status = "unknown"
     try:
         async with engine.connect() as conn:
@@ -137,10 +184,6 @@ async def health_check():
 @app.get("/warmup")
 async def warmup():
     """Прогрев приложения - вызывать после деплоя или для keepalive"""
-    from .database import engine
-    from sqlalchemy import text
-    import time
-    
     start = time.time()
     
     # Прогреваем connection pool
@@ -167,6 +210,17 @@ async def cache_stats():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(request: Request):
+    """Метрики процесса в формате Prometheus"""
+    # Без токена метрики открыты только в DEBUG — в проде /metrics не публичен
+    if not settings.METRICS_ENABLED or not (settings.METRICS_TOKEN or settings.DEBUG):
+        raise HTTPException(status_code=404, detail="Not Found")
+    if settings.METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {settings.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -82,6 +82,7 @@ from .debt import (
     DebtPaymentCreate,
     DebtPaymentResponse,
     DebtSummary,
+    DebtCurrencyTotals,
 )
 
 # Onboarding schemas
@@ -101,6 +102,19 @@ from .onboarding import (
     OnboardingCompleteResponse,
 )
 
+# Admin schemas
+from .admin import (
+    AdminSubscriptionState,
+    AdminUserEntry,
+    AdminUserPage,
+)
+
+# Sync schemas
+from .sync import (
+    SyncEntityChanges,
+    SyncResponse,
+)
+
 __all__ = [
     # User
     "UserBase",
@@ -163,6 +177,7 @@ __all__ = [
     "DebtPaymentCreate",
     "DebtPaymentResponse",
     "DebtSummary",
+    "DebtCurrencyTotals",
     # Onboarding
     "UsageType",
     "Currency",
@@ -177,6 +192,13 @@ __all__ = [
     "CategoryTemplates",
     "OnboardingStepResponse",
     "OnboardingCompleteResponse",
+    # Admin
+    "AdminSubscriptionState",
+    "AdminUserEntry",
+    "AdminUserPage",
+    # Sync
+    "SyncEntityChanges",
+    "SyncResponse",
     # Responses
     "MessageResponse",
     "ErrorResponse",
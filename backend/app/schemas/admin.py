@@ -0,0 +1,35 @@
+"""
+Schemas for admin directory
+Поиск пользователей в админке с keyset-пагинацией
+"""
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import datetime
+
+
+class AdminSubscriptionState(BaseModel):
+    """Состояние подписки: active, expired, none или admin"""
+    status: str
+    expires_at: Optional[datetime] = None
+    days_left: Optional[int] = None
+
+
+class AdminUserEntry(BaseModel):
+    user_id: int
+    telegram_chat_id: Optional[int] = None
+    username: Optional[str] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    is_admin: bool = False
+    registered_date: Optional[datetime] = None
+    last_activity: Optional[datetime] = None
+    subscription: Optional[AdminSubscriptionState] = None
+    # today, week, month, dormant или never
+    activity_bucket: Optional[str] = None
+
+
+class AdminUserPage(BaseModel):
+    """Страница справочника; next_cursor передаётся как cursor следующего запроса"""
+    items: List[AdminUserEntry]
+    next_cursor: Optional[int] = None
+    has_more: bool = False
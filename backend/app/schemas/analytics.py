@@ -25,11 +25,12 @@ class TopCategorySchema(BaseModel):
 
 
 class BalanceTrendSchema(BaseModel):
-    """Тренд баланса по дням"""
+    """Тренд баланса по интервалам (день/неделя/месяц)"""
     date: date
     balance: float
     income: float = 0
     expense: float = 0
+    cumulative_balance: float = 0
 
 
 class ChartDataResponse(BaseModel):
@@ -84,7 +84,16 @@ class DebtListResponse(BaseModel):
     net_balance: float  # given - received
 
 
+class DebtCurrencyTotals(BaseModel):
+    """Остатки активных долгов в одной валюте (без конвертации)"""
+    currency: str
+    total_given_remaining: float
+    total_received_remaining: float
+    active_debts_count: int
+
+
 class DebtSummary(BaseModel):
+    # Суммы приведены к currency по последнему курсу
     total_given: float
     total_received: float
     total_given_remaining: float
@@ -93,6 +102,8 @@ class DebtSummary(BaseModel):
     active_debts_count: int
     overdue_count: int
     due_soon_count: int  # В ближайшие 7 дней
+    currency: str = "KGS"
+    by_currency: List[DebtCurrencyTotals] = []
 
 
 # ===== AI INSIGHTS SCHEMAS =====
@@ -142,6 +142,8 @@ class GoalStatsResponse(BaseModel):
     total_saved: float
     total_target: float
     overall_progress: float
+    # total_saved / total_target приведены к currency по последнему курсу
+    currency: str = "KGS"
     nearest_goal: Optional[GoalResponse] = None
     most_funded: Optional[GoalResponse] = None
 
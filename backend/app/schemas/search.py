@@ -0,0 +1,47 @@
+"""
+Schemas for transaction search
+Ранжированный поиск по транзакциям с фасетами
+"""
+from pydantic import BaseModel
+from typing import Optional, List
+
+
+class SearchHit(BaseModel):
+    """Найденная транзакция"""
+    id: int
+    type: str
+    amount: float
+    currency: str
+    category: Optional[str] = None
+    description: Optional[str] = None
+    date: str
+    created_at: Optional[str] = None
+    score: float
+    snippet: Optional[str] = None
+
+
+class CategoryFacet(BaseModel):
+    category: Optional[str] = None
+    count: int
+    total: float
+
+
+class AmountFacet(BaseModel):
+    """Диапазон сумм [min, max); max=None — без верхней границы"""
+    min: float
+    max: Optional[float] = None
+    count: int
+
+
+class SearchFacets(BaseModel):
+    categories: List[CategoryFacet] = []
+    amounts: List[AmountFacet] = []
+
+
+class SearchResponse(BaseModel):
+    query: str
+    items: List[SearchHit]
+    total: int
+    limit: int
+    offset: int
+    facets: SearchFacets
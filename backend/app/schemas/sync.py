@@ -0,0 +1,25 @@
+"""
+Schemas for delta sync
+Ответ GET /sync: изменения данных пользователя после курсора
+"""
+from pydantic import BaseModel
+from typing import Any, Dict, List
+
+
+class SyncEntityChanges(BaseModel):
+    """Изменённые строки целиком и id удалённых"""
+    upserted: List[Dict[str, Any]] = []
+    deleted: List[int] = []
+
+
+class SyncResponse(BaseModel):
+    """
+    cursor передаётся как since следующего запроса.
+    full = True — снимок: локальные данные заменяются целиком.
+    has_more = True — изменений больше limit, запросить ещё раз с новым курсором.
+    """
+    cursor: str
+    full: bool = False
+    has_more: bool = False
+    # expenses, income, categories, budgets, goals, debts
+    changes: Dict[str, SyncEntityChanges]
@@ -0,0 +1,171 @@
+"""
+Admin metrics service
+Счётчики админки за один проход по users и дневные ряды из admin_daily_metrics
+
+Снимок /admin/stats кэшируется на STATS_TTL секунд — частые обновления
+дашборда не конкурируют с пользовательскими запросами. Дневные строки
+пересчитывает refresh_admin_daily_metrics() (migrations/010, n8n
+Admin_Daily_Metrics).
+"""
+
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .memory_cache import hybrid_cache
+
+logger = logging.getLogger(__name__)
+
+STATS_TTL = 60
+DAILY_TTL = 300
+SUBSCRIPTION_PRICE = 300
+
+STATS_QUERY = text("""
+    SELECT
+        COUNT(*) AS total_users,
+        COUNT(*) FILTER (WHERE subscription_expires_at > :now AND is_admin = false) AS active_subscriptions,
+        COUNT(*) FILTER (WHERE subscription_expires_at <= :now) AS expired_subscriptions,
+        COUNT(*) FILTER (WHERE last_activity >= :week_ago) AS new_users_week,
+        COUNT(*) FILTER (WHERE last_activity >= :month_ago) AS new_users_month,
+        COUNT(*) FILTER (WHERE is_admin = true) AS admin_count
+    FROM users
+""")
+
+# Пропущенные дни (job ещё не отработал) возвращаются с нулями
+DAILY_QUERY = text("""
+    SELECT d::date AS day,
+           COALESCE(m.signups, 0) AS signups,
+           COALESCE(m.active_users, 0) AS active_users,
+           COALESCE(m.transactions, 0) AS transactions,
+           COALESCE(m.active_subscriptions, 0) AS active_subscriptions
+    FROM generate_series(CAST(:start_date AS date), CAST(:end_date AS date), interval '1 day') AS d
+    LEFT JOIN admin_daily_metrics m ON m.day = d::date
+    ORDER BY d
+""")
+
+REFRESH_QUERY = text("SELECT refresh_admin_daily_metrics(CAST(:day AS date))")
+
+# Пользователь и его агрегаты за период одним запросом (индексы idx_*_live_user_created)
+USER_STATS_QUERY = text("""
+    SELECT u.user_id,
+           e.total_expenses, e.expense_count,
+           i.total_income, i.income_count,
+           top.category AS top_category
+    FROM users u
+    LEFT JOIN LATERAL (
+        SELECT COALESCE(SUM(amount), 0) AS total_expenses, COUNT(*) AS expense_count
+        FROM expenses
+        WHERE user_id = u.user_id AND created_at >= :start_date AND deleted_at IS NULL
+    ) e ON true
+    LEFT JOIN LATERAL (
+        SELECT COALESCE(SUM(amount), 0) AS total_income, COUNT(*) AS income_count
+        FROM income
+        WHERE user_id = u.user_id AND created_at >= :start_date AND deleted_at IS NULL
+    ) i ON true
+    LEFT JOIN LATERAL (
+        SELECT category
+        FROM expenses
+        WHERE user_id = u.user_id AND created_at >= :start_date AND deleted_at IS NULL
+        GROUP BY category
+        ORDER BY SUM(amount) DESC
+        LIMIT 1
+    ) top ON true
+    WHERE u.user_id = :user_id
+""")
+
+
+class AdminMetricsService:
+    """Снимки статистики админки"""
+
+    STATS_KEY = hybrid_cache.make_key("admin", "stats")
+
+    async def get_stats(self, db: AsyncSession, refresh: bool = False) -> Dict[str, Any]:
+        """Сводные счётчики по пользователям и подпискам"""
+        if not refresh:
+            cached = await hybrid_cache.get(self.STATS_KEY)
+            if cached is not None:
+                return cached
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        row = (await db.execute(STATS_QUERY, {
+            "now": now,
+            "week_ago": now - timedelta(days=7),
+            "month_ago": now - timedelta(days=30),
+        })).one()
+
+        total_users = int(row.total_users or 0)
+        active_subs = int(row.active_subscriptions or 0)
+        stats = {
+            "total_users": total_users,
+            "active_subscriptions": active_subs,
+            "expired_subscriptions": int(row.expired_subscriptions or 0),
+            "new_users_week": int(row.new_users_week or 0),
+            "new_users_month": int(row.new_users_month or 0),
+            "admin_count": int(row.admin_count or 0),
+            # Доход (активные подписки * 300 сом)
+            "monthly_revenue": active_subs * SUBSCRIPTION_PRICE,
+            "conversion_rate": round((active_subs / total_users * 100) if total_users > 0 else 0, 1),
+            "generated_at": now.isoformat(),
+        }
+
+        await hybrid_cache.set(self.STATS_KEY, stats, ttl=STATS_TTL)
+        return stats
+
+    async def daily_series(self, db: AsyncSession, days: int = 30, end_date: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Регистрации, активные пользователи и операции по дням (последние days дней)"""
+        end_date = end_date or date.today()
+        start_date = end_date - timedelta(days=days - 1)
+
+        key = hybrid_cache.make_key("admin", "daily", start_date.isoformat(), end_date.isoformat())
+        cached = await hybrid_cache.get(key)
+        if cached is not None:
+            return cached
+
+        rows = (await db.execute(DAILY_QUERY, {"start_date": start_date, "end_date": end_date})).fetchall()
+        series = [
+            {
+                "date": r.day.isoformat(),
+                "signups": int(r.signups),
+                "active_users": int(r.active_users),
+                "transactions": int(r.transactions),
+                "active_subscriptions": int(r.active_subscriptions),
+            }
+            for r in rows
+        ]
+
+        await hybrid_cache.set(key, series, ttl=DAILY_TTL)
+        return series
+
+    async def refresh_daily(self, db: AsyncSession, days: List[date]) -> None:
+        """Пересчитать дневные строки (то же делает n8n job)"""
+        for day in days:
+            await db.execute(REFRESH_QUERY, {"day": day})
+        await db.commit()
+        await hybrid_cache.delete_pattern("admin:daily:*")
+
+    async def get_user_stats(self, db: AsyncSession, user_id: int, start_date: datetime) -> Optional[Dict[str, Any]]:
+        """Статистика пользователя с start_date; None, если пользователя нет"""
+        row = (await db.execute(USER_STATS_QUERY, {"user_id": user_id, "start_date": start_date})).first()
+        if row is None:
+            return None
+
+        total_expenses = float(row.total_expenses or 0)
+        total_income = float(row.total_income or 0)
+        expense_count = int(row.expense_count or 0)
+        income_count = int(row.income_count or 0)
+
+        return {
+            "balance": total_income - total_expenses,
+            "total_income": total_income,
+            "total_expenses": total_expenses,
+            "total_transactions": expense_count + income_count,
+            "average_expense": total_expenses / expense_count if expense_count > 0 else 0,
+            "top_category": row.top_category,
+        }
+
+
+# Глобальный экземпляр
+admin_metrics = AdminMetricsService()
@@ -0,0 +1,295 @@
+"""
+Spending analytics kernel
+Векторизованный анализ расходов для /ai-analytics (NumPy)
+
+Один запрос загружает матрицу «день × категория» за HISTORY_DAYS (в KGS),
+дальше всё считается на массивах: суммы окон через кумулятивные суммы,
+скользящие средние и z-оценки для аномалий, EWMA-прогноз с поправкой
+на день недели. Ядро кэшируется в памяти по (user, поколение данных, день).
+"""
+
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .memory_cache import hybrid_cache, memory_cache, user_data_scope
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DAYS = 365
+BASELINE_DAYS = 90
+AVG_MONTH_DAYS = 30.4375
+EWMA_SPAN = 30
+FORECAST_DAYS = 30
+KERNEL_TTL = 600  # страховка для записей мимо API (n8n пишет напрямую в БД)
+
+MATRIX_QUERY = text("""
+    WITH rates AS (
+        SELECT DISTINCT ON (from_currency) from_currency, rate
+        FROM exchange_rates WHERE to_currency = 'KGS'
+        ORDER BY from_currency, date DESC
+    )
+    SELECT 'expense' AS kind, e.date, e.category,
+           SUM(CASE WHEN e.currency = 'KGS' THEN e.amount ELSE e.amount * COALESCE(r.rate, 1) END) AS amount,
+           COUNT(*) AS cnt
+    FROM expenses e LEFT JOIN rates r ON r.from_currency = e.currency
+    WHERE e.user_id = :user_id AND e.date >= :start_date AND e.date <= :end_date AND e.deleted_at IS NULL
+    GROUP BY e.date, e.category
+    UNION ALL
+    SELECT 'income' AS kind, i.date, NULL AS category,
+           SUM(CASE WHEN i.currency = 'KGS' THEN i.amount ELSE i.amount * COALESCE(r.rate, 1) END) AS amount,
+           COUNT(*) AS cnt
+    FROM income i LEFT JOIN rates r ON r.from_currency = i.currency
+    WHERE i.user_id = :user_id AND i.date >= :start_date AND i.date <= :end_date AND i.deleted_at IS NULL
+    GROUP BY i.date
+""")
+
+
+def _cumsum(values: np.ndarray) -> np.ndarray:
+    """Кумулятивная сумма с нулевой первой строкой: sum[lo:hi] = cs[hi] - cs[lo]"""
+    pad = np.zeros((1,) + values.shape[1:], dtype=values.dtype)
+    return np.concatenate([pad, np.cumsum(values, axis=0)])
+
+
+class SpendingKernel:
+    """Матрица расходов пользователя и вычисления над ней"""
+
+    def __init__(
+        self,
+        start: date,
+        categories: List[str],
+        expenses: np.ndarray,
+        counts: np.ndarray,
+        income: np.ndarray,
+    ):
+        self.start = start
+        self.days = expenses.shape[0]
+        self.today = start + timedelta(days=self.days - 1)
+        self.categories = categories
+        self.expenses = expenses
+        self.counts = counts
+        self.income = income
+        self.weekdays = (np.arange(self.days) + start.weekday()) % 7
+
+        self._cs_expenses = _cumsum(expenses)
+        self._cs_counts = _cumsum(counts)
+        self._cs_income = _cumsum(income)
+
+        active = np.flatnonzero(expenses.sum(axis=1) + income > 0)
+        self.first_index = int(active[0]) if active.size else self.days
+        self._memo: Dict[tuple, Any] = {}
+
+    # ----- helpers -----
+
+    def _window(self, length: int) -> int:
+        """Индекс начала окна из последних length дней"""
+        return max(self.days - length, 0)
+
+    def _memoized(self, key: tuple, compute):
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    # ----- public API -----
+
+    def window_stats(self, period_days: int) -> Dict[str, Any]:
+        """Статистика за последние period_days (+ сегодня), как раньше get_spending_stats"""
+        return self._memoized(("stats", period_days), lambda: self._window_stats(period_days))
+
+    def _window_stats(self, period_days: int) -> Dict[str, Any]:
+        lo = self._window(period_days + 1)
+        totals = self._cs_expenses[-1] - self._cs_expenses[lo]
+        counts = self._cs_counts[-1] - self._cs_counts[lo]
+        total_income = float(self._cs_income[-1] - self._cs_income[lo])
+
+        by_category = {
+            self.categories[i]: {"total": float(totals[i]), "count": int(counts[i])}
+            for i in np.flatnonzero(counts)
+        }
+        total_expenses = float(totals.sum())
+
+        return {
+            "total_expenses": total_expenses,
+            "total_income": total_income,
+            "balance": total_income - total_expenses,
+            "expenses_by_category": by_category,
+            "categories_count": len(by_category),
+            "period_days": period_days + 1,
+        }
+
+    def historical_averages(self, baseline_days: int = BASELINE_DAYS) -> Dict[str, Dict[str, float]]:
+        """Средние по категориям; месяц — календарный средний, а не 30 дней"""
+        return self._memoized(("averages", baseline_days), lambda: self._historical_averages(baseline_days))
+
+    def _historical_averages(self, baseline_days: int) -> Dict[str, Dict[str, float]]:
+        lo = self._window(baseline_days + 1)
+        totals = self._cs_expenses[-1] - self._cs_expenses[lo]
+        counts = self._cs_counts[-1] - self._cs_counts[lo]
+        # Для новых пользователей делим на фактически прожитые дни
+        observed = self.days - max(lo, self.first_index)
+        if observed <= 0:
+            return {}
+
+        monthly = totals / observed * AVG_MONTH_DAYS
+        return {
+            self.categories[i]: {
+                "avg_transaction": float(totals[i] / counts[i]),
+                "monthly_avg": float(monthly[i]),
+                "total": float(totals[i]),
+                "count": int(counts[i]),
+            }
+            for i in np.flatnonzero(counts)
+        }
+
+    def anomalies(self, period_days: int, threshold: float = 0.5, z_threshold: float = 1.0) -> List[Dict[str, Any]]:
+        """
+        Аномалии по категориям: сумма текущего окна сравнивается со скользящими
+        окнами той же длины в истории (среднее и стандартное отклонение).
+        """
+        return self._memoized(
+            ("anomalies", period_days, threshold, z_threshold),
+            lambda: self._anomalies(period_days, threshold, z_threshold),
+        )
+
+    def _anomalies(self, period_days: int, threshold: float, z_threshold: float) -> List[Dict[str, Any]]:
+        length = min(period_days + 1, self.days)
+        lo = self.days - length
+        current = self._cs_expenses[-1] - self._cs_expenses[lo]
+        current_counts = self._cs_counts[-1] - self._cs_counts[lo]
+
+        # Концы всех исторических окон, целиком лежащих до текущего
+        ends = np.arange(self.first_index + length, lo + 1)
+        if not ends.size:
+            # Нет ни одного полного окна до текущего — сравнивать не с чем
+            return []
+        sums = self._cs_expenses[ends] - self._cs_expenses[ends - length]
+        mean = sums.mean(axis=0)
+        std = sums.std(axis=0)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            deviation = np.where(mean > 0, (current - mean) / mean, 0.0)
+            z = np.where(std > 0, (current - mean) / std, np.inf)
+
+        mask = (current_counts > 0) & (mean > 0) & (np.abs(deviation) > threshold) & (np.abs(z) >= z_threshold)
+
+        result = []
+        for i in np.flatnonzero(mask):
+            dev = float(deviation[i])
+            severity = "low" if abs(dev) < 1 else ("medium" if abs(dev) < 2 else "high")
+            direction = "больше" if dev > 0 else "меньше"
+            category = self.categories[i]
+            result.append({
+                "category": category,
+                "current_amount": float(current[i]),
+                "average_amount": float(mean[i]),
+                "deviation_percentage": round(dev * 100, 1),
+                "severity": severity,
+                "message": f"Расходы на '{category}' на {abs(round(dev * 100))}% {direction} среднего",
+            })
+        return sorted(result, key=lambda a: abs(a["deviation_percentage"]), reverse=True)
+
+    def weekday_factors(self) -> np.ndarray:
+        """Сезонность по дням недели: средние траты дня / средние траты в день"""
+        return self._memoized(("weekday",), self._weekday_factors)
+
+    def _weekday_factors(self) -> np.ndarray:
+        daily = self.expenses[self.first_index:].sum(axis=1)
+        weekdays = self.weekdays[self.first_index:]
+        overall = daily.mean() if daily.size else 0.0
+        if overall <= 0:
+            return np.ones(7)
+
+        sums = np.bincount(weekdays, weights=daily, minlength=7)
+        seen = np.bincount(weekdays, minlength=7)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            factors = np.where(seen > 0, sums / seen / overall, 1.0)
+        return factors
+
+    def forecast(self, days_ahead: int = FORECAST_DAYS) -> List[Dict[str, Any]]:
+        """EWMA дневных трат по категориям × сезонность дней недели"""
+        return self._memoized(("forecast", days_ahead), lambda: self._forecast(days_ahead))
+
+    def _forecast(self, days_ahead: int) -> List[Dict[str, Any]]:
+        history = self.expenses[self.first_index:]
+        n = history.shape[0]
+        if n == 0 or history.sum() <= 0:
+            return []
+
+        alpha = 2 / (EWMA_SPAN + 1)
+        weights = (1 - alpha) ** np.arange(n - 1, -1, -1)
+        daily_level = weights @ history / weights.sum()
+
+        future_weekdays = (self.today.weekday() + 1 + np.arange(days_ahead)) % 7
+        season = float(self.weekday_factors()[future_weekdays].sum())
+        breakdown = daily_level * season
+        predicted = float(breakdown.sum())
+
+        # Сравнение только с полным предыдущим периодом той же длины
+        previous = float(history[-days_ahead:].sum()) if n >= days_ahead else 0.0
+        comparison = (predicted - previous) / previous * 100 if previous > 0 else 0.0
+
+        # Уверенность: разброс дневных трат и длина истории
+        recent = history[-BASELINE_DAYS:].sum(axis=1)
+        mean = recent.mean()
+        cv = float(recent.std() / mean) if mean > 0 else 1.0
+        confidence = (1 - cv / (2 * np.sqrt(days_ahead))) * min(1.0, n / BASELINE_DAYS)
+        confidence = float(np.clip(confidence, 0.3, 0.95))
+
+        return [{
+            "period": "next_month",
+            "predicted_amount": round(predicted, 2),
+            "confidence": round(confidence, 2),
+            "breakdown_by_category": {
+                self.categories[i]: round(float(breakdown[i]), 2)
+                for i in np.flatnonzero(breakdown > 0)
+            },
+            "comparison_with_previous": round(comparison, 1),
+        }]
+
+
+def build_kernel(rows: List[Any], start: date, end: date) -> SpendingKernel:
+    """Собрать матрицу из строк (kind, date, category, amount, cnt)"""
+    days = (end - start).days + 1
+    expense_rows = [r for r in rows if r.kind == "expense"]
+    income_rows = [r for r in rows if r.kind == "income"]
+
+    categories = sorted({r.category for r in expense_rows})
+    cat_index = {c: i for i, c in enumerate(categories)}
+
+    expenses = np.zeros((days, len(categories)))
+    counts = np.zeros((days, len(categories)), dtype=np.int64)
+    income = np.zeros(days)
+
+    if expense_rows:
+        day_idx = np.fromiter(((r.date - start).days for r in expense_rows), dtype=np.int64)
+        cat_idx = np.fromiter((cat_index[r.category] for r in expense_rows), dtype=np.int64)
+        np.add.at(expenses, (day_idx, cat_idx), np.fromiter((float(r.amount) for r in expense_rows), dtype=float))
+        np.add.at(counts, (day_idx, cat_idx), np.fromiter((int(r.cnt) for r in expense_rows), dtype=np.int64))
+
+    if income_rows:
+        day_idx = np.fromiter(((r.date - start).days for r in income_rows), dtype=np.int64)
+        np.add.at(income, day_idx, np.fromiter((float(r.amount) for r in income_rows), dtype=float))
+
+    return SpendingKernel(start, categories, expenses, counts, income)
+
+
+async def get_kernel(db: AsyncSession, user_id: int, today: Optional[date] = None) -> SpendingKernel:
+    """Ядро пользователя из кэша или одним запросом к БД"""
+    today = today or date.today()
+    generation = await hybrid_cache.get_generation(user_data_scope(user_id))
+    cache_key = hybrid_cache.make_key("ai_kernel", user_id, generation, today.isoformat())
+
+    kernel = await memory_cache.get(cache_key)
+    if kernel is not None:
+        return kernel
+
+    start = today - timedelta(days=HISTORY_DAYS - 1)
+    result = await db.execute(MATRIX_QUERY, {"user_id": user_id, "start_date": start, "end_date": today})
+    kernel = build_kernel(result.fetchall(), start, today)
+
+    await memory_cache.set(cache_key, kernel, ttl=KERNEL_TTL)
+    return kernel
@@ -0,0 +1,145 @@
+"""
+Balance updates service
+Атомарные изменения баланса целей и остатка долгов
+
+Пополнение цели и платёж по долгу — один SQL-оператор: UPDATE ... SET
+amount = amount ± :x ... RETURNING и INSERT строки истории (и транзакции)
+в CTE того же оператора. Проверки (баланс, остаток, статус) — в WHERE,
+поэтому параллельные записи из бота и MiniApp не теряют изменений, а
+чтение строки в Python перед записью не нужно.
+"""
+
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+GOAL_CONTRIBUTION_QUERY = text("""
+    WITH old AS (
+        SELECT id, COALESCE(is_completed, false) AS was_completed
+        FROM savings_goals
+        WHERE id = :goal_id AND user_id = :user_id AND is_active = true
+        FOR UPDATE
+    ),
+    g AS (
+        UPDATE savings_goals s
+        SET current_amount = COALESCE(s.current_amount, 0) + :delta,
+            is_completed = CASE
+                WHEN NOT old.was_completed AND COALESCE(s.current_amount, 0) + :delta >= s.target_amount
+                THEN true ELSE s.is_completed END,
+            completed_at = CASE
+                WHEN NOT old.was_completed AND COALESCE(s.current_amount, 0) + :delta >= s.target_amount
+                THEN timezone('utc', now()) ELSE s.completed_at END,
+            updated_at = timezone('utc', now())
+        FROM old
+        WHERE s.id = old.id AND COALESCE(s.current_amount, 0) + :delta >= 0
+        RETURNING s.*, old.was_completed
+    ),
+    c AS (
+        INSERT INTO goal_contributions (goal_id, user_id, amount, type, note, source)
+        SELECT id, user_id, :amount, :type, :note, :source FROM g
+        RETURNING id, created_at
+    )
+    SELECT g.*, c.id AS contribution_id, c.created_at AS contribution_created_at
+    FROM g, c
+""")
+
+DEBT_PAYMENT_QUERY = text("""
+    WITH d AS (
+        UPDATE debts
+        SET remaining_amount = GREATEST(remaining_amount - CAST(:amount AS numeric), 0),
+            is_settled = remaining_amount - CAST(:amount AS numeric) <= 0,
+            settled_at = CASE WHEN remaining_amount - CAST(:amount AS numeric) <= 0
+                              THEN now() ELSE settled_at END,
+            updated_at = now()
+        WHERE id = :debt_id AND user_id = :user_id
+          AND NOT COALESCE(is_settled, false)
+          AND remaining_amount >= CAST(:amount AS numeric)
+        RETURNING *
+    ),
+    -- Нам вернули долг = доход
+    inc AS (
+        INSERT INTO income (user_id, amount, currency, category, description, date, operation_type, source)
+        SELECT user_id, CAST(:amount AS numeric), currency, 'Возврат долга',
+               'Возврат от ' || person_name || COALESCE(': ' || NULLIF(CAST(:note AS text), ''), ''),
+               :payment_date, 'доход', 'telegram'
+        FROM d WHERE :create_transaction AND debt_type = 'given'
+        RETURNING id
+    ),
+    -- Мы вернули долг = расход
+    exp AS (
+        INSERT INTO expenses (user_id, amount, currency, category, description, date, operation_type, source)
+        SELECT user_id, CAST(:amount AS numeric), currency, 'Возврат долга',
+               'Возврат ' || person_name || COALESCE(': ' || NULLIF(CAST(:note AS text), ''), ''),
+               :payment_date, 'расход', 'telegram'
+        FROM d WHERE :create_transaction AND debt_type <> 'given'
+        RETURNING id
+    ),
+    p AS (
+        INSERT INTO debt_payments (debt_id, amount, payment_date, note, related_transaction_id)
+        SELECT id, CAST(:amount AS numeric), :payment_date, CAST(:note AS text),
+               COALESCE((SELECT id FROM inc), (SELECT id FROM exp))
+        FROM d
+        RETURNING id, amount, payment_date, note, related_transaction_id, created_at
+    )
+    SELECT d.*, p.id AS payment_id, p.amount AS payment_amount, p.payment_date,
+           p.note AS payment_note, p.related_transaction_id, p.created_at AS payment_created_at
+    FROM d, p
+""")
+
+
+async def apply_goal_contribution(
+    db: AsyncSession,
+    user_id: int,
+    goal_id: int,
+    amount: float,
+    type: str,
+    note: Optional[str],
+    source: str,
+) -> Optional[Row]:
+    """
+    Пополнить (deposit) или снять (withdraw) с активной цели.
+    Возвращает строку цели с was_completed, contribution_id и
+    contribution_created_at; None — цель не найдена или не хватает баланса.
+    Коммит — за вызывающим.
+    """
+    delta = amount if type == "deposit" else -amount
+    result = await db.execute(GOAL_CONTRIBUTION_QUERY, {
+        "goal_id": goal_id,
+        "user_id": user_id,
+        "delta": delta,
+        "amount": amount,
+        "type": type,
+        "note": note,
+        "source": source,
+    })
+    return result.first()
+
+
+async def apply_debt_payment(
+    db: AsyncSession,
+    user_id: int,
+    debt_id: int,
+    amount: Decimal,
+    payment_date: date,
+    note: Optional[str],
+    create_transaction: bool,
+) -> Optional[Row]:
+    """
+    Уменьшить остаток непогашенного долга, записать платёж и (опционально)
+    доход/расход. Возвращает строку долга с полями платежа (payment_*,
+    related_transaction_id); None — долг не найден, уже погашен или сумма
+    больше остатка. Коммит — за вызывающим.
+    """
+    result = await db.execute(DEBT_PAYMENT_QUERY, {
+        "debt_id": debt_id,
+        "user_id": user_id,
+        "amount": amount,
+        "payment_date": payment_date,
+        "note": note,
+        "create_transaction": create_transaction,
+    })
+    return result.first()
@@ -183,6 +183,40 @@ class CacheService:
             logger.error(f"Cache EXISTS error for key {key}: {e}")
             return False
     
+    async def incr(self, key: str) -> Optional[int]:
+        """Атомарно увеличить счётчик (без TTL)"""
+        if not self._enabled:
+            return None
+        
+        try:
+            if self._use_memory:
+                value = int(self._memory.get(key) or 0) + 1
+                self._memory.set(key, value, ttl=10 ** 9)
+                return value
+            return int(await self.redis.incr(key))
+        except Exception as e:
+            logger.error(f"Cache INCR error for key {key}: {e}")
+            return None
+
+    async def get_many(self, *keys: str) -> list:
+        """
+        Несколько значений одним запросом (MGET); отсутствующие — None.
+        Ошибки Redis пробрасываются — вызывающий решает, что считать промахом.
+        """
+        if not self._enabled:
+            return [None] * len(keys)
+
+        if self._use_memory:
+            return [self._memory.get(key) for key in keys]
+        values = await self.redis.mget(*keys)
+        return [json.loads(v) if v else None for v in values]
+
+    async def publish(self, channel: str, message: Any) -> None:
+        """Опубликовать сообщение в Redis pub/sub (без Redis — ничего)"""
+        if self._use_memory or not self.redis:
+            return
+        await self.redis.publish(channel, json.dumps(message, default=str))
+
     def make_key(self, *parts) -> str:
         """Создать ключ из частей"""
         return ":".join(str(p) for p in parts)
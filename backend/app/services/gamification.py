@@ -2,6 +2,7 @@
 Gamification Service
 Логика XP, уровней, streak, достижений
 """
+import random
 from datetime import date, datetime, timedelta
 from typing import Optional, List, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -12,6 +13,7 @@ from app.models.models import (
     User, UserGamification, Achievement, UserAchievement, 
     DailyQuest, XPHistory, Expense, Income
 )
+from app.services.metrics import GAMIFICATION_STEP
 
 
 # ============================================
@@ -596,8 +598,6 @@ class GamificationService:
     
     async def _generate_daily_quests(self, user_id: int) -> DailyQuest:
         """Сгенерировать ежедневные задания"""
-        import random
-        
         # Выбираем 3 случайных задания
         selected = random.sample(DAILY_QUEST_POOL, min(3, len(DAILY_QUEST_POOL)))
         
@@ -681,33 +681,39 @@ class GamificationService:
             "daily_quest": None
         }
         
-        # 1. Обновляем streak
-        result["streak"] = await self.update_streak(user_id)
-        
-        # 2. Начисляем XP
-        xp_amount = XP_REWARDS["transaction_with_description"] if has_description else XP_REWARDS["transaction"]
-        result["xp"] = await self.add_xp(user_id, xp_amount, "transaction", {"type": transaction_type})
-        
-        # 3. Обновляем счетчик транзакций
-        profile = await self.get_or_create_profile(user_id)
-        profile.total_transactions += 1
-        await self.db.commit()
-        
-        # 4. Проверяем достижения
-        result["achievements"] = await self.check_achievements(
-            user_id, 
-            "transaction_added",
-            {"type": transaction_type, "has_description": has_description}
-        )
-        
-        # 5. Обновляем ежедневные задания
-        quest_type = "expense" if transaction_type == "expense" else "income"
-        result["daily_quest"] = await self.update_daily_quest_progress(user_id, quest_type)
-        
-        # Также обновляем для общих транзакций
-        await self.update_daily_quest_progress(user_id, "transaction")
-        
-        if has_description:
-            await self.update_daily_quest_progress(user_id, "description")
+        with GAMIFICATION_STEP.time(step="total"):
+            # 1. Обновляем streak
+            with GAMIFICATION_STEP.time(step="streak"):
+                result["streak"] = await self.update_streak(user_id)
+            
+            # 2. Начисляем XP
+            xp_amount = XP_REWARDS["transaction_with_description"] if has_description else XP_REWARDS["transaction"]
+            with GAMIFICATION_STEP.time(step="xp"):
+                result["xp"] = await self.add_xp(user_id, xp_amount, "transaction", {"type": transaction_type})
+            
+            # 3. Обновляем счетчик транзакций
+            with GAMIFICATION_STEP.time(step="profile"):
+                profile = await self.get_or_create_profile(user_id)
+                profile.total_transactions += 1
+                await self.db.commit()
+            
+            # 4. Проверяем достижения
+            with GAMIFICATION_STEP.time(step="achievements"):
+                result["achievements"] = await self.check_achievements(
+                    user_id, 
+                    "transaction_added",
+                    {"type": transaction_type, "has_description": has_description}
+                )
+            
+            # 5. Обновляем ежедневные задания
+            with GAMIFICATION_STEP.time(step="daily_quests"):
+                quest_type = "expense" if transaction_type == "expense" else "income"
+                result["daily_quest"] = await self.update_daily_quest_progress(user_id, quest_type)
+                
+                # Также обновляем для общих транзакций
+                await self.update_daily_quest_progress(user_id, "transaction")
+                
+                if has_description:
+                    await self.update_daily_quest_progress(user_id, "description")
         
         return result
@@ -0,0 +1,241 @@
+"""
+AI insights store
+Сохранённые AI инсайты с состоянием прочтения
+
+Инсайты строятся из ядра аналитики (analytics_kernel) и сохраняются в ai_insights.
+/ai-analytics/insights читает их индексированным запросом; если поколение данных
+пользователя изменилось, перегенерация запускается в фоне и не задерживает ответ.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import AsyncSessionLocal
+from .analytics_kernel import SpendingKernel, get_kernel
+from .memory_cache import hybrid_cache, user_data_scope
+
+logger = logging.getLogger(__name__)
+
+INSIGHT_VALID_DAYS = 7
+# Страховка для записей мимо API (n8n): не реже раза в час
+STATE_TTL = 3600
+ANOMALY_INSIGHTS = 3
+
+SEVERITY_PRIORITY = {"high": "high", "medium": "normal", "low": "low"}
+
+LIST_QUERY = text("""
+    SELECT id, insight_type, title, message, category, priority, data, is_read, created_at,
+           COUNT(*) OVER () AS total,
+           COUNT(*) FILTER (WHERE NOT is_read) OVER () AS unread
+    FROM ai_insights
+    WHERE user_id = :user_id
+      AND is_dismissed = false
+      AND (valid_until IS NULL OR valid_until > now())
+    ORDER BY CASE priority WHEN 'critical' THEN 0 WHEN 'high' THEN 1 WHEN 'normal' THEN 2 ELSE 3 END,
+             created_at DESC
+    LIMIT :limit
+""")
+
+EXPIRE_QUERY = text("""
+    UPDATE ai_insights SET valid_until = now()
+    WHERE user_id = :user_id
+      AND (valid_until IS NULL OR valid_until > now())
+      AND NOT (insight_type || ':' || COALESCE(category, '') = ANY(CAST(:keys AS text[])))
+""")
+
+# Состояние прочтения/скрытия сохраняется, пока не изменилось data.state —
+# устойчивое состояние инсайта (приоритет, корзина значения). Живые числа
+# в тексте и data обновляются без сброса прочтения.
+UPSERT_QUERY = text("""
+    INSERT INTO ai_insights (user_id, insight_type, title, message, category, priority, data, valid_until)
+    SELECT :user_id, t.insight_type, t.title, t.message, t.category, t.priority, t.data, :valid_until
+    FROM jsonb_to_recordset(CAST(:payload AS jsonb))
+        AS t(insight_type varchar, title varchar, message text, category varchar, priority varchar, data jsonb)
+    ON CONFLICT (user_id, insight_type, (COALESCE(category, ''))) DO UPDATE SET
+        title = EXCLUDED.title,
+        message = EXCLUDED.message,
+        priority = EXCLUDED.priority,
+        data = EXCLUDED.data,
+        valid_until = EXCLUDED.valid_until,
+        is_read = ai_insights.is_read AND ai_insights.data->>'state' IS NOT DISTINCT FROM EXCLUDED.data->>'state',
+        is_dismissed = ai_insights.is_dismissed AND ai_insights.data->>'state' IS NOT DISTINCT FROM EXCLUDED.data->>'state',
+        created_at = CASE WHEN ai_insights.data->>'state' IS NOT DISTINCT FROM EXCLUDED.data->>'state'
+                          THEN ai_insights.created_at ELSE now() END
+""")
+
+
+def build_insights(kernel: SpendingKernel) -> List[Dict[str, Any]]:
+    """Инсайты за последние 30 дней"""
+    stats = kernel.window_stats(30)
+    insights = []
+
+    # Инсайт по балансу
+    if stats["total_expenses"] > 0:
+        income = stats["total_income"]
+        savings_rate = ((income - stats["total_expenses"]) / income * 100) if income > 0 else 0
+        bucket = "good" if savings_rate > 20 else ("fair" if savings_rate > 10 else "low")
+        insights.append({
+            "insight_type": "savings_rate",
+            "title": "Норма сбережений",
+            "message": f"Вы сберегаете {savings_rate:.0f}% от дохода. "
+                       + ("Отлично!" if savings_rate > 20 else "Попробуйте увеличить до 20%."),
+            "category": "savings",
+            "priority": "normal" if savings_rate > 10 else "high",
+            "data": {"savings_rate": round(savings_rate, 1), "state": bucket},
+        })
+
+    # Инсайт по частоте трат
+    total_transactions = sum(c["count"] for c in stats["expenses_by_category"].values())
+    if total_transactions > 0:
+        avg_per_day = total_transactions / 30
+        insights.append({
+            "insight_type": "frequency",
+            "title": "Частота покупок",
+            "message": f"В среднем {avg_per_day:.1f} покупок в день. "
+                       + ("Много мелких трат могут накапливаться." if avg_per_day > 3 else "Хороший контроль!"),
+            "category": "behavior",
+            "priority": "low",
+            "data": {"avg_per_day": round(avg_per_day, 2), "state": "many" if avg_per_day > 3 else "ok"},
+        })
+
+    # Аномалии по категориям
+    for anomaly in kernel.anomalies(30)[:ANOMALY_INSIGHTS]:
+        insights.append({
+            "insight_type": "anomaly",
+            "title": f"Необычные траты: {anomaly['category']}",
+            "message": anomaly["message"],
+            "category": anomaly["category"],
+            "priority": SEVERITY_PRIORITY.get(anomaly["severity"], "normal"),
+            "data": {
+                "current_amount": round(anomaly["current_amount"], 2),
+                "average_amount": round(anomaly["average_amount"], 2),
+                "deviation_percentage": anomaly["deviation_percentage"],
+                "state": f"{anomaly['severity']}:{'up' if anomaly['deviation_percentage'] > 0 else 'down'}",
+            },
+        })
+
+    return insights
+
+
+class InsightStore:
+    """Чтение, перегенерация и состояние прочтения инсайтов"""
+
+    def __init__(self):
+        self._inflight: set = set()
+        self._tasks: set = set()
+
+    @staticmethod
+    def _state_key(user_id: int) -> str:
+        return hybrid_cache.make_key("ai_insights_state", user_id)
+
+    async def _current_state(self, user_id: int, today: date) -> str:
+        generation = await hybrid_cache.get_generation(user_data_scope(user_id))
+        return f"{generation}:{today.isoformat()}"
+
+    async def list_active(
+        self, db: AsyncSession, user_id: int, limit: int = 10, today: Optional[date] = None
+    ) -> Tuple[List[Dict[str, Any]], int, int]:
+        """
+        Активные инсайты (items, total, unread_count).
+        today — сегодня в часовом поясе пользователя (по умолчанию дата сервера).
+        Первый запрос пользователя генерирует инсайты синхронно, дальше — в фоне.
+        """
+        today = today or date.today()
+        state = await self._current_state(user_id, today)
+        stale = await hybrid_cache.get(self._state_key(user_id)) != state
+
+        rows = (await db.execute(LIST_QUERY, {"user_id": user_id, "limit": limit})).fetchall()
+        if stale:
+            if rows:
+                self.schedule(user_id, today)
+            else:
+                await self.regenerate(db, user_id, state, today)
+                rows = (await db.execute(LIST_QUERY, {"user_id": user_id, "limit": limit})).fetchall()
+
+        items = [
+            {
+                "id": r.id,
+                "insight_type": r.insight_type,
+                "title": r.title,
+                "message": r.message,
+                "category": r.category,
+                "priority": r.priority or "normal",
+                "data": json.loads(r.data) if isinstance(r.data, str) else r.data,
+                "is_read": bool(r.is_read),
+                "created_at": r.created_at,
+            }
+            for r in rows
+        ]
+        total = int(rows[0].total) if rows else 0
+        unread = int(rows[0].unread) if rows else 0
+        return items, total, unread
+
+    async def regenerate(
+        self, db: AsyncSession, user_id: int, state: Optional[str] = None, today: Optional[date] = None
+    ) -> int:
+        """Пересчитать и сохранить инсайты пользователя"""
+        today = today or date.today()
+        state = state or await self._current_state(user_id, today)
+        kernel = await get_kernel(db, user_id, today=today)
+        insights = build_insights(kernel)
+
+        keys = [f"{i['insight_type']}:{i['category'] or ''}" for i in insights]
+        await db.execute(EXPIRE_QUERY, {"user_id": user_id, "keys": keys})
+        if insights:
+            await db.execute(UPSERT_QUERY, {
+                "user_id": user_id,
+                "payload": json.dumps(insights, ensure_ascii=False),
+                "valid_until": datetime.now() + timedelta(days=INSIGHT_VALID_DAYS),
+            })
+        await db.commit()
+
+        await hybrid_cache.set(self._state_key(user_id), state, ttl=STATE_TTL)
+        return len(insights)
+
+    def schedule(self, user_id: int, today: Optional[date] = None) -> None:
+        """Фоновая перегенерация (не более одной на пользователя одновременно)"""
+        if user_id in self._inflight:
+            return
+        self._inflight.add(user_id)
+        task = asyncio.create_task(self._regenerate_background(user_id, today))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _regenerate_background(self, user_id: int, today: Optional[date]) -> None:
+        try:
+            async with AsyncSessionLocal() as session:
+                await self.regenerate(session, user_id, today=today)
+        except Exception as e:
+            logger.warning(f"[INSIGHTS] Background regeneration failed for user {user_id}: {e}")
+        finally:
+            self._inflight.discard(user_id)
+
+    async def mark_read(self, db: AsyncSession, user_id: int, insight_id: Optional[int] = None) -> int:
+        """Отметить прочитанным один инсайт или все"""
+        query = "UPDATE ai_insights SET is_read = true WHERE user_id = :user_id AND is_read = false"
+        params: Dict[str, Any] = {"user_id": user_id}
+        if insight_id is not None:
+            query += " AND id = :insight_id"
+            params["insight_id"] = insight_id
+        result = await db.execute(text(query), params)
+        await db.commit()
+        return result.rowcount or 0
+
+    async def dismiss(self, db: AsyncSession, user_id: int, insight_id: int) -> bool:
+        """Скрыть инсайт (до смены его состояния — корзины значения или серьёзности)"""
+        result = await db.execute(
+            text("UPDATE ai_insights SET is_dismissed = true, is_read = true WHERE user_id = :user_id AND id = :insight_id"),
+            {"user_id": user_id, "insight_id": insight_id},
+        )
+        await db.commit()
+        return (result.rowcount or 0) > 0
+
+
+# Глобальный экземпляр
+insight_store = InsightStore()
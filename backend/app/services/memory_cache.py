@@ -2,15 +2,53 @@
 In-Memory Cache Service
 Быстрый fallback кэш когда Redis недоступен
 Thread-safe с автоматической очисткой устаревших записей
+
+Несколько workers (WEB_CONCURRENCY > 1): у каждого процесса свой L1
+(MemoryCache), общий L2 — Redis. HybridCache.enable_multiprocess():
+- запись в L1 хранит токен — поколения владельца ключа (пользователь из
+  make_key(prefix, user_id, ...) или "global") и общее поколение "*";
+  попадание в L1 сверяется с токеном в Redis (один MGET маленьких чисел
+  вместо чтения всего значения);
+- delete/delete_pattern увеличивают поколение владельца и рассылают
+  шаблон по pub/sub (cache:invalidate) — остальные workers сразу удаляют
+  совпадающие записи L1.
+asyncio.Lock в MemoryCache защищает только свой процесс — общего
+состояния между процессами L1 не держит.
 """
 import time
 import asyncio
-from typing import Optional, Any, Dict
+import json
+import os
+import socket
+import uuid
+from typing import Optional, Any, Dict, Tuple
 from collections import OrderedDict
 import logging
 
+from .metrics import cache_lookup
+
 logger = logging.getLogger(__name__)
 
+INVALIDATION_CHANNEL = "cache:invalidate"
+GLOBAL_OWNER = "global"
+ALL_OWNERS = "*"
+# Срок записи L1, заполненной из Redis (остаток TTL в Redis неизвестен)
+L1_FILL_TTL = 30
+
+
+def cache_owner(key: str) -> str:
+    """
+    Владелец ключа или шаблона: user_id из второй части
+    ("batch:42:...", "user:42", "categories:42") или "global".
+    Шаблон с * до user_id ("stats:*") может задеть любого — "*".
+    """
+    parts = key.split(":")
+    if len(parts) > 1 and parts[1].isdigit():
+        return parts[1]
+    if "*" in ":".join(parts[:2]):
+        return ALL_OWNERS
+    return GLOBAL_OWNER
+
 
 class MemoryCache:
     """In-memory кэш с TTL и LRU eviction"""
@@ -114,6 +152,14 @@ class HybridCache:
     def __init__(self, redis_cache=None, memory_cache: Optional[MemoryCache] = None):
         self._redis = redis_cache
         self._memory = memory_cache or MemoryCache()
+        self._generations: Dict[str, int] = {}
+        # Режим нескольких workers
+        self._multiprocess = False
+        self._check_interval = 0.0
+        self._tokens: Dict[str, Tuple[Tuple[int, int], float]] = {}  # owner -> (токен, время проверки)
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
     
     def set_redis(self, redis_cache):
         """Установить Redis кэш"""
@@ -124,8 +170,120 @@ class HybridCache:
         """Проверка доступности Redis"""
         return self._redis is not None and self._redis.enabled
     
+    @property
+    def multiprocess(self) -> bool:
+        return self._multiprocess
+    
+    async def enable_multiprocess(self, check_interval: float = 0.0) -> bool:
+        """
+        Включить согласование L1 между workers (нужен Redis).
+        check_interval — сколько секунд токен владельца считается свежим без
+        повторного чтения из Redis (0 — сверка при каждом попадании в L1;
+        больше — меньше запросов, устаревание ограничено задержкой pub/sub
+        и этим интервалом).
+        """
+        if self._redis is None or getattr(self._redis, "backend", None) != "redis":
+            logger.warning("⚠️ Multiple workers without Redis: L1 caches are per-process and may serve stale data")
+            return False
+        
+        self._check_interval = check_interval
+        self._pubsub = self._redis.redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(INVALIDATION_CHANNEL)
+        self._listener = asyncio.create_task(self._listen_invalidations())
+        self._multiprocess = True
+        await self._memory.clear()
+        logger.info(f"✅ Multi-process cache mode (worker {self.worker_id})")
+        return True
+    
+    async def close(self) -> None:
+        """Остановить подписку на инвалидации"""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.close()
+            except Exception:
+                pass
+            self._pubsub = None
+        self._multiprocess = False
+    
+    async def _token(self, owner: str) -> Tuple[int, int]:
+        """Токен L1 владельца: (поколение владельца, общее поколение)"""
+        cached = self._tokens.get(owner)
+        now = time.monotonic()
+        if cached is not None and self._check_interval > 0 and now - cached[1] < self._check_interval:
+            return cached[0]
+        owner_gen, all_gen = await self._redis.get_many(f"gen:l1:{owner}", f"gen:l1:{ALL_OWNERS}")
+        token = (int(owner_gen or 0), int(all_gen or 0))
+        self._tokens[owner] = (token, now)
+        return token
+    
+    async def _invalidate_l1(self, pattern: str) -> None:
+        """Поднять поколение владельца и разослать шаблон остальным workers"""
+        owner = cache_owner(pattern)
+        try:
+            await self._redis.incr(f"gen:l1:{owner}")
+            await self._redis.publish(INVALIDATION_CHANNEL, {"origin": self.worker_id, "pattern": pattern})
+        except Exception as e:
+            logger.warning(f"L1 invalidation publish error: {e}")
+        self._forget_tokens(owner)
+    
+    def _forget_tokens(self, owner: str) -> None:
+        if owner == ALL_OWNERS:
+            self._tokens.clear()
+        else:
+            self._tokens.pop(owner, None)
+    
+    async def _listen_invalidations(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+                if message is None or message.get("type") != "message":
+                    continue
+                payload = json.loads(message["data"])
+                if payload.get("origin") == self.worker_id:
+                    continue
+                pattern = payload["pattern"]
+                await self._memory.delete_pattern(pattern)
+                self._forget_tokens(cache_owner(pattern))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"L1 invalidation listener error: {e}")
+                await asyncio.sleep(1.0)
+    
+    async def _get_multiprocess(self, key: str) -> Optional[Any]:
+        """L1 с проверкой токена, затем Redis"""
+        try:
+            token = await self._token(cache_owner(key))
+        except Exception as e:
+            logger.warning(f"L1 token read error: {e}")
+            return None
+        
+        item = await self._memory.get(key)
+        if item is not None and item[0] == token:
+            return item[1]
+        
+        value = await self._redis.get(key)
+        if value is not None:
+            await self._memory.set(key, (token, value), L1_FILL_TTL)
+        return value
+    
     async def get(self, key: str) -> Optional[Any]:
         """Получить значение (сначала Redis, потом Memory)"""
+        value = await self._get(key)
+        cache_lookup(key, value is not None)
+        return value
+    
+    async def _get(self, key: str) -> Optional[Any]:
+        if self._multiprocess:
+            return await self._get_multiprocess(key)
+        
         # Сначала пробуем Redis
         if self.redis_enabled:
             try:
@@ -148,6 +306,13 @@ class HybridCache:
                 logger.warning(f"Redis set error: {e}")
         
         # Всегда пишем в memory для быстрого доступа
+        if self._multiprocess:
+            try:
+                token = await self._token(cache_owner(key))
+            except Exception:
+                return
+            await self._memory.set(key, (token, value), ttl)
+            return
         await self._memory.set(key, value, ttl)
     
     async def delete(self, key: str) -> None:
@@ -158,6 +323,8 @@ class HybridCache:
             except Exception:
                 pass
         await self._memory.delete(key)
+        if self._multiprocess:
+            await self._invalidate_l1(key)
     
     async def delete_pattern(self, pattern: str) -> None:
         """Удалить по паттерну из обоих кэшей"""
@@ -167,6 +334,35 @@ class HybridCache:
             except Exception:
                 pass
         await self._memory.delete_pattern(pattern)
+        if self._multiprocess:
+            await self._invalidate_l1(pattern)
+    
+    async def get_generation(self, scope: str) -> int:
+        """
+        Поколение данных scope (например, транзакций пользователя).
+        Меняется при каждой записи — кэши, включающие его в ключ, устаревают сразу.
+        """
+        if self.redis_enabled:
+            try:
+                value = await self._redis.get(f"gen:{scope}")
+                if value is not None:
+                    return int(value)
+            except Exception as e:
+                logger.warning(f"Redis generation get error: {e}")
+        return self._generations.get(scope, 0)
+    
+    async def bump_generation(self, scope: str) -> int:
+        """Увеличить поколение данных scope"""
+        if self.redis_enabled:
+            try:
+                value = await self._redis.incr(f"gen:{scope}")
+                if value is not None:
+                    self._generations[scope] = value
+                    return value
+            except Exception as e:
+                logger.warning(f"Redis generation bump error: {e}")
+        self._generations[scope] = self._generations.get(scope, 0) + 1
+        return self._generations[scope]
     
     def make_key(self, *parts) -> str:
         """Создать ключ из частей"""
@@ -177,10 +373,37 @@ class HybridCache:
         """Статистика кэша"""
         return {
             'redis_enabled': self.redis_enabled,
+            'multiprocess': self._multiprocess,
+            'worker_id': self.worker_id,
             'memory': self._memory.stats
         }
 
 
+def user_data_scope(user_id: int) -> str:
+    """Scope поколения данных транзакций пользователя"""
+    return f"user:{user_id}"
+
+
+def categories_scope(user_id: int) -> str:
+    """Scope поколения категорий пользователя"""
+    return f"categories:{user_id}"
+
+
+def debts_scope(user_id: int) -> str:
+    """Scope поколения долгов пользователя"""
+    return f"debts:{user_id}"
+
+
+def goals_scope(user_id: int) -> str:
+    """Scope поколения целей накоплений пользователя"""
+    return f"goals:{user_id}"
+
+
+def recurring_scope(user_id: int) -> str:
+    """Scope поколения регулярных платежей пользователя"""
+    return f"recurring:{user_id}"
+
+
 # Глобальные экземпляры
 memory_cache = MemoryCache(max_size=2000, default_ttl=300)
 hybrid_cache = HybridCache(memory_cache=memory_cache)
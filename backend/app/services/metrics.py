@@ -0,0 +1,320 @@
+"""
+Metrics service
+Метрики процесса в формате Prometheus (text exposition 0.0.4) без внешних зависимостей
+
+- HTTP: число запросов и гистограмма латентности по шаблону маршрута
+  (/api/v1/goals/{goal_id}, а не конкретный URL — кардинальность ограничена);
+- БД: число запросов и время в БД на HTTP-запрос (события SQLAlchemy
+  before/after_cursor_execute, см. instrument_engine), превышения бюджета
+  и повторы одного отпечатка SQL (N+1, services/query_budget.py);
+- медленные запросы: счётчик по маршруту, сами записи — в
+  services/slow_queries.py (порог SLOW_QUERY_MS);
+- кэш: hit/miss по пространству имён (первый сегмент ключа);
+- WebSocket: соединения и пользователи (считываются при выдаче /metrics);
+- геймификация: время шагов on_transaction_added.
+
+Метрики — в памяти процесса. При WEB_CONCURRENCY > 1 каждый worker отдаёт
+свои значения с меткой worker; суммирование — на стороне Prometheus.
+"""
+
+import bisect
+import contextvars
+import logging
+import math
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from .query_budget import fingerprint
+from .slow_queries import slow_query_log
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> Iterator[Tuple[str, Sequence[str], Sequence[str], float]]:
+        raise NotImplementedError
+
+    def render(self, const_labels: Dict[str, str]) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        const_names, const_values = tuple(const_labels), tuple(const_labels.values())
+        for suffix, names, values, value in self.samples():
+            labels = _format_labels(const_names + tuple(names), const_values + tuple(values))
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Монотонный счётчик"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in sorted(self._values.items()):
+            yield "", self.labelnames, key, value
+
+
+class Gauge(_Metric):
+    """Текущее значение; может вычисляться при выдаче (set_function)"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                yield "", (), (), float(self._function())
+            except Exception as e:
+                logger.warning(f"Gauge {self.name} callback error: {e}")
+            return
+        for key, value in sorted(self._values.items()):
+            yield "", self.labelnames, key, value
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными границами корзин"""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [счётчики по корзинам (+Inf последней), сумма]
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Замерить блок: with HISTOGRAM.time(step="xp"): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        bucket_names = self.labelnames + ("le",)
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield "_bucket", bucket_names, key + (_format_value(bound),), cumulative
+            yield "_sum", self.labelnames, key, total[0]
+            yield "_count", self.labelnames, key, cumulative
+
+
+class MetricsRegistry:
+    """Набор метрик процесса"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self.const_labels: Dict[str, str] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render(self.const_labels))
+        return "\n".join(lines) + "\n"
+
+
+# Глобальный экземпляр
+metrics = MetricsRegistry()
+
+HTTP_REQUESTS = metrics.counter(
+    "http_requests_total", "HTTP requests by route template, method and status", ("method", "route", "status"))
+HTTP_LATENCY = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route"))
+HTTP_IN_PROGRESS = metrics.gauge(
+    "http_requests_in_progress", "HTTP requests being processed")
+DB_QUERIES = metrics.counter(
+    "db_queries_total", "SQL statements executed, by route template", ("route",))
+DB_QUERIES_PER_REQUEST = metrics.histogram(
+    "db_queries_per_request", "SQL statements per HTTP request", ("route",), QUERY_COUNT_BUCKETS)
+DB_TIME_PER_REQUEST = metrics.histogram(
+    "db_time_per_request_seconds", "Time spent in SQL statements per HTTP request", ("route",))
+DB_QUERY_LATENCY = metrics.histogram(
+    "db_query_duration_seconds", "SQL statement latency")
+CACHE_REQUESTS = metrics.counter(
+    "cache_requests_total", "Hybrid cache lookups by key namespace and result", ("namespace", "result"))
+WS_CONNECTIONS = metrics.gauge(
+    "websocket_connections", "Open WebSocket connections in this worker")
+WS_USERS = metrics.gauge(
+    "websocket_users", "Users with an open WebSocket in this worker")
+QUERY_BUDGET_EXCEEDED = metrics.counter(
+    "db_query_budget_exceeded_total", "Requests that ran more SQL statements than the endpoint budget", ("route",))
+REPEATED_QUERIES = metrics.counter(
+    "db_repeated_queries_total", "Requests where one SQL fingerprint repeated above the threshold (N+1)", ("route",))
+SLOW_QUERIES = metrics.counter(
+    "db_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS, by route template", ("route",))
+GAMIFICATION_STEP = metrics.histogram(
+    "gamification_step_duration_seconds", "Gamification pipeline step latency", ("step",))
+
+
+# ============================================
+# ТЕКУЩИЙ ЗАПРОС
+# ============================================
+
+UNMATCHED_ROUTE = "<unmatched>"
+BACKGROUND_ROUTE = "<background>"
+
+
+def route_template(scope: Optional[dict]) -> str:
+    """Шаблон пути найденного маршрута, например /api/v1/goals/{goal_id}"""
+    path = getattr((scope or {}).get("route"), "path", None)
+    return path if path else UNMATCHED_ROUTE
+
+
+@dataclass
+class RequestMetrics:
+    """Счётчики текущего HTTP-запроса (заполняются событиями SQLAlchemy)"""
+    scope: Optional[dict] = None
+    route: str = UNMATCHED_ROUTE
+    queries: int = 0
+    db_seconds: float = 0.0
+    # Отпечаток SQL -> сколько раз выполнен (services/query_budget.py)
+    fingerprints: Dict[str, int] = field(default_factory=dict)
+
+
+current_request: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar(
+    "current_request_metrics", default=None
+)
+
+
+def cache_lookup(key: str, hit: bool) -> None:
+    """Учесть обращение к кэшу по пространству имён ключа"""
+    CACHE_REQUESTS.inc(namespace=key.split(":", 1)[0], result="hit" if hit else "miss")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    DB_QUERY_LATENCY.observe(elapsed)
+
+    request = current_request.get()
+    if request is not None:
+        request.queries += 1
+        request.db_seconds += elapsed
+        fp = fingerprint(statement)
+        request.fingerprints[fp] = request.fingerprints.get(fp, 0) + 1
+
+    if slow_query_log.is_slow(elapsed):
+        # Маршрут уже найден: зависимости и эндпоинт работают после роутинга
+        route = route_template(request.scope) if request is not None else BACKGROUND_ROUTE
+        SLOW_QUERIES.inc(route=route)
+        slow_query_log.record(statement, parameters, elapsed, route)
+
+
+def _handle_error(context) -> None:
+    # Упавший запрос не должен оставить своё время начала в стеке соединения
+    if context.connection is not None:
+        context.connection.info.pop("metrics_query_start", None)
+
+
+def instrument_engine(engine) -> None:
+    """Подписать счётчики запросов на события движка (AsyncEngine или Engine)"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
@@ -0,0 +1,106 @@
+"""
+Query budget service
+Отпечатки SQL, бюджеты запросов на эндпоинт и поиск N+1
+
+Каждый выполненный оператор сводится к отпечатку (fingerprint): литералы и
+параметры заменяются на ?, списки IN (...) — на (?+), пробелы схлопываются.
+Один и тот же отпечаток много раз за HTTP-запрос — типичный N+1 (запрос в
+цикле по месяцам, достижениям, категориям).
+
+Бюджет задаётся декоратором на эндпоинте:
+
+    @router.get("/batch")
+    @query_budget(4)
+    async def get_batch_data(...): ...
+
+Проверку после запроса делает MetricsMiddleware (utils/request_metrics.py):
+превышение бюджета и повторы считаются в /metrics и пишутся в лог один раз
+на маршрут. tools/query_budget_check.py проверяет бюджеты на живом сервере.
+"""
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, TypeVar
+
+F = TypeVar("F", bound=Callable)
+
+BUDGET_ATTR = "query_budget"
+FINGERPRINT_DISPLAY_LENGTH = 160
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_CAST = re.compile(
+    r"::\s*[A-Za-z_]\w*(?:\s+(?:precision|varying|with(?:out)?\s+time\s+zone))*"
+    r"(?:\(\d+(?:,\s*\d+)?\))?(?:\[\])?",
+    re.IGNORECASE,
+)
+_BIND_PARAM = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<![:\w]):\w+|\?")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_LIST = re.compile(r"(VALUES\s*\(\?\+\))(?:\s*,\s*\(\?\+\))+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """Нормализованный SQL: одинаковые запросы с разными значениями совпадают"""
+    sql = _STRING_LITERAL.sub("?", statement)
+    sql = _CAST.sub("", sql)
+    sql = _BIND_PARAM.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("(?+)", sql)
+    sql = _VALUES_LIST.sub(r"\1", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def short_fingerprint(fp: str) -> str:
+    """Отпечаток для лога / заголовков"""
+    if len(fp) <= FINGERPRINT_DISPLAY_LENGTH:
+        return fp
+    return fp[:FINGERPRINT_DISPLAY_LENGTH] + "…"
+
+
+def query_budget(max_queries: int) -> Callable[[F], F]:
+    """Объявить бюджет SQL-операторов на один запрос к эндпоинту (включая авторизацию)"""
+    def decorator(endpoint: F) -> F:
+        setattr(endpoint, BUDGET_ATTR, max_queries)
+        return endpoint
+    return decorator
+
+
+def budget_of(endpoint: Optional[Callable]) -> Optional[int]:
+    """Бюджет эндпоинта или None, если не задан"""
+    return getattr(endpoint, BUDGET_ATTR, None)
+
+
+@dataclass
+class QueryReport:
+    """Итог проверки одного HTTP-запроса"""
+    queries: int
+    budget: Optional[int] = None
+    repeated: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.queries > self.budget
+
+    @property
+    def max_repeat(self) -> int:
+        return max(self.repeated.values(), default=0)
+
+
+def check_queries(
+    queries: int,
+    fingerprints: Dict[str, int],
+    endpoint: Optional[Callable],
+    repeat_threshold: int,
+) -> QueryReport:
+    """Сравнить счётчики запроса с бюджетом и найти повторяющиеся отпечатки"""
+    repeated = {fp: n for fp, n in fingerprints.items() if n >= repeat_threshold}
+    return QueryReport(queries=queries, budget=budget_of(endpoint), repeated=repeated)
+
+
+def top_fingerprints(fingerprints: Dict[str, int], limit: int = 5) -> List[str]:
+    """Самые частые отпечатки в виде «N× SQL»"""
+    ranked = sorted(fingerprints.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [f"{n}× {short_fingerprint(fp)}" for fp, n in ranked]
@@ -0,0 +1,146 @@
+"""
+Response cache
+Готовые JSON ответы в hybrid_cache с ETag и Cache-Control
+
+Тело ответа сериализуется один раз и кладётся в кэш вместе с ETag (хэш тела).
+Повторный запрос с совпадающим If-None-Match получает 304 прямо из кэша —
+без обращения к БД и без сериализации. Ключи, зависящие от данных
+пользователя, включают поколение (hybrid_cache.get_generation) или
+инвалидируются через delete_pattern, поэтому ETag меняется вместе с данными.
+
+Сжатые варианты тела (br/gzip) хранятся только в локальном memory_cache по
+ETag: сжатие выполняется один раз на версию ответа, попадание в кэш — это
+копирование готовых байтов и заголовки. В Redis лежит только JSON-строка.
+"""
+
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import Request, Response
+
+from ..config import settings
+from ..utils.compression import compress, negotiate
+from ..utils.serialization import dumps
+from .memory_cache import hybrid_cache, memory_cache
+
+logger = logging.getLogger(__name__)
+
+# Данные пользователя: браузер/SW всегда перепроверяет, ответ — дешёвый 304
+PRIVATE_REVALIDATE = "private, no-cache"
+# Справочники, меняющиеся редко (курсы, шаблоны)
+PRIVATE_SHORT = "private, max-age=300"
+PRIVATE_DAY = "private, max-age=86400"
+PUBLIC_HOUR = "public, max-age=3600"
+
+DEFAULT_TTL = 300
+# Сжатые варианты живут не дольше самых долгих записей (шаблоны онбординга)
+COMPRESSED_TTL = 86400
+
+CACHED_LEVELS = {
+    "gzip": settings.CACHED_GZIP_LEVEL,
+    "br": settings.CACHED_BROTLI_QUALITY,
+}
+
+
+def compute_etag(body: str) -> str:
+    """
+    Слабый ETag по телу ответа.
+    Слабый — потому что сжатие (br/gzip) меняет байты, но не смысл ответа.
+    """
+    digest = hashlib.sha1(body.encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match совпадает с etag (сравнение слабое, поддерживаются списки и *)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def serialize(data: Any) -> str:
+    """
+    JSON как у FastAPI JSONResponse (без пробелов, UTF-8 без экранирования).
+    data — уже «чистые» dict/list: jsonable_encoder не нужен.
+    """
+    return dumps(data).decode("utf-8")
+
+
+class ResponseCache:
+    """Кэш сериализованных ответов: {"etag": ..., "body": ...}"""
+
+    async def get(self, key: str) -> Optional[Dict[str, str]]:
+        entry = await hybrid_cache.get(key)
+        if isinstance(entry, dict) and "etag" in entry and "body" in entry:
+            return entry
+        return None
+
+    async def store(self, key: str, data: Any, ttl: int = DEFAULT_TTL) -> Dict[str, str]:
+        body = serialize(data)
+        entry = {"etag": compute_etag(body), "body": body}
+        await hybrid_cache.set(key, entry, ttl=ttl)
+        return entry
+
+    async def _encoded_body(self, entry: Dict[str, str], encoding: str) -> bytes:
+        """Сжатое тело для версии entry (сжимается один раз на процесс)"""
+        key = hybrid_cache.make_key("compressed", entry["etag"], encoding)
+        body = await memory_cache.get(key)
+        if body is None:
+            body = compress(entry["body"].encode("utf-8"), encoding, CACHED_LEVELS[encoding])
+            await memory_cache.set(key, body, ttl=COMPRESSED_TTL)
+        return body
+
+    async def respond(self, request: Request, entry: Dict[str, str], cache_control: str = PRIVATE_REVALIDATE) -> Response:
+        """304, если клиент уже имеет эту версию, иначе 200 с телом из кэша"""
+        headers = {"ETag": entry["etag"], "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if etag_matches(request, entry["etag"]):
+            return Response(status_code=304, headers=headers)
+
+        encoding = None
+        if len(entry["body"]) >= settings.COMPRESSION_MIN_SIZE:
+            encoding = negotiate(request.headers.get("accept-encoding"))
+        if encoding is None:
+            return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+        headers["Content-Encoding"] = encoding
+        return Response(
+            content=await self._encoded_body(entry, encoding),
+            media_type="application/json",
+            headers=headers,
+        )
+
+    async def cached(
+        self,
+        request: Request,
+        key: str,
+        producer: Callable[[], Awaitable[Any]],
+        ttl: int = DEFAULT_TTL,
+        cache_control: str = PRIVATE_REVALIDATE,
+    ) -> Response:
+        """
+        Ответ из кэша по key; при промахе данные строит producer().
+        producer должен вернуть уже провалидированные данные (dict/list) —
+        response_model эндпоинта для Response не применяется.
+        """
+        entry = await self.get(key)
+        if entry is None:
+            entry = await self.store(key, await producer(), ttl=ttl)
+        return await self.respond(request, entry, cache_control)
+
+    async def invalidate(self, pattern: str) -> None:
+        await hybrid_cache.delete_pattern(pattern)
+
+
+# Глобальный экземпляр
+response_cache = ResponseCache()
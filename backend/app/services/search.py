@@ -0,0 +1,390 @@
+"""
+Transaction search service
+Ранжированный поиск по расходам и доходам
+
+- TransactionSearchService — PostgreSQL: search_vector (tsvector, russian + simple)
+  и pg_trgm индексы из migrations/007_transaction_search.sql
+- InMemorySearchIndex — та же выдача без БД (тесты, локальная отладка)
+"""
+
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import date as date_type
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+# Границы фасета по суммам: [0, 100), [100, 500), ... [50000, ∞)
+AMOUNT_FACET_EDGES = (0, 100, 500, 1000, 5000, 10000, 50000)
+CATEGORY_FACET_LIMIT = 10
+
+# Вес триграммного сходства относительно ts_rank_cd
+TRIGRAM_WEIGHT = 0.5
+
+SNIPPET_START = "<mark>"
+SNIPPET_STOP = "</mark>"
+HEADLINE_OPTIONS = f"StartSel={SNIPPET_START}, StopSel={SNIPPET_STOP}, MaxWords=12, MinWords=4, MaxFragments=1"
+
+_TABLES = {"expense": "expenses", "income": "income"}
+
+
+def escape_like(value: str) -> str:
+    """Экранирует %, _ и \\ для ILIKE с ESCAPE '\\'"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def amount_buckets(counts: Dict[int, int]) -> List[Dict[str, Any]]:
+    """
+    Превращает {номер корзины width_bucket: количество} в список диапазонов.
+    Корзина i соответствует [EDGES[i-1], EDGES[i]), последняя — без верхней границы.
+    """
+    buckets = []
+    for bucket in sorted(counts):
+        idx = max(int(bucket), 1)
+        upper = AMOUNT_FACET_EDGES[idx] if idx < len(AMOUNT_FACET_EDGES) else None
+        buckets.append({
+            "min": float(AMOUNT_FACET_EDGES[idx - 1]),
+            "max": float(upper) if upper is not None else None,
+            "count": int(counts[bucket]),
+        })
+    return buckets
+
+
+def _json(value: Any) -> Any:
+    if isinstance(value, str):
+        return json.loads(value)
+    return value or []
+
+
+class TransactionSearchService:
+    """Поиск по транзакциям пользователя в PostgreSQL"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @staticmethod
+    def _branch(kind: str, filters: str) -> str:
+        table = _TABLES[kind]
+        return f"""
+            SELECT '{kind}' AS type, t.id, t.amount, t.currency, t.category, t.description,
+                   t.date, t.created_at,
+                   ts_rank_cd(t.search_vector, q.ts) AS ts_score,
+                   GREATEST(
+                       similarity(coalesce(t.description, ''), :q),
+                       similarity(coalesce(t.category, ''), :q)
+                   ) AS trgm_score
+            FROM {table} t, q
+            WHERE t.user_id = :user_id AND t.deleted_at IS NULL
+              AND (t.search_vector @@ q.ts
+                   OR t.description ILIKE :pattern ESCAPE '\\'
+                   OR t.category ILIKE :pattern ESCAPE '\\')
+              {filters}
+        """
+
+    async def search(
+        self,
+        user_id: int,
+        query: str,
+        type: Optional[str] = None,
+        category: Optional[str] = None,
+        start_date: Optional[date_type] = None,
+        end_date: Optional[date_type] = None,
+        amount_min: Optional[float] = None,
+        amount_max: Optional[float] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        """
+        Ищет транзакции по описанию и категории.
+
+        Совпадения ранжируются по ts_rank_cd + similarity, для страницы
+        строятся сниппеты ts_headline, фасеты считаются по всей выдаче.
+        Всё выполняется одним запросом.
+        """
+        query = query.strip()
+        params: Dict[str, Any] = {
+            "user_id": user_id,
+            "q": query,
+            "pattern": f"%{escape_like(query)}%",
+            "limit": limit,
+            "offset": offset,
+            "headline": HEADLINE_OPTIONS,
+            "facet_limit": CATEGORY_FACET_LIMIT,
+        }
+
+        filters = []
+        if category:
+            filters.append("AND t.category = :category")
+            params["category"] = category
+        if start_date:
+            filters.append("AND t.date >= :start_date")
+            params["start_date"] = start_date
+        if end_date:
+            filters.append("AND t.date <= :end_date")
+            params["end_date"] = end_date
+        if amount_min is not None:
+            filters.append("AND t.amount >= :amount_min")
+            params["amount_min"] = amount_min
+        if amount_max is not None:
+            filters.append("AND t.amount <= :amount_max")
+            params["amount_max"] = amount_max
+        filter_sql = "\n              ".join(filters)
+
+        kinds = [type] if type in _TABLES else list(_TABLES)
+        branches = "\n            UNION ALL\n".join(self._branch(kind, filter_sql) for kind in kinds)
+        edges = ", ".join(str(e) for e in AMOUNT_FACET_EDGES)
+
+        sql = text(f"""
+            WITH q AS (
+                SELECT websearch_to_tsquery('russian', :q) || websearch_to_tsquery('simple', :q) AS ts
+            ),
+            matches AS (
+                SELECT m.*, m.ts_score + {TRIGRAM_WEIGHT} * m.trgm_score AS score
+                FROM ({branches}) m
+            ),
+            page AS (
+                SELECT * FROM matches
+                ORDER BY score DESC, date DESC, created_at DESC
+                LIMIT :limit OFFSET :offset
+            )
+            SELECT
+                (SELECT COUNT(*) FROM matches) AS total,
+                (SELECT json_agg(r ORDER BY r.score DESC, r.date DESC, r.created_at DESC) FROM (
+                    SELECT p.id, p.type, p.amount, p.currency, p.category, p.description,
+                           p.date::text AS date, p.created_at, p.score,
+                           ts_headline('russian', coalesce(p.description, ''), q.ts, :headline) AS snippet
+                    FROM page p, q
+                ) r) AS items,
+                (SELECT json_agg(c) FROM (
+                    SELECT category, COUNT(*) AS count, SUM(amount) AS total
+                    FROM matches GROUP BY category
+                    ORDER BY COUNT(*) DESC, SUM(amount) DESC
+                    LIMIT :facet_limit
+                ) c) AS categories,
+                (SELECT json_object_agg(bucket, cnt) FROM (
+                    SELECT width_bucket(amount, ARRAY[{edges}]::numeric[]) AS bucket, COUNT(*) AS cnt
+                    FROM matches GROUP BY 1
+                ) b) AS amounts
+        """)
+
+        row = (await self.db.execute(sql, params)).fetchone()
+
+        items = []
+        for item in _json(row.items):
+            items.append({
+                "id": item["id"],
+                "type": item["type"],
+                "amount": float(item["amount"]),
+                "currency": item["currency"],
+                "category": item.get("category"),
+                "description": item.get("description"),
+                "date": item["date"],
+                "created_at": item.get("created_at"),
+                "score": round(float(item["score"] or 0), 4),
+                "snippet": item.get("snippet"),
+            })
+
+        bucket_counts = {int(k): v for k, v in dict(_json(row.amounts) or {}).items()}
+
+        return {
+            "query": query,
+            "items": items,
+            "total": int(row.total or 0),
+            "limit": limit,
+            "offset": offset,
+            "facets": {
+                "categories": [
+                    {"category": c.get("category"), "count": int(c["count"]), "total": float(c["total"] or 0)}
+                    for c in _json(row.categories)
+                ],
+                "amounts": amount_buckets(bucket_counts),
+            },
+        }
+
+
+# ---------------------------------------------------------------------------
+# In-memory fallback
+# ---------------------------------------------------------------------------
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(value: Optional[str]) -> List[str]:
+    return _WORD_RE.findall((value or "").lower())
+
+
+def _trigrams(value: str) -> set:
+    """Триграммы в стиле pg_trgm: каждое слово дополняется '  ' слева и ' ' справа"""
+    grams = set()
+    for word in _tokens(value):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def trigram_similarity(a: Optional[str], b: Optional[str]) -> float:
+    """Аналог pg_trgm similarity(): |A ∩ B| / |A ∪ B|"""
+    left, right = _trigrams(a or ""), _trigrams(b or "")
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def _matches_token(term: str, words: List[str]) -> bool:
+    # Грубая замена стемминга: совпадение по префиксу ("продукт" ~ "продукты")
+    return any(w.startswith(term) or term.startswith(w) for w in words if len(w) >= 3 or w == term)
+
+
+@dataclass
+class _Document:
+    id: int
+    type: str
+    amount: float
+    currency: str
+    category: Optional[str]
+    description: Optional[str]
+    date: date_type
+    created_at: Optional[str] = None
+    words: List[str] = field(default_factory=list)
+
+
+class InMemorySearchIndex:
+    """
+    Индекс в памяти с той же выдачей, что и TransactionSearchService.search().
+    Ранжирование приблизительное: доля совпавших слов запроса + similarity.
+    """
+
+    def __init__(self):
+        self._docs: Dict[tuple, _Document] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(
+        self,
+        id: int,
+        type: str,
+        amount: float,
+        date: date_type,
+        currency: str = "KGS",
+        category: Optional[str] = None,
+        description: Optional[str] = None,
+        created_at: Optional[str] = None,
+    ) -> None:
+        self._docs[(type, id)] = _Document(
+            id=id,
+            type=type,
+            amount=float(amount),
+            currency=currency,
+            category=category,
+            description=description,
+            date=date,
+            created_at=created_at,
+            words=_tokens(description) + _tokens(category),
+        )
+
+    def add_many(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.add(**row)
+
+    def remove(self, type: str, id: int) -> None:
+        self._docs.pop((type, id), None)
+
+    @staticmethod
+    def _snippet(description: Optional[str], terms: List[str]) -> str:
+        words = (description or "").split()
+        marked = []
+        for word in words:
+            if any(_matches_token(t, _tokens(word)) for t in terms):
+                marked.append(f"{SNIPPET_START}{word}{SNIPPET_STOP}")
+            else:
+                marked.append(word)
+        return " ".join(marked[:12])
+
+    def search(
+        self,
+        query: str,
+        type: Optional[str] = None,
+        category: Optional[str] = None,
+        start_date: Optional[date_type] = None,
+        end_date: Optional[date_type] = None,
+        amount_min: Optional[float] = None,
+        amount_max: Optional[float] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        query = query.strip()
+        terms = _tokens(query)
+        needle = query.lower()
+
+        scored = []
+        for doc in self._docs.values():
+            if type in _TABLES and doc.type != type:
+                continue
+            if category and doc.category != category:
+                continue
+            if start_date and doc.date < start_date:
+                continue
+            if end_date and doc.date > end_date:
+                continue
+            if amount_min is not None and doc.amount < amount_min:
+                continue
+            if amount_max is not None and doc.amount > amount_max:
+                continue
+
+            matched = sum(1 for t in terms if _matches_token(t, doc.words))
+            substring = bool(needle) and (
+                needle in (doc.description or "").lower() or needle in (doc.category or "").lower()
+            )
+            if not matched and not substring:
+                continue
+
+            ts_score = matched / len(terms) if terms else 0.0
+            trgm_score = max(trigram_similarity(doc.description, query), trigram_similarity(doc.category, query))
+            scored.append((ts_score + TRIGRAM_WEIGHT * trgm_score, doc))
+
+        scored.sort(key=lambda s: (s[0], s[1].date, s[1].created_at or ""), reverse=True)
+
+        categories: Dict[Optional[str], Dict[str, Any]] = {}
+        bucket_counts: Dict[int, int] = {}
+        for _, doc in scored:
+            facet = categories.setdefault(doc.category, {"category": doc.category, "count": 0, "total": 0.0})
+            facet["count"] += 1
+            facet["total"] += doc.amount
+            bucket = sum(1 for edge in AMOUNT_FACET_EDGES if doc.amount >= edge)
+            bucket_counts[bucket] = bucket_counts.get(bucket, 0) + 1
+
+        items = [
+            {
+                "id": doc.id,
+                "type": doc.type,
+                "amount": doc.amount,
+                "currency": doc.currency,
+                "category": doc.category,
+                "description": doc.description,
+                "date": doc.date.isoformat(),
+                "created_at": doc.created_at,
+                "score": round(score, 4),
+                "snippet": self._snippet(doc.description, terms),
+            }
+            for score, doc in scored[offset:offset + limit]
+        ]
+
+        return {
+            "query": query,
+            "items": items,
+            "total": len(scored),
+            "limit": limit,
+            "offset": offset,
+            "facets": {
+                "categories": sorted(
+                    categories.values(), key=lambda c: (c["count"], c["total"]), reverse=True
+                )[:CATEGORY_FACET_LIMIT],
+                "amounts": amount_buckets(bucket_counts),
+            },
+        }
@@ -0,0 +1,207 @@
+"""
+Slow queries service
+Журнал медленных SQL-запросов с планами EXPLAIN
+
+Оператор дольше порога (settings.SLOW_QUERY_MS) попадает в кольцевой
+буфер: отпечаток SQL (services/query_budget.py), формы параметров (типы
+и длины, без значений), длительность и маршрут запроса. Для нового
+отпечатка при SLOW_QUERY_EXPLAIN в фоне выполняется
+EXPLAIN (ANALYZE off, FORMAT JSON) — запрос не исполняется повторно,
+план хранится рядом с отпечатком. Смотреть — GET /api/v1/admin/slow-queries.
+
+Время замеряют события SQLAlchemy из services/metrics.py; журнал — в
+памяти процесса (при нескольких workers у каждого свой).
+"""
+
+import asyncio
+import json
+import logging
+import re
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from .query_budget import fingerprint, short_fingerprint
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY = 200
+MAX_FINGERPRINTS = 500
+MAX_PENDING_EXPLAINS = 2
+EXPLAIN_TIMEOUT = 10.0
+
+# EXPLAIN без ANALYZE ничего не выполняет — подходят и изменяющие операторы
+EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+
+
+def _value_shape(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}({len(value)})"
+    if isinstance(value, (list, tuple, set)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def param_shape(parameters: Any) -> Any:
+    """Типы и длины параметров без самих значений"""
+    if isinstance(parameters, dict):
+        return {str(k): _value_shape(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        # executemany — список наборов параметров: форма первого и их число
+        if parameters and isinstance(parameters[0], (list, tuple, dict)):
+            return {"rows": len(parameters), "first": param_shape(parameters[0])}
+        return [_value_shape(v) for v in parameters]
+    return _value_shape(parameters)
+
+
+class SlowQueryLog:
+    """Кольцевой буфер медленных запросов, сводка по отпечаткам и планы"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.threshold_ms = 0.0
+        self.explain = False
+        self._engine = None
+        self._entries: deque = deque(maxlen=capacity)
+        self._fingerprints: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._plans: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pending: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def configure(self, threshold_ms: float, explain: bool = False, engine=None,
+                  capacity: Optional[int] = None) -> None:
+        """Порог (0 — выключено), фоновый EXPLAIN и движок для него"""
+        self.threshold_ms = threshold_ms
+        self.explain = explain and engine is not None
+        self._engine = engine
+        if capacity and capacity != self._entries.maxlen:
+            self._entries = deque(self._entries, maxlen=capacity)
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def is_slow(self, elapsed: float) -> bool:
+        return self.enabled and elapsed * 1000 >= self.threshold_ms
+
+    def record(self, statement: str, parameters: Any, elapsed: float, route: str) -> None:
+        """Записать медленный оператор (вызывается из after_cursor_execute)"""
+        if statement.lstrip()[:7].upper() == "EXPLAIN":
+            return
+        fp = fingerprint(statement)
+        duration_ms = round(elapsed * 1000, 1)
+        now = datetime.now(timezone.utc).isoformat()
+
+        self._entries.append({
+            "fingerprint": fp,
+            "duration_ms": duration_ms,
+            "route": route,
+            "params": param_shape(parameters),
+            "at": now,
+        })
+
+        stats = self._fingerprints.get(fp)
+        if stats is None:
+            logger.warning(f"🐢 Slow query {duration_ms} ms on {route}: {short_fingerprint(fp)}")
+            stats = self._fingerprints[fp] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "routes": []}
+            if len(self._fingerprints) > MAX_FINGERPRINTS:
+                self._fingerprints.popitem(last=False)
+            if self.explain:
+                self._schedule_explain(fp, statement, parameters)
+        else:
+            self._fingerprints.move_to_end(fp)
+
+        stats["count"] += 1
+        stats["total_ms"] = round(stats["total_ms"] + duration_ms, 1)
+        stats["max_ms"] = max(stats["max_ms"], duration_ms)
+        stats["last_at"] = now
+        if route not in stats["routes"] and len(stats["routes"]) < 5:
+            stats["routes"].append(route)
+
+    # ============================================
+    # EXPLAIN
+    # ============================================
+
+    def _schedule_explain(self, fp: str, statement: str, parameters: Any) -> None:
+        if fp in self._plans or fp in self._pending or len(self._pending) >= MAX_PENDING_EXPLAINS:
+            return
+        if not EXPLAINABLE.match(statement):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._pending.add(fp)
+        task = loop.create_task(self._explain(fp, statement, parameters))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _explain(self, fp: str, statement: str, parameters: Any) -> None:
+        """План в отдельном соединении; параметры нужны только на время EXPLAIN"""
+        plan: Optional[Any] = None
+        error: Optional[str] = None
+        try:
+            async with self._engine.connect() as conn:
+                result = await asyncio.wait_for(
+                    conn.exec_driver_sql(f"EXPLAIN (ANALYZE off, FORMAT JSON) {statement}", parameters),
+                    EXPLAIN_TIMEOUT,
+                )
+                plan = result.scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+        except Exception as e:
+            error = str(e)[:300]
+            logger.warning(f"Slow query EXPLAIN failed: {error}")
+        finally:
+            self._pending.discard(fp)
+
+        self._plans[fp] = {
+            "plan": plan,
+            "error": error,
+            "explained_at": datetime.now(timezone.utc).isoformat(),
+        }
+        if len(self._plans) > MAX_FINGERPRINTS:
+            self._plans.popitem(last=False)
+
+    # ============================================
+    # ВЫДАЧА
+    # ============================================
+
+    def snapshot(self, limit: int = 50, with_plans: bool = True) -> Dict[str, Any]:
+        """Последние записи и сводка по отпечаткам (самые дорогие — первыми)"""
+        entries = list(self._entries)[-limit:][::-1]
+        ranked = sorted(self._fingerprints.items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        fingerprints: List[Dict[str, Any]] = []
+        for fp, stats in ranked[:limit]:
+            item = {"fingerprint": fp, **stats}
+            plan = self._plans.get(fp)
+            if plan is not None and with_plans:
+                item["explain"] = plan
+            elif fp in self._pending:
+                item["explain"] = {"pending": True}
+            fingerprints.append(item)
+        return {
+            "threshold_ms": self.threshold_ms,
+            "explain": self.explain,
+            "capacity": self._entries.maxlen,
+            "recorded": len(self._entries),
+            "entries": entries,
+            "fingerprints": fingerprints,
+        }
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._fingerprints.clear()
+        self._plans.clear()
+
+    async def close(self) -> None:
+        """Дождаться/отменить фоновые EXPLAIN (при остановке приложения)"""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+# Глобальный экземпляр
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,210 @@
+"""
+Summaries service
+Сводки по долгам, целям и регулярным платежам агрегатами в SQL
+
+Вместо загрузки всех строк пользователя в ORM и подсчёта в Python —
+один проход с SUM ... FILTER и GROUP BY GROUPING SETS (итог + по валютам).
+Итоги приводятся к KGS по последнему курсу (как в аналитике); разбивка по
+валютам — в исходной валюте. Результат кэшируется по поколению данных
+(debts_scope / goals_scope / recurring_scope) и дате: записи в роутерах
+поднимают поколение, сдвиг «сегодня» меняет ключ.
+"""
+
+import logging
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable, Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .memory_cache import hybrid_cache
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_TTL = 300
+BASE_CURRENCY = "KGS"
+
+_RATES_CTE = """
+    rates AS (
+        SELECT DISTINCT ON (from_currency) from_currency, rate
+        FROM exchange_rates WHERE to_currency = 'KGS'
+        ORDER BY from_currency, date DESC
+    )
+"""
+
+DEBT_SUMMARY_QUERY = text(f"""
+    WITH {_RATES_CTE},
+    d AS (
+        SELECT d.currency, d.debt_type, COALESCE(d.is_settled, false) AS settled, d.due_date,
+               d.original_amount, d.remaining_amount,
+               CASE WHEN d.currency = 'KGS' THEN 1 ELSE COALESCE(r.rate, 1) END AS k
+        FROM debts d LEFT JOIN rates r ON r.from_currency = d.currency
+        WHERE d.user_id = :user_id
+    )
+    SELECT GROUPING(currency) AS is_total, currency,
+           -- Итоговая строка — в KGS, строки валют — в своей валюте
+           CASE WHEN GROUPING(currency) = 1
+                THEN SUM(original_amount * k) FILTER (WHERE debt_type = 'given')
+                ELSE SUM(original_amount) FILTER (WHERE debt_type = 'given') END AS total_given,
+           CASE WHEN GROUPING(currency) = 1
+                THEN SUM(original_amount * k) FILTER (WHERE debt_type = 'received')
+                ELSE SUM(original_amount) FILTER (WHERE debt_type = 'received') END AS total_received,
+           CASE WHEN GROUPING(currency) = 1
+                THEN SUM(remaining_amount * k) FILTER (WHERE debt_type = 'given' AND NOT settled)
+                ELSE SUM(remaining_amount) FILTER (WHERE debt_type = 'given' AND NOT settled) END
+               AS total_given_remaining,
+           CASE WHEN GROUPING(currency) = 1
+                THEN SUM(remaining_amount * k) FILTER (WHERE debt_type = 'received' AND NOT settled)
+                ELSE SUM(remaining_amount) FILTER (WHERE debt_type = 'received' AND NOT settled) END
+               AS total_received_remaining,
+           COUNT(*) FILTER (WHERE NOT settled) AS active_debts_count,
+           COUNT(*) FILTER (WHERE NOT settled AND due_date < :today) AS overdue_count,
+           COUNT(*) FILTER (WHERE NOT settled AND due_date BETWEEN :today AND :week_later) AS due_soon_count
+    FROM d
+    GROUP BY GROUPING SETS ((), (currency))
+    ORDER BY is_total DESC, currency
+""")
+
+GOAL_STATS_QUERY = text(f"""
+    WITH {_RATES_CTE},
+    g AS (
+        SELECT g.id, g.deadline, g.current_amount, g.target_amount,
+               COALESCE(g.is_completed, false) AS completed,
+               COALESCE(g.is_active, true) AND NOT COALESCE(g.is_completed, false) AS active,
+               CASE WHEN g.currency = 'KGS' THEN 1 ELSE COALESCE(r.rate, 1) END AS k
+        FROM savings_goals g LEFT JOIN rates r ON r.from_currency = g.currency
+        WHERE g.user_id = :user_id
+    )
+    SELECT COUNT(*) AS total_goals,
+           COUNT(*) FILTER (WHERE active) AS active_goals,
+           COUNT(*) FILTER (WHERE completed) AS completed_goals,
+           COALESCE(SUM(current_amount * k), 0) AS total_saved,
+           COALESCE(SUM(target_amount * k) FILTER (WHERE active), 0) AS total_target,
+           (SELECT id FROM g WHERE active AND deadline IS NOT NULL
+            ORDER BY deadline, id LIMIT 1) AS nearest_id,
+           (SELECT id FROM g WHERE active
+            ORDER BY CASE WHEN target_amount > 0 THEN current_amount / target_amount ELSE 0 END DESC, id
+            LIMIT 1) AS most_funded_id
+    FROM g
+""")
+
+RECURRING_TOTALS_QUERY = text(f"""
+    WITH {_RATES_CTE}
+    SELECT GROUPING(p.currency) AS is_total, p.currency,
+           COUNT(*) AS payments,
+           -- Итоговая строка — в KGS, строки валют — в своей валюте
+           CASE WHEN GROUPING(p.currency) = 1
+                THEN SUM(p.amount * CASE WHEN p.currency = 'KGS' THEN 1 ELSE COALESCE(r.rate, 1) END)
+                ELSE SUM(p.amount) END AS total
+    FROM recurring_payments p LEFT JOIN rates r ON r.from_currency = p.currency
+    WHERE p.user_id = :user_id AND p.is_active = true AND p.next_payment_date <= :end_date
+    GROUP BY GROUPING SETS ((), (p.currency))
+    ORDER BY is_total DESC, p.currency
+""")
+
+RECURRING_NEXT_QUERY = text("""
+    SELECT id, title, amount, currency, category, next_payment_date
+    FROM recurring_payments
+    WHERE user_id = :user_id AND is_active = true AND next_payment_date <= :end_date
+    ORDER BY next_payment_date, id
+    LIMIT :limit
+""")
+
+
+async def cached_summary(
+    name: str,
+    scope: str,
+    user_id: int,
+    parts: List[Any],
+    producer: Callable[[], Awaitable[Dict[str, Any]]],
+    ttl: int = SUMMARY_TTL,
+) -> Dict[str, Any]:
+    """Сводка из кэша по поколению scope; при промахе — producer()"""
+    generation = await hybrid_cache.get_generation(scope)
+    key = hybrid_cache.make_key("summary", user_id, name, generation, *parts)
+    cached = await hybrid_cache.get(key)
+    if cached is not None:
+        return cached
+    data = await producer()
+    await hybrid_cache.set(key, data, ttl=ttl)
+    return data
+
+
+async def debt_summary(db: AsyncSession, user_id: int, today: date) -> Dict[str, Any]:
+    """Поля DebtSummary (итоги в KGS) и by_currency"""
+    rows = (await db.execute(DEBT_SUMMARY_QUERY, {
+        "user_id": user_id,
+        "today": today,
+        "week_later": today + timedelta(days=7),
+    })).fetchall()
+
+    total = rows[0] if rows and rows[0].is_total else None
+    by_currency = [
+        {
+            "currency": r.currency,
+            "total_given_remaining": float(r.total_given_remaining or 0),
+            "total_received_remaining": float(r.total_received_remaining or 0),
+            "active_debts_count": r.active_debts_count,
+        }
+        for r in rows if not r.is_total
+    ]
+
+    given_remaining = float(total.total_given_remaining or 0) if total else 0.0
+    received_remaining = float(total.total_received_remaining or 0) if total else 0.0
+    return {
+        "total_given": float(total.total_given or 0) if total else 0.0,
+        "total_received": float(total.total_received or 0) if total else 0.0,
+        "total_given_remaining": given_remaining,
+        "total_received_remaining": received_remaining,
+        "net_balance": given_remaining - received_remaining,
+        "active_debts_count": total.active_debts_count if total else 0,
+        "overdue_count": total.overdue_count if total else 0,
+        "due_soon_count": total.due_soon_count if total else 0,
+        "currency": BASE_CURRENCY,
+        "by_currency": by_currency,
+    }
+
+
+async def goal_stats(db: AsyncSession, user_id: int) -> Dict[str, Any]:
+    """Счётчики и суммы целей (в KGS) и id ближайшей / самой заполненной цели"""
+    r = (await db.execute(GOAL_STATS_QUERY, {"user_id": user_id})).one()
+    total_saved = float(r.total_saved)
+    total_target = float(r.total_target)
+    return {
+        "total_goals": r.total_goals,
+        "active_goals": r.active_goals,
+        "completed_goals": r.completed_goals,
+        "total_saved": total_saved,
+        "total_target": total_target,
+        "overall_progress": round(total_saved / total_target * 100, 1) if total_target > 0 else 0,
+        "nearest_id": r.nearest_id,
+        "most_funded_id": r.most_funded_id,
+    }
+
+
+async def upcoming_recurring(db: AsyncSession, user_id: int, today: date, days: int, limit: int = 5) -> Dict[str, Any]:
+    """Предстоящие платежи на days дней: количество, суммы по валютам, ближайшие limit"""
+    params = {"user_id": user_id, "end_date": today + timedelta(days=days), "limit": limit}
+    totals = (await db.execute(RECURRING_TOTALS_QUERY, params)).fetchall()
+    upcoming = (await db.execute(RECURRING_NEXT_QUERY, params)).fetchall()
+
+    total = totals[0] if totals and totals[0].is_total else None
+    return {
+        "period_days": days,
+        "total_payments": total.payments if total else 0,
+        "totals_by_currency": {r.currency: float(r.total or 0) for r in totals if not r.is_total},
+        "total_converted": float(total.total or 0) if total else 0.0,
+        "currency": BASE_CURRENCY,
+        "upcoming": [
+            {
+                "id": p.id,
+                "title": p.title,
+                "amount": float(p.amount),
+                "currency": p.currency,
+                "category": p.category,
+                "next_payment_date": p.next_payment_date.isoformat(),
+                "days_until": (p.next_payment_date - today).days,
+            }
+            for p in upcoming
+        ],
+    }
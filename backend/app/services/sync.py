@@ -0,0 +1,208 @@
+"""
+Sync service
+Дельта-синхронизация данных пользователя для мини-приложения (GET /sync)
+
+- Каждая запись в синхронизируемых таблицах несёт change_seq — номер
+  изменения из счётчика пользователя sync_state (триггеры migrations/012)
+- Курсор — последний change_seq, который клиент уже применил; ответ
+  содержит только строки с большим change_seq и надгробия жёстких удалений
+- Мягкие удаления (deleted_at у операций, is_active = false у категорий)
+  приходят как удаления того же change_seq
+- Без курсора (или если нужные надгробия уже удалены) — полный снимок:
+  живые строки, операции за SNAPSHOT_DAYS дней
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+# Операции старше этого в полный снимок не входят (их листает /transactions);
+# изменения старых операций всё равно приходят дельтой
+SNAPSHOT_DAYS = 90
+DEFAULT_LIMIT = 500
+
+
+@dataclass(frozen=True)
+class SyncEntity:
+    table: str
+    columns: str
+    # Условие «строка удалена» для мягкого удаления (None — только жёсткое)
+    deleted: Optional[str] = None
+    # Ограничение полного снимка
+    snapshot_filter: Optional[str] = None
+
+
+_TRANSACTION_COLUMNS = (
+    "id, amount, currency, category, description, date, operation_type, source, created_at, updated_at"
+)
+
+ENTITIES: Dict[str, SyncEntity] = {
+    "expenses": SyncEntity(
+        "expenses", _TRANSACTION_COLUMNS, "deleted_at IS NOT NULL", "date >= :snapshot_from"
+    ),
+    "income": SyncEntity(
+        "income", _TRANSACTION_COLUMNS, "deleted_at IS NOT NULL", "date >= :snapshot_from"
+    ),
+    "categories": SyncEntity(
+        "categories",
+        "id, name, type, icon, color, is_default, sort_order, created_at, updated_at",
+        "is_active = false",
+    ),
+    "budgets": SyncEntity("budgets", "id, month, budget_amount, currency, last_updated"),
+    "goals": SyncEntity(
+        "savings_goals",
+        "id, name, description, target_amount, current_amount, currency, icon, color, deadline, "
+        "is_completed, completed_at, is_active, auto_contribute, auto_contribute_percent, "
+        "created_at, updated_at",
+    ),
+    "debts": SyncEntity(
+        "debts",
+        "id, person_name, debt_type, original_amount, remaining_amount, currency, description, "
+        "created_at, due_date, is_settled, settled_at, remind_before_days, updated_at",
+    ),
+}
+
+STATE_QUERY = text("SELECT last_seq, pruned_seq FROM sync_state WHERE user_id = :user_id")
+
+TOMBSTONES_QUERY = text("""
+    SELECT change_seq, entity, entity_id
+    FROM sync_tombstones
+    WHERE user_id = :user_id AND change_seq > :since AND change_seq <= :upto
+    ORDER BY change_seq
+    LIMIT :limit
+""")
+
+
+def _delta_query(entity: SyncEntity):
+    deleted = entity.deleted or "false"
+    return text(f"""
+        SELECT change_seq, ({deleted}) AS is_deleted, {entity.columns}
+        FROM {entity.table}
+        WHERE user_id = :user_id AND change_seq > :since AND change_seq <= :upto
+        ORDER BY change_seq
+        LIMIT :limit
+    """)
+
+
+def _snapshot_query(entity: SyncEntity):
+    conditions = ["user_id = :user_id"]
+    if entity.deleted:
+        conditions.append(f"NOT ({entity.deleted})")
+    if entity.snapshot_filter:
+        conditions.append(entity.snapshot_filter)
+    return text(f"""
+        SELECT {entity.columns}
+        FROM {entity.table}
+        WHERE {" AND ".join(conditions)}
+        ORDER BY id
+    """)
+
+
+_DELTA_QUERIES = {name: _delta_query(entity) for name, entity in ENTITIES.items()}
+_SNAPSHOT_QUERIES = {name: _snapshot_query(entity) for name, entity in ENTITIES.items()}
+
+
+def encode_cursor(seq: int) -> str:
+    return str(seq)
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Курсор от сервера → change_seq; None — полный снимок"""
+    if cursor is None or cursor == "":
+        return None
+    if not cursor.isdigit():
+        raise ValueError("Invalid sync cursor")
+    return int(cursor)
+
+
+def _empty_changes() -> Dict[str, Dict[str, list]]:
+    return {name: {"upserted": [], "deleted": []} for name in ENTITIES}
+
+
+class SyncService:
+    """Изменения данных пользователя после курсора"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def _state(self, user_id: int) -> Tuple[int, int]:
+        row = (await self.db.execute(STATE_QUERY, {"user_id": user_id})).first()
+        if row is None:
+            return 0, 0
+        return row.last_seq, row.pruned_seq
+
+    async def changes(
+        self,
+        user_id: int,
+        since: Optional[int] = None,
+        limit: int = DEFAULT_LIMIT,
+    ) -> Dict[str, Any]:
+        """
+        {"cursor", "full", "has_more", "changes": {entity: {"upserted", "deleted"}}}.
+        full = True — клиент должен заменить локальные данные снимком.
+        """
+        # Граница читается до данных: всё, что закоммичено позже, имеет больший
+        # номер и попадёт в следующий запрос
+        upto, pruned_seq = await self._state(user_id)
+
+        if since is None or since < pruned_seq or since > upto:
+            return await self._snapshot(user_id, upto)
+
+        if since == upto:
+            return {"cursor": encode_cursor(upto), "full": False, "has_more": False, "changes": _empty_changes()}
+
+        return await self._delta(user_id, since, upto, limit)
+
+    async def _snapshot(self, user_id: int, upto: int) -> Dict[str, Any]:
+        params = {"user_id": user_id, "snapshot_from": date.today() - timedelta(days=SNAPSHOT_DAYS)}
+        changes = _empty_changes()
+        for name, query in _SNAPSHOT_QUERIES.items():
+            rows = (await self.db.execute(query, params)).mappings().all()
+            changes[name]["upserted"] = [dict(r) for r in rows]
+        return {"cursor": encode_cursor(upto), "full": True, "has_more": False, "changes": changes}
+
+    async def _delta(self, user_id: int, since: int, upto: int, limit: int) -> Dict[str, Any]:
+        params = {"user_id": user_id, "since": since, "upto": upto, "limit": limit + 1}
+
+        # (change_seq, entity, удалено, строка | id) из всех таблиц и надгробий.
+        # Первые limit изменений по change_seq гарантированно среди первых
+        # limit + 1 строк каждой таблицы
+        events: List[Tuple[int, str, bool, Any]] = []
+        for name, query in _DELTA_QUERIES.items():
+            for r in (await self.db.execute(query, params)).mappings().all():
+                row = dict(r)
+                seq = row.pop("change_seq")
+                is_deleted = row.pop("is_deleted")
+                events.append((seq, name, is_deleted, row["id"] if is_deleted else row))
+
+        for r in (await self.db.execute(TOMBSTONES_QUERY, params)).fetchall():
+            if r.entity in ENTITIES:
+                events.append((r.change_seq, r.entity, True, r.entity_id))
+
+        events.sort(key=lambda event: event[0])
+        has_more = len(events) > limit
+        if has_more:
+            events = events[:limit]
+            cursor = events[-1][0]
+        else:
+            cursor = upto
+
+        # Строка, изменённая несколько раз за окно, попадает в ответ один раз —
+        # в последнем состоянии
+        latest: Dict[Tuple[str, int], Tuple[bool, Any]] = {}
+        for _, name, is_deleted, payload in events:
+            entity_id = payload if is_deleted else payload["id"]
+            latest.pop((name, entity_id), None)
+            latest[(name, entity_id)] = (is_deleted, payload)
+
+        changes = _empty_changes()
+        for (name, _), (is_deleted, payload) in latest.items():
+            changes[name]["deleted" if is_deleted else "upserted"].append(payload)
+
+        return {"cursor": encode_cursor(cursor), "full": False, "has_more": has_more, "changes": changes}
@@ -0,0 +1,167 @@
+"""
+Time series service
+Доходы/расходы по интервалам (день/неделя/месяц) одним запросом
+
+Оба источника агрегируются за один проход с date_trunc, суммы приводятся к KGS
+по последнему снимку курсов, пропущенные интервалы заполняются нулями
+через generate_series. Нарастающий баланс считается в том же запросе
+оконной функцией SUM() OVER.
+"""
+
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+# Допустимые интервалы → шаг generate_series
+BUCKETS = {
+    "day": "1 day",
+    "week": "1 week",
+    "month": "1 month",
+}
+
+# Порядок укрупнения при прореживании (max_points)
+_BUCKET_ORDER = ("day", "week", "month")
+
+
+def _series_query(bucket: str):
+    step = BUCKETS[bucket]
+    return text(f"""
+        WITH rates AS (
+            SELECT DISTINCT ON (from_currency) from_currency, rate
+            FROM exchange_rates WHERE to_currency = 'KGS'
+            ORDER BY from_currency, date DESC
+        ),
+        buckets AS (
+            SELECT generate_series(
+                date_trunc('{bucket}', CAST(:start_date AS date)::timestamp),
+                date_trunc('{bucket}', CAST(:end_date AS date)::timestamp),
+                interval '{step}'
+            )::date AS bucket
+        ),
+        flows AS (
+            SELECT date_trunc('{bucket}', e.date::timestamp)::date AS bucket,
+                   SUM(CASE WHEN e.currency = 'KGS' THEN e.amount ELSE e.amount * COALESCE(r.rate, 1) END) AS expense,
+                   0 AS income,
+                   COUNT(*) AS expense_count,
+                   0 AS income_count
+            FROM expenses e LEFT JOIN rates r ON r.from_currency = e.currency
+            WHERE e.user_id = :user_id AND e.date >= :start_date AND e.date <= :end_date AND e.deleted_at IS NULL
+            GROUP BY 1
+            UNION ALL
+            SELECT date_trunc('{bucket}', i.date::timestamp)::date AS bucket,
+                   0 AS expense,
+                   SUM(CASE WHEN i.currency = 'KGS' THEN i.amount ELSE i.amount * COALESCE(r.rate, 1) END) AS income,
+                   0 AS expense_count,
+                   COUNT(*) AS income_count
+            FROM income i LEFT JOIN rates r ON r.from_currency = i.currency
+            WHERE i.user_id = :user_id AND i.date >= :start_date AND i.date <= :end_date AND i.deleted_at IS NULL
+            GROUP BY 1
+        )
+        SELECT b.bucket,
+               COALESCE(SUM(f.income), 0) AS income,
+               COALESCE(SUM(f.expense), 0) AS expense,
+               COALESCE(SUM(f.income_count), 0) AS income_count,
+               COALESCE(SUM(f.expense_count), 0) AS expense_count,
+               SUM(COALESCE(SUM(f.income), 0) - COALESCE(SUM(f.expense), 0))
+                   OVER (ORDER BY b.bucket) AS cumulative_balance
+        FROM buckets b
+        LEFT JOIN flows f ON f.bucket = b.bucket
+        GROUP BY b.bucket
+        ORDER BY b.bucket
+    """)
+
+
+_QUERIES = {bucket: _series_query(bucket) for bucket in BUCKETS}
+
+
+def bucket_count(start_date: date, end_date: date, bucket: str) -> int:
+    """Число интервалов ряда с start_date по end_date включительно"""
+    if bucket == "month":
+        return (end_date.year - start_date.year) * 12 + end_date.month - start_date.month + 1
+    if bucket == "week":
+        return (end_date - timedelta(days=end_date.weekday())
+                - (start_date - timedelta(days=start_date.weekday()))).days // 7 + 1
+    return (end_date - start_date).days + 1
+
+
+def pick_bucket(
+    start_date: date,
+    end_date: date,
+    bucket: str = "day",
+    max_points: Optional[int] = None,
+) -> str:
+    """
+    Самый мелкий интервал не мельче bucket, при котором в ряду не больше max_points точек.
+    Если даже помесячный ряд длиннее — month.
+    """
+    if bucket not in BUCKETS:
+        bucket = "day"
+    if not max_points:
+        return bucket
+    for candidate in _BUCKET_ORDER[_BUCKET_ORDER.index(bucket):]:
+        if bucket_count(start_date, end_date, candidate) <= max_points:
+            return candidate
+    return "month"
+
+
+async def income_expense_series(
+    db: AsyncSession,
+    user_id: int,
+    start_date: date,
+    end_date: date,
+    bucket: str = "month",
+) -> List[Dict[str, Any]]:
+    """
+    Ряд доходов/расходов в KGS с start_date по end_date включительно.
+
+    Первый и последний интервалы могут быть неполными (обрезаются датами),
+    но всегда присутствуют; пустые интервалы — с нулями.
+    cumulative_balance — баланс нарастающим итогом с начала ряда.
+    """
+    if bucket not in BUCKETS:
+        bucket = "day"
+
+    result = await db.execute(_QUERIES[bucket], {
+        "user_id": user_id,
+        "start_date": start_date,
+        "end_date": end_date,
+    })
+
+    series = []
+    for row in result.fetchall():
+        income = float(row.income or 0)
+        expense = float(row.expense or 0)
+        series.append({
+            "period": row.bucket,
+            "income": income,
+            "expense": expense,
+            "balance": income - expense,
+            "income_count": int(row.income_count or 0),
+            "expense_count": int(row.expense_count or 0),
+            "cumulative_balance": float(row.cumulative_balance or 0),
+        })
+    return series
+
+
+async def balance_series(
+    db: AsyncSession,
+    user_id: int,
+    start_date: date,
+    end_date: date,
+    bucket: str = "day",
+    max_points: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Плотный ряд баланса для графиков: без пропущенных дней, с нарастающим итогом.
+
+    При max_points интервал укрупняется (day → week → month), пока ряд не
+    уложится в лимит — годовой диапазон не отдаётся клиенту по дням.
+    """
+    bucket = pick_bucket(start_date, end_date, bucket, max_points)
+    return await income_expense_series(db, user_id, start_date, end_date, bucket=bucket)
+
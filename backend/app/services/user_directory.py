@@ -0,0 +1,143 @@
+"""
+User directory service
+Поиск пользователей для админки: триграммный индекс и keyset-пагинация
+
+- Поиск идёт по одному выражению USER_NAME_EXPR (индекс idx_users_name_trgm,
+  migrations/011_admin_user_directory.sql); числовой запрос дополнительно
+  ищет точное совпадение user_id / telegram_chat_id
+- Страницы по user_id DESC: cursor — последний user_id предыдущей страницы,
+  глубина пролистывания не влияет на стоимость запроса
+- Состояние подписки и давность активности считаются в том же запросе
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .search import escape_like
+
+logger = logging.getLogger(__name__)
+
+# Должно совпадать с выражением индекса idx_users_name_trgm
+USER_NAME_EXPR = (
+    "lower(coalesce(username, '') || ' ' || coalesce(first_name, '') || ' ' || coalesce(last_name, ''))"
+)
+
+DIRECTORY_INCLUDES = {"subscription", "activity"}
+
+_DIRECTORY_SQL = """
+    SELECT user_id, telegram_chat_id, username, first_name, last_name,
+           COALESCE(is_admin, false) AS is_admin, registered_date, last_activity,
+           subscription_expires_at,
+           CASE
+               WHEN is_admin THEN 'admin'
+               WHEN subscription_expires_at IS NULL THEN 'none'
+               WHEN subscription_expires_at > CAST(:now AS timestamp) THEN 'active'
+               ELSE 'expired'
+           END AS subscription_status,
+           CASE
+               WHEN last_activity IS NULL THEN 'never'
+               WHEN last_activity >= CAST(:now AS timestamp) - interval '1 day' THEN 'today'
+               WHEN last_activity >= CAST(:now AS timestamp) - interval '7 days' THEN 'week'
+               WHEN last_activity >= CAST(:now AS timestamp) - interval '30 days' THEN 'month'
+               ELSE 'dormant'
+           END AS activity_bucket
+    FROM users
+    WHERE (CAST(:cursor AS bigint) IS NULL OR user_id < :cursor)
+      {search}
+    ORDER BY user_id DESC
+    LIMIT :limit
+"""
+
+_SEARCH_NAME = f"AND {USER_NAME_EXPR} LIKE :pattern ESCAPE '\\'"
+_SEARCH_NAME_OR_ID = (
+    f"AND ({USER_NAME_EXPR} LIKE :pattern ESCAPE '\\' "
+    "OR user_id = :number OR telegram_chat_id = :number)"
+)
+
+_QUERIES = {
+    None: text(_DIRECTORY_SQL.format(search="")),
+    "name": text(_DIRECTORY_SQL.format(search=_SEARCH_NAME)),
+    "name_or_id": text(_DIRECTORY_SQL.format(search=_SEARCH_NAME_OR_ID)),
+}
+
+
+def name_pattern(search: str) -> str:
+    """Шаблон LIKE для USER_NAME_EXPR"""
+    return f"%{escape_like(search.strip().lower())}%"
+
+
+def parse_includes(include: Optional[str]) -> set:
+    """"subscription,activity" → множество известных блоков"""
+    if not include:
+        return set()
+    return {part.strip() for part in include.split(",")} & DIRECTORY_INCLUDES
+
+
+class UserDirectoryService:
+    """Справочник пользователей для админки"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def search(
+        self,
+        search: Optional[str] = None,
+        limit: int = 20,
+        cursor: Optional[int] = None,
+        include: Optional[set] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Страница пользователей (items, next_cursor).
+        next_cursor = None — страниц больше нет.
+        """
+        include = include or set()
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        params: Dict[str, Any] = {"now": now, "cursor": cursor, "limit": limit + 1}
+
+        search = (search or "").strip()
+        if not search:
+            query = _QUERIES[None]
+        elif search.isdigit():
+            query = _QUERIES["name_or_id"]
+            params["pattern"] = name_pattern(search)
+            params["number"] = int(search)
+        else:
+            query = _QUERIES["name"]
+            params["pattern"] = name_pattern(search)
+
+        rows = (await self.db.execute(query, params)).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        items = []
+        for r in rows:
+            item = {
+                "user_id": r.user_id,
+                "telegram_chat_id": r.telegram_chat_id,
+                "username": r.username,
+                "first_name": r.first_name,
+                "last_name": r.last_name,
+                "is_admin": bool(r.is_admin),
+                "registered_date": r.registered_date,
+                "last_activity": r.last_activity,
+            }
+            if "subscription" in include:
+                expires_at = r.subscription_expires_at
+                days_left = None
+                if r.subscription_status == "active":
+                    days_left = (expires_at.replace(tzinfo=None) - now).days
+                item["subscription"] = {
+                    "status": r.subscription_status,
+                    "expires_at": expires_at,
+                    "days_left": days_left,
+                }
+            if "activity" in include:
+                item["activity_bucket"] = r.activity_bucket
+            items.append(item)
+
+        next_cursor = rows[-1].user_id if has_more and rows else None
+        return items, next_cursor
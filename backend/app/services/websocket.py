@@ -1,87 +1,152 @@
 """
 WebSocket Manager для real-time updates
+
+Сокеты живут в процессе, который их принял. Сообщения пользователю и
+broadcast идут через backplane (services/ws_backplane.py): с Redis —
+pub/sub между workers, без него — loopback внутри процесса.
 """
 from typing import Dict, Set
 from fastapi import WebSocket
+import asyncio
 import logging
 import json
 
+from .ws_backplane import LoopbackBackplane, make_worker_id
+
 logger = logging.getLogger(__name__)
 
 
 class ConnectionManager:
     """Менеджер WebSocket соединений"""
-    
+
     def __init__(self):
-        # user_id -> set of WebSocket connections
+        # user_id -> set of WebSocket connections (только этого процесса)
         self.active_connections: Dict[int, Set[WebSocket]] = {}
-    
+        self.worker_id = make_worker_id()
+        self.backplane = LoopbackBackplane()
+        self._subscribed: Set[int] = set()
+        # Подписка на канал пользователя меняется только под блокировкой:
+        # быстрый reconnect не должен оставить открытый сокет без подписки
+        self._subscription_lock = asyncio.Lock()
+        self._started = False
+
+    async def start(self, backplane=None):
+        """Запустить backplane (при старте приложения)"""
+        if backplane is not None:
+            self.backplane = backplane
+        await self.backplane.start(self._deliver_local)
+        self._started = True
+        logger.info(f"✅ WebSocket backplane: {self.backplane.name} (worker {self.worker_id})")
+
+    async def stop(self):
+        """Остановить backplane (при остановке приложения)"""
+        if self._started:
+            await self.backplane.stop()
+            self._started = False
+        self._subscribed.clear()
+
+    async def _sync_subscription(self, user_id: int):
+        """Подписка на канал пользователя ⇔ есть локальные сокеты"""
+        async with self._subscription_lock:
+            wanted = user_id in self.active_connections
+            if wanted and user_id not in self._subscribed:
+                await self.backplane.subscribe(user_id)
+                self._subscribed.add(user_id)
+            elif not wanted and user_id in self._subscribed:
+                await self.backplane.unsubscribe(user_id)
+                self._subscribed.discard(user_id)
+
     async def connect(self, websocket: WebSocket, user_id: int):
         """Подключить клиента"""
         await websocket.accept()
-        
+
         if user_id not in self.active_connections:
             self.active_connections[user_id] = set()
-        
+
         self.active_connections[user_id].add(websocket)
+        await self._sync_subscription(user_id)
         logger.debug(f"WebSocket connected: user_id={user_id}, total={len(self.active_connections[user_id])}")
-    
-    def disconnect(self, websocket: WebSocket, user_id: int):
+
+    async def disconnect(self, websocket: WebSocket, user_id: int):
         """Отключить клиента"""
         if user_id in self.active_connections:
             self.active_connections[user_id].discard(websocket)
-            
+
             # Удаляем пользователя если нет активных соединений
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
-        
+
+        try:
+            await self._sync_subscription(user_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Backplane unsubscribe failed for user_id={user_id}: {e}")
         logger.debug(f"WebSocket disconnected: user_id={user_id}")
-    
+
     async def send_personal_message(self, message: dict, user_id: int):
-        """Отправить сообщение конкретному пользователю"""
-        if user_id not in self.active_connections:
-            logger.debug(f"⚠️ No active connections for user_id={user_id}")
-            return
-        
+        """Отправить сообщение конкретному пользователю (в любом worker)"""
         message_json = json.dumps(message)
-        disconnected = []
-        
-        for connection in self.active_connections[user_id]:
-            try:
-                await connection.send_text(message_json)
-                logger.debug(f"📤 Message sent to user_id={user_id}")
-            except Exception as e:
-                logger.error(f"❌ Error sending message to user_id={user_id}: {e}")
-                disconnected.append(connection)
-        
-        # Удаляем отключенные соединения
-        for connection in disconnected:
-            self.disconnect(connection, user_id)
-    
+        try:
+            await self.backplane.publish_user(user_id, message_json)
+        except Exception as e:
+            # Backplane недоступен — доставляем хотя бы локальным сокетам
+            logger.error(f"❌ Backplane publish failed for user_id={user_id}: {e}")
+            await self._deliver_local(user_id, message_json)
+
     async def broadcast(self, message: dict):
         """Отправить сообщение всем подключенным пользователям"""
         message_json = json.dumps(message)
-        
-        for user_id, connections in list(self.active_connections.items()):
+        try:
+            await self.backplane.publish_broadcast(message_json)
+        except Exception as e:
+            logger.error(f"❌ Backplane broadcast failed: {e}")
+            await self._deliver_local(None, message_json)
+
+    async def _deliver_local(self, user_id, message_json: str):
+        """Отправить готовый JSON сокетам этого процесса (user_id=None — всем)"""
+        if user_id is None:
+            targets = list(self.active_connections.items())
+        elif user_id in self.active_connections:
+            targets = [(user_id, self.active_connections[user_id])]
+        else:
+            logger.debug(f"⚠️ No active connections for user_id={user_id}")
+            return
+
+        disconnected = []
+        for target_user_id, connections in targets:
             for connection in list(connections):
                 try:
                     await connection.send_text(message_json)
+                    logger.debug(f"📤 Message sent to user_id={target_user_id}")
                 except Exception as e:
-                    logger.error(f"❌ Broadcast error for user_id={user_id}: {e}")
-                    self.disconnect(connection, user_id)
-    
+                    logger.error(f"❌ Error sending message to user_id={target_user_id}: {e}")
+                    disconnected.append((connection, target_user_id))
+
+        # Удаляем отключенные соединения
+        for connection, target_user_id in disconnected:
+            await self.disconnect(connection, target_user_id)
+
     def get_active_users_count(self) -> int:
-        """Количество активных пользователей"""
+        """Количество активных пользователей (в этом процессе)"""
         return len(self.active_connections)
-    
+
     def get_active_connections_count(self) -> int:
-        """Общее количество активных соединений"""
+        """Общее количество активных соединений (в этом процессе)"""
         return sum(len(connections) for connections in self.active_connections.values())
-    
+
     def is_user_connected(self, user_id: int) -> bool:
-        """Проверить подключен ли пользователь"""
+        """Проверить подключен ли пользователь к этому процессу"""
         return user_id in self.active_connections and len(self.active_connections[user_id]) > 0
 
+    async def is_user_online(self, user_id: int) -> bool:
+        """Подключен ли пользователь к любому worker"""
+        if self.is_user_connected(user_id):
+            return True
+        try:
+            return await self.backplane.subscriber_count(user_id) > 0
+        except Exception as e:
+            logger.warning(f"⚠️ Presence check failed for user_id={user_id}: {e}")
+            return False
+
 
 # Глобальный экземпляр
 ws_manager = ConnectionManager()
@@ -0,0 +1,143 @@
+"""
+WebSocket backplane
+Доставка сообщений пользователю в тот процесс, где открыт его сокет
+
+- LoopbackBackplane — внутри одного процесса (один worker, локальная
+  разработка, проверки без Redis): publish сразу вызывает обработчик
+- RedisBackplane — Redis pub/sub: канал ws:user:{user_id} на пользователя
+  и общий ws:broadcast. Процесс подписан на канал пользователя только пока
+  у него открыт хотя бы один сокет этого пользователя, поэтому число
+  подписчиков канала (PUBSUB NUMSUB) и есть присутствие: сколько workers
+  держат сокеты пользователя. Упавший worker теряет подписки вместе с
+  соединением — чистить ничего не нужно.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+USER_CHANNEL_PREFIX = "ws:user:"
+BROADCAST_CHANNEL = "ws:broadcast"
+
+# handler(user_id | None для broadcast, готовый JSON текст)
+MessageHandler = Callable[[Optional[int], str], Awaitable[None]]
+
+
+def make_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def user_channel(user_id: int) -> str:
+    return f"{USER_CHANNEL_PREFIX}{user_id}"
+
+
+class LoopbackBackplane:
+    """Бэкплейн одного процесса"""
+
+    name = "loopback"
+
+    def __init__(self):
+        self._handler: Optional[MessageHandler] = None
+        self._subscribed: Set[int] = set()
+
+    async def start(self, handler: MessageHandler) -> None:
+        self._handler = handler
+
+    async def stop(self) -> None:
+        self._subscribed.clear()
+
+    async def subscribe(self, user_id: int) -> None:
+        self._subscribed.add(user_id)
+
+    async def unsubscribe(self, user_id: int) -> None:
+        self._subscribed.discard(user_id)
+
+    async def publish_user(self, user_id: int, text: str) -> None:
+        if self._handler is not None and user_id in self._subscribed:
+            await self._handler(user_id, text)
+
+    async def publish_broadcast(self, text: str) -> None:
+        if self._handler is not None:
+            await self._handler(None, text)
+
+    async def subscriber_count(self, user_id: int) -> int:
+        return 1 if user_id in self._subscribed else 0
+
+
+class RedisBackplane:
+    """Redis pub/sub между workers"""
+
+    name = "redis"
+
+    def __init__(self, redis):
+        # Клиент redis.asyncio (cache_service.redis); pubsub берёт отдельное соединение из пула
+        self.redis = redis
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._handler: Optional[MessageHandler] = None
+
+    async def start(self, handler: MessageHandler) -> None:
+        self._handler = handler
+        self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        # Подписка на broadcast сразу: get_message требует открытого соединения
+        await self._pubsub.subscribe(BROADCAST_CHANNEL)
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def stop(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe()
+                await self._pubsub.close()
+            except Exception as e:
+                logger.warning(f"⚠️ Backplane close error: {e}")
+            self._pubsub = None
+
+    async def subscribe(self, user_id: int) -> None:
+        await self._pubsub.subscribe(user_channel(user_id))
+
+    async def unsubscribe(self, user_id: int) -> None:
+        await self._pubsub.unsubscribe(user_channel(user_id))
+
+    async def publish_user(self, user_id: int, text: str) -> None:
+        await self.redis.publish(user_channel(user_id), text)
+
+    async def publish_broadcast(self, text: str) -> None:
+        await self.redis.publish(BROADCAST_CHANNEL, text)
+
+    async def subscriber_count(self, user_id: int) -> int:
+        result = await self.redis.pubsub_numsub(user_channel(user_id))
+        return int(result[0][1]) if result else 0
+
+    async def _read_loop(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+                if message is None or message.get("type") != "message":
+                    continue
+                channel = message["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                data = message["data"]
+                if isinstance(data, bytes):
+                    data = data.decode()
+                user_id = None
+                if channel.startswith(USER_CHANNEL_PREFIX):
+                    user_id = int(channel[len(USER_CHANNEL_PREFIX):])
+                await self._handler(user_id, data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Backplane read error: {e}")
+                await asyncio.sleep(1.0)
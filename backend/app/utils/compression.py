@@ -0,0 +1,184 @@
+"""
+Response compression
+Выбор кодировки по Accept-Encoding, gzip/brotli и ASGI middleware
+
+Заменяет GZipMiddleware:
+- уже сжатые ответы (Content-Encoding задан, например готовые тела из
+  response_cache) отдаются как есть — без повторного deflate;
+- brotli, если установлен пакет brotli (опционально), иначе gzip;
+- уровни сжатия настраиваются (settings.GZIP_LEVEL / BROTLI_QUALITY):
+  для динамических ответов низкий уровень почти не уступает 9 по размеру JSON,
+  но заметно дешевле по CPU.
+"""
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli опционален
+    brotli = None
+
+# Порядок предпочтения при равном q
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "text/",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Лучшая поддерживаемая кодировка из Accept-Encoding (с учётом q) или None.
+    "gzip, deflate, br" → "br" (если brotli установлен), "identity" → None.
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    best, best_q = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """Сжать тело целиком (gzip: level 1-9, br: quality 0-11)"""
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 — gzip-обёртка
+    return compressor.compress(data) + compressor.flush()
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class _StreamCompressor:
+    """Потоковое сжатие для ответов из нескольких чанков (StreamingResponse)"""
+
+    def __init__(self, encoding: str, level: int):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=level)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """Сжатие ответов с согласованием кодировки; сжатые заранее ответы не трогает"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 500,
+        gzip_level: int = 5,
+        brotli_quality: int = 4,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "br": brotli_quality}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingSend(send, encoding, self.levels[encoding], self.minimum_size)
+        await self.app(scope, receive, responder)
+
+
+class _CompressingSend:
+    def __init__(self, send: Send, encoding: str, level: int, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+        self.stream: Optional[_StreamCompressor] = None
+
+    def _mark_encoded(self, content_length: Optional[int]) -> None:
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+
+    async def __call__(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.start_message = message
+            if "content-encoding" in headers or not is_compressible(headers.get("content-type", "")):
+                self.passthrough = True
+                await self.send(message)
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is None:
+            if not more_body:
+                # Ответ одним куском — обычный случай для JSON
+                if len(body) < self.minimum_size:
+                    await self.send(self.start_message)
+                    await self.send(message)
+                    return
+                compressed = compress(body, self.encoding, self.level)
+                self._mark_encoded(len(compressed))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+
+            self.stream = _StreamCompressor(self.encoding, self.level)
+            self._mark_encoded(None)
+            await self.send(self.start_message)
+
+        chunk = self.stream.compress(body)
+        if not more_body:
+            chunk += self.stream.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -0,0 +1,161 @@
+"""
+Period resolution
+Месяцы (YYYY-MM) и названия периодов → полуоткрытые диапазоны дат [start, end)
+
+Фильтр `date >= :start AND date < :end` использует индексы (user_id, date ...),
+в отличие от EXTRACT(YEAR/MONTH FROM date), который читает всю историю.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DEFAULT_TIMEZONE = "Asia/Bishkek"
+
+# Скользящие окна, как исторически считали /analytics/dashboard и /batch
+PERIOD_DAYS = {
+    "day": 0,
+    "week": 7,
+    "month": 30,
+    "quarter": 90,
+    "year": 365,
+}
+DEFAULT_PERIOD = "month"
+
+
+@dataclass(frozen=True)
+class DateRange:
+    """Диапазон дат: start включительно, end — не включительно"""
+    start: date
+    end: date
+
+    @property
+    def last_day(self) -> date:
+        """Последний день диапазона (для API, где даты включительные)"""
+        return self.end - timedelta(days=1)
+
+    def contains(self, value: date) -> bool:
+        return self.start <= value < self.end
+
+
+def get_timezone(tz_name: Optional[str] = None) -> ZoneInfo:
+    """ZoneInfo пользователя; неизвестная зона → DEFAULT_TIMEZONE"""
+    try:
+        return ZoneInfo(tz_name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def user_today(tz_name: Optional[str] = None) -> date:
+    """Сегодняшняя дата в часовом поясе пользователя"""
+    return datetime.now(get_timezone(tz_name)).date()
+
+
+def month_of(day: date) -> DateRange:
+    """Календарный месяц, содержащий day"""
+    start = day.replace(day=1)
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return DateRange(start, end)
+
+
+def previous_month(rng: DateRange) -> DateRange:
+    """Календарный месяц перед началом rng"""
+    return month_of(rng.start - timedelta(days=1))
+
+
+def months_back(day: date, months: int) -> date:
+    """Первое число месяца, отстоящего от месяца day на months назад"""
+    index = day.year * 12 + (day.month - 1) - months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_range(month: str) -> DateRange:
+    """
+    "YYYY-MM" → диапазон месяца.
+
+    Raises:
+        ValueError: если строка не в формате YYYY-MM
+    """
+    try:
+        year, month_num = month.split("-")
+        return month_of(date(int(year), int(month_num), 1))
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError(f"Invalid month '{month}', expected YYYY-MM")
+
+
+def current_month(tz_name: Optional[str] = None) -> str:
+    """Текущий месяц пользователя в формате YYYY-MM"""
+    return user_today(tz_name).strftime("%Y-%m")
+
+
+def period_range(
+    period: Optional[str],
+    tz_name: Optional[str] = None,
+    today: Optional[date] = None,
+) -> DateRange:
+    """
+    day/week/month/quarter/year → скользящее окно, заканчивающееся сегодня (включительно).
+    Неизвестный период трактуется как month.
+    """
+    today = today or user_today(tz_name)
+    days = PERIOD_DAYS.get(period or DEFAULT_PERIOD, PERIOD_DAYS[DEFAULT_PERIOD])
+    return DateRange(today - timedelta(days=days), today + timedelta(days=1))
+
+
+# Календарный месяц до сегодняшнего дня включительно; предыдущий — полный прошлый месяц
+CALENDAR_MONTH = "calendar_month"
+
+
+@dataclass(frozen=True)
+class ResolvedPeriod:
+    """Границы периода и предыдущего периода для конкретного дня пользователя"""
+    period: str
+    today: date
+    current: DateRange
+    previous: DateRange
+
+    @property
+    def start(self) -> date:
+        return self.current.start
+
+    @property
+    def end(self) -> date:
+        return self.current.end
+
+    @property
+    def prev_start(self) -> date:
+        return self.previous.start
+
+    @property
+    def prev_end(self) -> date:
+        return self.previous.end
+
+    def cache_key_parts(self) -> tuple:
+        """Границы для ключа кэша: после полуночи по местному времени ключ меняется"""
+        return (self.period, self.start.isoformat(), self.end.isoformat())
+
+
+@lru_cache(maxsize=4096)
+def _resolve(tz_name: str, period: str, today: date) -> ResolvedPeriod:
+    if period == CALENDAR_MONTH:
+        month = month_of(today)
+        current = DateRange(month.start, today + timedelta(days=1))
+        previous = previous_month(month)
+    else:
+        period = period if period in PERIOD_DAYS else DEFAULT_PERIOD
+        current = period_range(period, today=today)
+        previous = DateRange(current.start - (current.end - current.start), current.start)
+    return ResolvedPeriod(period=period, today=today, current=current, previous=previous)
+
+
+def resolve_period(user: Any, period: Optional[str] = None) -> ResolvedPeriod:
+    """
+    Границы периода в часовом поясе пользователя (User.timezone).
+    Результат мемоизирован по (tz, period, today).
+    """
+    tz_name = getattr(user, "timezone", None) or DEFAULT_TIMEZONE
+    return _resolve(tz_name, period or DEFAULT_PERIOD, user_today(tz_name))
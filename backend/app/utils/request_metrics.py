@@ -0,0 +1,119 @@
+"""
+Request metrics
+ASGI middleware: латентность, статус и счётчики БД на HTTP-запрос
+
+Маршрут берётся после обработки из scope["route"] (FastAPI кладёт туда
+найденный APIRoute) — в метках шаблон пути, а не конкретный URL.
+Запросы без маршрута (404, статика) сводятся в "<unmatched>".
+
+После запроса число SQL-операторов сверяется с бюджетом эндпоинта
+(@query_budget) и ищутся повторы одного отпечатка (N+1). С debug_headers
+ответ получает X-DB-Queries / X-DB-Time-Ms / X-DB-Max-Repeat — их читает
+tools/query_budget_check.py.
+"""
+import logging
+import time
+from typing import Set, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..services.metrics import (
+    DB_QUERIES,
+    DB_QUERIES_PER_REQUEST,
+    DB_TIME_PER_REQUEST,
+    HTTP_IN_PROGRESS,
+    HTTP_LATENCY,
+    HTTP_REQUESTS,
+    QUERY_BUDGET_EXCEEDED,
+    REPEATED_QUERIES,
+    RequestMetrics,
+    current_request,
+    route_template,
+)
+from ..services.query_budget import check_queries, short_fingerprint, top_fingerprints
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """Сбор метрик HTTP-запросов; пути из exclude_paths не учитываются"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        exclude_paths: tuple = ("/metrics",),
+        repeat_threshold: int = 5,
+        debug_headers: bool = False,
+    ):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+        self.repeat_threshold = repeat_threshold
+        self.debug_headers = debug_headers
+        # Предупреждения в лог — один раз на маршрут / отпечаток в процессе
+        self._reported: Set[Tuple[str, str]] = set()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestMetrics(scope=scope)
+        token = current_request.set(request)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.debug_headers:
+                    message["headers"] = list(message.get("headers", [])) + self._debug_headers(request)
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_PROGRESS.dec()
+            current_request.reset(token)
+
+            route = request.route = route_template(scope)
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status_code))
+            HTTP_LATENCY.observe(elapsed, method=method, route=route)
+            DB_QUERIES.inc(request.queries, route=route)
+            DB_QUERIES_PER_REQUEST.observe(request.queries, route=route)
+            DB_TIME_PER_REQUEST.observe(request.db_seconds, route=route)
+            self._check_budget(request, scope, method)
+
+    def _debug_headers(self, request: RequestMetrics) -> list:
+        max_repeat = max(request.fingerprints.values(), default=0)
+        return [
+            (b"x-db-queries", str(request.queries).encode()),
+            (b"x-db-time-ms", f"{request.db_seconds * 1000:.1f}".encode()),
+            (b"x-db-max-repeat", str(max_repeat).encode()),
+        ]
+
+    def _check_budget(self, request: RequestMetrics, scope: Scope, method: str) -> None:
+        if not request.queries:
+            return
+        report = check_queries(request.queries, request.fingerprints, scope.get("endpoint"), self.repeat_threshold)
+        route = request.route
+
+        if report.over_budget:
+            QUERY_BUDGET_EXCEEDED.inc(route=route)
+            if (route, "") not in self._reported:
+                self._reported.add((route, ""))
+                logger.warning(
+                    f"⚠️ Query budget exceeded: {method} {route} ran {report.queries} statements "
+                    f"(budget {report.budget}); top: {top_fingerprints(request.fingerprints, 3)}"
+                )
+
+        if report.repeated:
+            REPEATED_QUERIES.inc(route=route)
+            for fp, count in report.repeated.items():
+                if (route, fp) in self._reported:
+                    continue
+                self._reported.add((route, fp))
+                logger.warning(f"⚠️ Possible N+1: {method} {route} ran {count}× {short_fingerprint(fp)}")
@@ -0,0 +1,64 @@
+"""
+JSON serialization
+Быстрое кодирование ответов: orjson, если установлен, иначе stdlib json
+
+FastJSONResponse — класс ответа по умолчанию для приложения (main.py).
+Эндпоинты, которые сами строят «чистые» dict/list (float, str, date, None),
+могут возвращать FastJSONResponse(data) напрямую — без проверки response_model
+и без jsonable_encoder. Сравнение: python tools/serialization_benchmark.py
+"""
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+from uuid import UUID
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson опционален — fallback на stdlib json
+    orjson = None
+
+# numpy-скаляры/массивы из analytics_kernel; ключи-числа в словарях
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson is not None else 0
+
+
+def _default(value: Any) -> Any:
+    """Типы, которые не кодируются напрямую"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, "model_dump"):  # pydantic
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if hasattr(value, "tolist"):  # numpy без orjson
+        return value.tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(data: Any) -> bytes:
+    """JSON в UTF-8 без пробелов (как JSONResponse FastAPI)"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(
+        data,
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse, кодирующий через orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
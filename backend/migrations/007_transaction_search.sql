@@ -0,0 +1,53 @@
+-- ═══════════════════════════════════════════════════════════════════════════
+-- Migration 007: Полнотекстовый и триграммный поиск по транзакциям
+-- Поиск по описанию больше не сканирует всю историю пользователя:
+--   * search_vector (russian + simple) для ранжированного поиска /transactions/search
+--   * pg_trgm индексы для ILIKE '%term%' (get_transactions, n8n Search_Transactions)
+-- ═══════════════════════════════════════════════════════════════════════════
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
+-- ---------------------------------------------------------------------------
+-- tsvector колонки: описание (russian со стеммингом + simple для точных слов)
+-- и категория (simple). Колонки генерируемые — триггеры не нужны.
+-- ---------------------------------------------------------------------------
+ALTER TABLE expenses ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian'::regconfig, coalesce(description, '')), 'A') ||
+        setweight(to_tsvector('simple'::regconfig, coalesce(description, '')), 'B') ||
+        setweight(to_tsvector('simple'::regconfig, coalesce(category, '')), 'C')
+    ) STORED;
+
+ALTER TABLE income ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian'::regconfig, coalesce(description, '')), 'A') ||
+        setweight(to_tsvector('simple'::regconfig, coalesce(description, '')), 'B') ||
+        setweight(to_tsvector('simple'::regconfig, coalesce(category, '')), 'C')
+    ) STORED;
+
+-- ---------------------------------------------------------------------------
+-- GIN индексы: user_id первым (btree_gin), только живые строки
+-- ---------------------------------------------------------------------------
+CREATE INDEX IF NOT EXISTS idx_expenses_search_vector
+    ON expenses USING gin (user_id, search_vector) WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_income_search_vector
+    ON income USING gin (user_id, search_vector) WHERE deleted_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_expenses_description_trgm
+    ON expenses USING gin (user_id, description gin_trgm_ops) WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_income_description_trgm
+    ON income USING gin (user_id, description gin_trgm_ops) WHERE deleted_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_expenses_category_trgm
+    ON expenses USING gin (user_id, category gin_trgm_ops) WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_income_category_trgm
+    ON income USING gin (user_id, category gin_trgm_ops) WHERE deleted_at IS NULL;
+
+-- Старые индексы по выражению to_tsvector('russian', description) из
+-- optimize_indexes.sql заменены search_vector — убираем лишнюю нагрузку на запись
+DROP INDEX IF EXISTS idx_expenses_description_search;
+DROP INDEX IF EXISTS idx_income_description_search;
+
+ANALYZE expenses;
+ANALYZE income;
@@ -0,0 +1,64 @@
+-- ═══════════════════════════════════════════════════════════════════════════
+-- Migration 008: Покрывающие частичные индексы для горячего пути чтения
+-- Все чтения фильтруют user_id = ? AND deleted_at IS NULL AND date BETWEEN ...
+-- и сортируют по date DESC, created_at DESC. Индексы ниже отдают строки уже
+-- отсортированными и без удалённых, а INCLUDE позволяет агрегатам дашборда
+-- (SUM(amount) по валютам/категориям) работать через Index Only Scan.
+--
+-- Проверка планов: python tools/index_advisor.py
+-- ═══════════════════════════════════════════════════════════════════════════
+
+CREATE INDEX IF NOT EXISTS idx_expenses_live_user_date_cover
+    ON expenses (user_id, date DESC, created_at DESC)
+    INCLUDE (amount, currency, category)
+    WHERE deleted_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_income_live_user_date_cover
+    ON income (user_id, date DESC, created_at DESC)
+    INCLUDE (amount, currency, category)
+    WHERE deleted_at IS NULL;
+
+-- Разбивка по категориям за период (analytics/categories, top_cats в /batch)
+CREATE INDEX IF NOT EXISTS idx_expenses_live_user_category_date_cover
+    ON expenses (user_id, category, date)
+    INCLUDE (amount, currency)
+    WHERE deleted_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_income_live_user_category_date_cover
+    ON income (user_id, category, date)
+    INCLUDE (amount, currency)
+    WHERE deleted_at IS NULL;
+
+-- Последние операции (recent_exp / recent_inc в /batch)
+CREATE INDEX IF NOT EXISTS idx_expenses_live_user_created
+    ON expenses (user_id, created_at DESC)
+    WHERE deleted_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_income_live_user_created
+    ON income (user_id, created_at DESC)
+    WHERE deleted_at IS NULL;
+
+-- Частичные индексы из optimize_indexes.sql, перекрытые новыми. Удаляются
+-- только частичные (WHERE deleted_at IS NULL): в базе из migration/01_schema.sql
+-- idx_*_user_date — полные (user_id, date), optimize_indexes.sql их не заменил,
+-- а без них остаются без индекса чтения по датам с удалёнными (sync, корзина).
+DO $$
+DECLARE
+    idx RECORD;
+BEGIN
+    FOR idx IN
+        SELECT schemaname, indexname FROM pg_indexes
+        WHERE tablename IN ('expenses', 'income')
+          AND indexname IN (
+              'idx_expenses_user_date', 'idx_income_user_date',
+              'idx_expenses_user_date_category', 'idx_income_user_date_category',
+              'idx_expenses_user_category', 'idx_income_user_category'
+          )
+          AND indexdef LIKE '%WHERE (deleted_at IS NULL)'
+    LOOP
+        EXECUTE format('DROP INDEX IF EXISTS %I.%I', idx.schemaname, idx.indexname);
+    END LOOP;
+END $$;
+
+ANALYZE expenses;
+ANALYZE income;
@@ -0,0 +1,25 @@
+-- ═══════════════════════════════════════════════════════════════════════════
+-- Migration 009: Хранилище AI инсайтов
+-- /ai-analytics/insights читает сохранённые инсайты вместо пересчёта на каждый
+-- запрос. Инсайт идентифицируется (user_id, insight_type, category) —
+-- перегенерация обновляет строку на месте и сохраняет is_read, если не
+-- изменилось устойчивое состояние инсайта (data.state).
+-- ═══════════════════════════════════════════════════════════════════════════
+
+-- Дубликаты по ключу (если таблицу уже заполняли) — оставляем самый свежий
+DELETE FROM ai_insights a
+USING ai_insights b
+WHERE a.user_id = b.user_id
+  AND a.insight_type = b.insight_type
+  AND COALESCE(a.category, '') = COALESCE(b.category, '')
+  AND a.id < b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_ai_insights_user_key
+    ON ai_insights (user_id, insight_type, (COALESCE(category, '')));
+
+-- Чтение виджета: активные инсайты пользователя
+CREATE INDEX IF NOT EXISTS idx_ai_insights_user_active
+    ON ai_insights (user_id, created_at DESC)
+    WHERE is_dismissed = false;
+
+ANALYZE ai_insights;
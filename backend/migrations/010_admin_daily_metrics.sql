@@ -0,0 +1,67 @@
+-- ═══════════════════════════════════════════════════════════════════════════
+-- Migration 010: Дневные метрики админки
+-- /admin/stats/daily читает готовые строки admin_daily_metrics вместо
+-- агрегатов по users/expenses/income на каждый запрос. Строки пересчитывает
+-- refresh_admin_daily_metrics(day) — её вызывает n8n workflow
+-- Admin_Daily_Metrics (ежечасно за вчера и сегодня). Функция идемпотентна.
+-- ═══════════════════════════════════════════════════════════════════════════
+
+CREATE TABLE IF NOT EXISTS admin_daily_metrics (
+    day DATE PRIMARY KEY,
+    signups INTEGER NOT NULL DEFAULT 0,
+    active_users INTEGER NOT NULL DEFAULT 0,
+    transactions INTEGER NOT NULL DEFAULT 0,
+    active_subscriptions INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Регистрации за день
+CREATE INDEX IF NOT EXISTS idx_users_registered_date
+    ON users (registered_date);
+
+-- Операции всех пользователей за день: created_at растёт вместе с таблицей,
+-- BRIN почти ничего не весит и не мешает вставкам
+CREATE INDEX IF NOT EXISTS idx_expenses_created_brin
+    ON expenses USING brin (created_at);
+
+CREATE INDEX IF NOT EXISTS idx_income_created_brin
+    ON income USING brin (created_at);
+
+CREATE OR REPLACE FUNCTION refresh_admin_daily_metrics(p_day DATE)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    WITH ops AS (
+        SELECT user_id FROM expenses
+        WHERE created_at >= p_day AND created_at < p_day + 1 AND deleted_at IS NULL
+        UNION ALL
+        SELECT user_id FROM income
+        WHERE created_at >= p_day AND created_at < p_day + 1 AND deleted_at IS NULL
+    )
+    INSERT INTO admin_daily_metrics (day, signups, active_users, transactions, active_subscriptions, updated_at)
+    SELECT
+        p_day,
+        (SELECT COUNT(*) FROM users
+         WHERE registered_date >= p_day AND registered_date < p_day + 1),
+        (SELECT COUNT(DISTINCT user_id) FROM ops),
+        (SELECT COUNT(*) FROM ops),
+        -- Подписки, действующие на конец дня (для сегодня — на текущий момент)
+        (SELECT COUNT(*) FROM users
+         WHERE is_admin = false
+           AND subscription_expires_at > LEAST(NOW(), (p_day + 1)::timestamptz)),
+        NOW()
+    ON CONFLICT (day) DO UPDATE SET
+        signups = EXCLUDED.signups,
+        active_users = EXCLUDED.active_users,
+        transactions = EXCLUDED.transactions,
+        active_subscriptions = EXCLUDED.active_subscriptions,
+        updated_at = EXCLUDED.updated_at;
+$$;
+
+-- Заполнение истории за 90 дней (active_subscriptions для прошлых дней
+-- приблизительно: продлённые подписки хранят только новую дату окончания)
+SELECT refresh_admin_daily_metrics(d::date)
+FROM generate_series(CURRENT_DATE - 90, CURRENT_DATE, interval '1 day') AS d;
+
+ANALYZE users;
+ANALYZE admin_daily_metrics;
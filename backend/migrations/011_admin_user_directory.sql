@@ -0,0 +1,17 @@
+-- ═══════════════════════════════════════════════════════════════════════════
+-- Migration 011: Поиск пользователей в админке
+-- /admin/directory и /admin/users ищут по одному выражению над
+-- username/first_name/last_name — триграммный GIN индекс по нему обслуживает
+-- LIKE '%term%' без полного сканирования users. Выражение должно совпадать
+-- с USER_NAME_EXPR в app/services/user_directory.py.
+-- ═══════════════════════════════════════════════════════════════════════════
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_users_name_trgm
+    ON users USING gin (
+        (lower(coalesce(username, '') || ' ' || coalesce(first_name, '') || ' ' || coalesce(last_name, '')))
+        gin_trgm_ops
+    );
+
+ANALYZE users;
@@ -0,0 +1,138 @@
+-- ═══════════════════════════════════════════════════════════════════════════
+-- Migration 012: Дельта-синхронизация для мини-приложения (GET /sync)
+-- Каждая запись пользователя в expenses, income, categories, budgets,
+-- savings_goals и debts получает change_seq — номер изменения из счётчика
+-- пользователя (sync_state). Жёсткие удаления оставляют строку в
+-- sync_tombstones с тем же счётчиком. Клиент хранит курсор (последний
+-- change_seq) и получает только строки с change_seq больше курсора.
+--
+-- Счётчик — на пользователя, а не общий SEQUENCE: строка sync_state
+-- блокируется до конца транзакции, поэтому номера одного пользователя
+-- становятся видимыми строго по порядку и курсор не «перепрыгивает»
+-- через ещё не закоммиченные изменения.
+-- ═══════════════════════════════════════════════════════════════════════════
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    user_id BIGINT PRIMARY KEY,
+    last_seq BIGINT NOT NULL DEFAULT 0,
+    -- Надгробия с change_seq <= pruned_seq удалены: клиентам со старым
+    -- курсором нужна полная синхронизация
+    pruned_seq BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS sync_tombstones (
+    user_id BIGINT NOT NULL,
+    change_seq BIGINT NOT NULL,
+    entity VARCHAR(32) NOT NULL,
+    entity_id BIGINT NOT NULL,
+    deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, change_seq)
+);
+
+CREATE OR REPLACE FUNCTION next_sync_seq(p_user_id BIGINT)
+RETURNS BIGINT
+LANGUAGE sql
+AS $$
+    INSERT INTO sync_state (user_id, last_seq)
+    VALUES (p_user_id, 1)
+    ON CONFLICT (user_id) DO UPDATE SET last_seq = sync_state.last_seq + 1
+    RETURNING last_seq;
+$$;
+
+CREATE OR REPLACE FUNCTION sync_stamp_change_seq()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Дефолтные категории (user_id IS NULL) не синхронизируются
+    IF NEW.user_id IS NOT NULL THEN
+        NEW.change_seq := next_sync_seq(NEW.user_id);
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION sync_record_tombstone()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF OLD.user_id IS NOT NULL THEN
+        INSERT INTO sync_tombstones (user_id, change_seq, entity, entity_id)
+        VALUES (OLD.user_id, next_sync_seq(OLD.user_id), TG_ARGV[0], OLD.id);
+    END IF;
+    RETURN OLD;
+END;
+$$;
+
+-- Колонка, триггеры и индекс (user_id, change_seq) для каждой таблицы
+DO $$
+DECLARE
+    t RECORD;
+BEGIN
+    FOR t IN
+        SELECT * FROM (VALUES
+            ('expenses', 'expenses'),
+            ('income', 'income'),
+            ('categories', 'categories'),
+            ('budgets', 'budgets'),
+            ('savings_goals', 'goals'),
+            ('debts', 'debts')
+        ) AS v(tbl, entity)
+    LOOP
+        EXECUTE format('ALTER TABLE %I ADD COLUMN IF NOT EXISTS change_seq BIGINT', t.tbl);
+
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_sync_seq ON %I', t.tbl, t.tbl);
+        EXECUTE format(
+            'CREATE TRIGGER trg_%s_sync_seq BEFORE INSERT OR UPDATE ON %I
+             FOR EACH ROW EXECUTE FUNCTION sync_stamp_change_seq()',
+            t.tbl, t.tbl
+        );
+
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_sync_tombstone ON %I', t.tbl, t.tbl);
+        EXECUTE format(
+            'CREATE TRIGGER trg_%s_sync_tombstone AFTER DELETE ON %I
+             FOR EACH ROW EXECUTE FUNCTION sync_record_tombstone(%L)',
+            t.tbl, t.tbl, t.entity
+        );
+
+        -- Строки до миграции имеют change_seq NULL и приходят только в
+        -- полной синхронизации; частичный индекс их не хранит
+        EXECUTE format(
+            'CREATE INDEX IF NOT EXISTS idx_%s_user_change_seq ON %I (user_id, change_seq)
+             WHERE change_seq IS NOT NULL',
+            t.tbl, t.tbl
+        );
+    END LOOP;
+END;
+$$;
+
+-- Очистка старых надгробий (n8n workflow Sync_Tombstones_Cleanup, раз в сутки)
+CREATE OR REPLACE FUNCTION prune_sync_tombstones(p_keep_days INTEGER DEFAULT 60)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    removed INTEGER;
+BEGIN
+    WITH pruned AS (
+        DELETE FROM sync_tombstones
+        WHERE deleted_at < NOW() - make_interval(days => p_keep_days)
+        RETURNING user_id, change_seq
+    ), per_user AS (
+        SELECT user_id, MAX(change_seq) AS max_seq, COUNT(*) AS cnt
+        FROM pruned
+        GROUP BY user_id
+    ), marked AS (
+        UPDATE sync_state s
+        SET pruned_seq = GREATEST(s.pruned_seq, p.max_seq)
+        FROM per_user p
+        WHERE s.user_id = p.user_id
+        RETURNING p.cnt
+    )
+    SELECT COALESCE(SUM(cnt), 0) INTO removed FROM marked;
+    RETURN removed;
+END;
+$$;
+
+ANALYZE sync_state;
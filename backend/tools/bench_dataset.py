@@ -0,0 +1,400 @@
+"""Bench dataset: seed a local Postgres with a synthetic, reproducible population.
+
+Creates N bench users with several years of expenses and income in mixed
+currencies (KGS / USD / EUR / RUB), a daily exchange rate history, budgets,
+savings goals with contributions, debts with payments, gamification profiles
+and achievements progress. The same --seed always produces the same rows, so
+numbers from tools/bench_endpoints.py are comparable between runs.
+
+Bench users live in a reserved id range (user_id = telegram_chat_id =
+990000000001, 990000000002, ...) with username bench_<n>; user 1 is always
+the heaviest (3x transactions) to expose worst-case paths. Generated
+exchange rates are stored with source='bench' and only fill dates that have
+no rate yet.
+
+The script refuses to write to a non-local database unless --allow-remote.
+
+Usage:
+  python tools/bench_dataset.py [--users 50] [--years 3] [--tx-per-month 60]
+                                [--seed 42] [--reset] [--allow-remote]
+  python tools/bench_dataset.py --reset --users 0      # remove bench data only
+
+Exit code 2 if DATABASE_URL is missing or not local.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+import psycopg
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+BENCH_ID_BASE = 990_000_000_000
+BENCH_ID_SPAN = 1_000_000
+BENCH_SOURCE = "bench"
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1", "postgres", "db"}
+
+# Доля валют в транзакциях и стартовые курсы к KGS
+CURRENCY_WEIGHTS = (("KGS", 80), ("USD", 10), ("RUB", 7), ("EUR", 3))
+BASE_RATES = {"USD": 87.5, "EUR": 95.0, "RUB": 0.95}
+
+# (категория, вес, мин. сумма KGS, макс. сумма KGS)
+EXPENSE_CATEGORIES = (
+    ("Продукты", 30, 150, 4000),
+    ("Кафе и рестораны", 14, 200, 3500),
+    ("Транспорт", 16, 40, 1200),
+    ("Такси", 8, 150, 900),
+    ("Связь и интернет", 3, 300, 1500),
+    ("Коммунальные услуги", 3, 1500, 9000),
+    ("Одежда", 5, 1000, 15000),
+    ("Здоровье", 4, 300, 12000),
+    ("Развлечения", 7, 300, 6000),
+    ("Подарки", 3, 500, 10000),
+    ("Образование", 2, 2000, 30000),
+    ("Прочее", 5, 50, 5000),
+)
+INCOME_CATEGORIES = (
+    ("Зарплата", 70, 40000, 150000),
+    ("Фриланс", 20, 5000, 60000),
+    ("Подарки", 5, 1000, 20000),
+    ("Проценты", 5, 200, 5000),
+)
+DESCRIPTIONS = ("", "", "", "Globus", "Народный", "Фрунзе", "Yandex Go", "Beeline", "кофе", "обед", "с друзьями")
+PEOPLE = ("Азамат", "Айгерим", "Бакыт", "Нурлан", "Эльмира", "Данияр", "Жылдыз", "Тимур")
+GOAL_NAMES = ("Отпуск", "Ноутбук", "Подушка безопасности", "Машина", "Свадьба", "Ремонт", "Телефон")
+
+
+def _dsn() -> str:
+    load_dotenv(BACKEND_DIR / ".env")
+    dsn = os.environ.get("DATABASE_URL", "").strip().strip('"').strip("'")
+    return dsn.replace("postgresql+asyncpg://", "postgresql://")
+
+
+def _level_thresholds() -> Dict[int, int]:
+    """Пороги уровней из сервиса геймификации — level согласован с total_xp"""
+    os.environ.setdefault("SECRET_KEY", "bench-dataset")
+    sys.path.insert(0, str(BACKEND_DIR))
+    from app.services.gamification import LEVEL_THRESHOLDS
+    return LEVEL_THRESHOLDS
+
+
+def _is_local(dsn: str) -> bool:
+    host = urlparse(dsn).hostname or "localhost"
+    return host in LOCAL_HOSTS
+
+
+def bench_user_id(index: int) -> int:
+    """user_id (= telegram_chat_id) bench-пользователя по номеру с 1"""
+    return BENCH_ID_BASE + index
+
+
+def _weighted(rng: random.Random, items: Sequence[tuple]) -> tuple:
+    return rng.choices(items, weights=[item[1] for item in items])[0]
+
+
+def _months(start: date, end: date) -> List[date]:
+    months, current = [], start.replace(day=1)
+    while current <= end:
+        months.append(current)
+        current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return months
+
+
+def _amount(rng: random.Random, low: float, high: float, currency: str) -> float:
+    # Лог-равномерное распределение: много мелких трат, редкие крупные
+    kgs = low * (high / low) ** rng.random()
+    if currency != "KGS":
+        kgs /= BASE_RATES[currency]
+    return round(kgs, 2)
+
+
+# ============================================
+# ОЧИСТКА
+# ============================================
+
+def reset(conn: psycopg.Connection) -> None:
+    """Удалить bench-пользователей со всеми строками и bench-курсы"""
+    lo, hi = BENCH_ID_BASE, BENCH_ID_BASE + BENCH_ID_SPAN
+    with conn.cursor() as cur:
+        # Внуки users без собственного user_id и FK без ON DELETE CASCADE — первыми
+        cur.execute("DELETE FROM debt_payments WHERE debt_id IN "
+                    "(SELECT id FROM debts WHERE user_id BETWEEN %s AND %s)", (lo, hi))
+        cur.execute("DELETE FROM goal_contributions WHERE user_id BETWEEN %s AND %s", (lo, hi))
+
+        cur.execute("""
+            SELECT table_name FROM information_schema.columns
+            WHERE table_schema = 'public' AND column_name = 'user_id'
+              AND data_type IN ('bigint', 'integer') AND table_name <> 'users'
+              AND table_name IN (SELECT table_name FROM information_schema.tables
+                                 WHERE table_schema = 'public' AND table_type = 'BASE TABLE')
+        """)
+        tables = [row[0] for row in cur.fetchall()]
+        # Триггеры удаления пишут надгробия и аудит — их чистим последними
+        late = ("audit_logs", "sync_tombstones", "sync_state")
+        tables.sort(key=lambda name: (name in late, late.index(name) if name in late else 0, name))
+        for table in tables:
+            cur.execute(f"DELETE FROM {table} WHERE user_id BETWEEN %s AND %s", (lo, hi))
+            if cur.rowcount:
+                print(f"  {table}: -{cur.rowcount}")
+
+        cur.execute("DELETE FROM users WHERE user_id BETWEEN %s AND %s", (lo, hi))
+        print(f"  users: -{cur.rowcount}")
+        cur.execute("DELETE FROM exchange_rates WHERE source = %s", (BENCH_SOURCE,))
+        print(f"  exchange_rates: -{cur.rowcount}")
+    conn.commit()
+
+
+# ============================================
+# ГЕНЕРАЦИЯ
+# ============================================
+
+def seed_rates(conn: psycopg.Connection, rng: random.Random, start: date, end: date) -> int:
+    """Дневные курсы X→KGS случайным блужданием; существующие даты не трогаем"""
+    rows = []
+    for currency, base in BASE_RATES.items():
+        rate = base
+        day = start
+        while day <= end:
+            rate = max(base * 0.7, min(base * 1.3, rate * (1 + rng.gauss(0, 0.004))))
+            rows.append((day, currency, round(rate, 4)))
+            day += timedelta(days=1)
+
+    with conn.cursor() as cur:
+        cur.execute("CREATE TEMP TABLE bench_rates (date DATE, from_currency VARCHAR(10), rate NUMERIC) ON COMMIT DROP")
+        with cur.copy("COPY bench_rates (date, from_currency, rate) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+        cur.execute("""
+            INSERT INTO exchange_rates (date, from_currency, to_currency, rate, source)
+            SELECT b.date, b.from_currency, 'KGS', b.rate, %s
+            FROM bench_rates b
+            WHERE NOT EXISTS (
+                SELECT 1 FROM exchange_rates r
+                WHERE r.date = b.date AND r.from_currency = b.from_currency AND r.to_currency = 'KGS'
+            )
+        """, (BENCH_SOURCE,))
+        inserted = cur.rowcount
+    conn.commit()
+    return inserted
+
+
+def _transactions(rng: random.Random, months: List[date], today: date, per_month: float,
+                  categories: Sequence[tuple], income: bool) -> List[tuple]:
+    rows = []
+    for month in months:
+        next_month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+        last_day = min(today, next_month - timedelta(days=1))
+        span = (last_day - month).days + 1
+        count = max(0, round(per_month * rng.uniform(0.7, 1.3) * span / 30))
+        for _ in range(count):
+            category, _, low, high = _weighted(rng, categories)
+            currency = _weighted(rng, CURRENCY_WEIGHTS)[0]
+            if income and category == "Зарплата":
+                currency = "KGS"
+            day = month + timedelta(days=rng.randrange(span))
+            created = datetime.combine(day, datetime.min.time()) + timedelta(seconds=rng.randrange(8 * 3600, 23 * 3600))
+            deleted = created + timedelta(hours=1) if rng.random() < 0.02 else None
+            rows.append((day, category, _amount(rng, low, high, currency), rng.choice(DESCRIPTIONS) or None,
+                         currency, created, deleted))
+    return rows
+
+
+def _copy_transactions(cur: psycopg.Cursor, table: str, user_id: int, rows: List[tuple]) -> None:
+    with cur.copy(
+        f"COPY {table} (user_id, date, category, amount, description, currency, source, "
+        f"created_at, updated_at, deleted_at) FROM STDIN"
+    ) as copy:
+        for day, category, amount, description, currency, created, deleted in rows:
+            copy.write_row((user_id, day, category, amount, description, currency, BENCH_SOURCE,
+                            created, deleted or created, deleted))
+
+
+def seed_user(conn: psycopg.Connection, index: int, args: argparse.Namespace,
+              achievements: List[Tuple[str, int]], thresholds: Dict[int, int],
+              today: date) -> Dict[str, int]:
+    """Один bench-пользователь со всеми данными; возвращает число строк по таблицам"""
+    rng = random.Random(f"{args.seed}:{index}")
+    user_id = bench_user_id(index)
+    start = today.replace(year=today.year - args.years, day=1)
+    months = _months(start, today)
+    activity = 3.0 if index == 1 else rng.uniform(0.4, 1.6)
+    counts: Dict[str, int] = {}
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO users (user_id, telegram_chat_id, username, first_name, language_code,
+                               timezone, preferred_currency, registered_date, last_activity,
+                               onboarding_completed, onboarding_step, registration_source)
+            VALUES (%s, %s, %s, 'Bench', 'ru', 'Asia/Bishkek', %s, %s, now(), true, 5, %s)
+        """, (user_id, user_id, f"bench_{index}", "USD" if rng.random() < 0.1 else "KGS",
+              datetime.combine(start, datetime.min.time()), BENCH_SOURCE))
+
+        for name, icon in (("Питомцы", "🐾"), ("Хобби", "🎨")):
+            cur.execute("INSERT INTO categories (user_id, name, type, icon) VALUES (%s, %s, 'expense', %s)",
+                        (user_id, name, icon))
+
+        expenses = _transactions(rng, months, today, args.tx_per_month * activity, EXPENSE_CATEGORIES, False)
+        income = _transactions(rng, months, today, max(1.0, args.tx_per_month * activity / 20), INCOME_CATEGORIES, True)
+        _copy_transactions(cur, "expenses", user_id, expenses)
+        _copy_transactions(cur, "income", user_id, income)
+        counts["expenses"], counts["income"] = len(expenses), len(income)
+
+        budgets = [(user_id, m.strftime("%Y-%m"), round(rng.uniform(40000, 120000), -3)) for m in months[-12:]]
+        cur.executemany("INSERT INTO budgets (user_id, month, budget_amount) VALUES (%s, %s, %s)", budgets)
+        counts["budgets"] = len(budgets)
+
+        counts["savings_goals"] = counts["goal_contributions"] = 0
+        for _ in range(rng.randint(0, 4)):
+            target = round(rng.uniform(20000, 500000), -2)
+            current = round(min(target, target * rng.uniform(0, 1.1)), 2)
+            completed = current >= target
+            cur.execute("""
+                INSERT INTO savings_goals (user_id, name, target_amount, current_amount, currency,
+                                           deadline, is_completed, completed_at, is_active)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, true) RETURNING id
+            """, (user_id, rng.choice(GOAL_NAMES), target, current, "USD" if rng.random() < 0.15 else "KGS",
+                  today + timedelta(days=rng.randint(30, 720)) if rng.random() < 0.7 else None,
+                  completed, datetime.now() if completed else None))
+            goal_id = cur.fetchone()[0]
+            counts["savings_goals"] += 1
+            parts = rng.randint(1, 5) if current > 0 else 0
+            for amount in _split(rng, current, parts):
+                cur.execute("INSERT INTO goal_contributions (goal_id, user_id, amount, type, source) "
+                            "VALUES (%s, %s, %s, 'deposit', %s)", (goal_id, user_id, amount, BENCH_SOURCE))
+                counts["goal_contributions"] += 1
+
+        counts["debts"] = counts["debt_payments"] = 0
+        for _ in range(rng.randint(0, 5)):
+            currency = _weighted(rng, CURRENCY_WEIGHTS)[0]
+            original = _amount(rng, 1000, 100000, currency)
+            settled = rng.random() < 0.2
+            remaining = 0.0 if settled else round(original * rng.uniform(0.1, 1), 2)
+            cur.execute("""
+                INSERT INTO debts (user_id, person_name, debt_type, original_amount, remaining_amount,
+                                   currency, due_date, is_settled, settled_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
+            """, (user_id, rng.choice(PEOPLE), rng.choice(("given", "received")), original, remaining, currency,
+                  today + timedelta(days=rng.randint(-60, 180)) if rng.random() < 0.6 else None,
+                  settled, datetime.now() if settled else None))
+            debt_id = cur.fetchone()[0]
+            counts["debts"] += 1
+            paid = round(original - remaining, 2)
+            for amount in _split(rng, paid, rng.randint(1, 3) if paid > 0 else 0):
+                cur.execute("INSERT INTO debt_payments (debt_id, amount, payment_date) VALUES (%s, %s, %s)",
+                            (debt_id, amount, today - timedelta(days=rng.randint(0, 365))))
+                counts["debt_payments"] += 1
+
+        total_tx = len(expenses) + len(income)
+        total_xp = total_tx * 5 + rng.randint(0, 2000)
+        level = max(lvl for lvl, xp in thresholds.items() if total_xp >= xp)
+        streak = rng.randint(0, 60)
+        unlocked = [a for a in achievements if rng.random() < 0.35]
+        cur.execute("""
+            INSERT INTO user_gamification (user_id, level, xp, total_xp, current_streak, max_streak,
+                                           last_activity_date, total_transactions, total_achievements)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (user_id, level, total_xp, total_xp, streak, streak + rng.randint(0, 30),
+              today - timedelta(days=rng.randint(0, 2)), total_tx, len(unlocked)))
+
+        rows = []
+        for achievement_id, target in achievements:
+            if (achievement_id, target) in unlocked:
+                rows.append((user_id, achievement_id, target, target, datetime.now()))
+            elif rng.random() < 0.5:
+                rows.append((user_id, achievement_id, rng.randint(0, max(0, target - 1)), target, None))
+        cur.executemany("INSERT INTO user_achievements (user_id, achievement_id, progress, max_progress, unlocked_at) "
+                        "VALUES (%s, %s, %s, %s, %s)", rows)
+        counts["user_achievements"] = len(rows)
+
+    conn.commit()
+    return counts
+
+
+def _split(rng: random.Random, total: float, parts: int) -> List[float]:
+    """Разбить сумму на parts положительных частей (последняя — остаток)"""
+    if parts <= 0 or total <= 0:
+        return []
+    cuts = sorted(rng.random() for _ in range(parts - 1))
+    bounds = [0.0, *cuts, 1.0]
+    amounts = [round(total * (b - a), 2) for a, b in zip(bounds, bounds[1:])]
+    amounts[-1] = round(total - sum(amounts[:-1]), 2)
+    return [a for a in amounts if a > 0]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Seed a local database with a synthetic bench population")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--tx-per-month", type=float, default=60.0, help="Average expenses per user per month")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="Delete existing bench users and rates first")
+    parser.add_argument("--allow-remote", action="store_true", help="Allow a non-local DATABASE_URL")
+    args = parser.parse_args()
+
+    dsn = _dsn()
+    if not dsn:
+        print("DATABASE_URL is not set")
+        return 2
+    if not _is_local(dsn) and not args.allow_remote:
+        print(f"refusing to seed non-local database {urlparse(dsn).hostname} (use --allow-remote)")
+        return 2
+    if args.users >= BENCH_ID_SPAN:
+        print(f"--users must be below {BENCH_ID_SPAN}")
+        return 2
+
+    today = date.today()
+    started = time.perf_counter()
+    with psycopg.connect(dsn) as conn:
+        if args.reset:
+            print("reset bench data")
+            reset(conn)
+        if args.users <= 0:
+            return 0
+
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM users WHERE user_id BETWEEN %s AND %s",
+                        (BENCH_ID_BASE, BENCH_ID_BASE + BENCH_ID_SPAN))
+            if cur.fetchone()[0]:
+                print("bench users already exist: run with --reset to regenerate")
+                return 2
+            cur.execute("SELECT id, COALESCE(condition_value, 1) FROM achievements WHERE is_active ORDER BY id")
+            achievements = [(row[0], row[1]) for row in cur.fetchall()]
+        if not achievements:
+            print("note: achievements table is empty, apply migrations/gamification.sql for achievement progress")
+
+        thresholds = _level_thresholds()
+        rates = seed_rates(conn, random.Random(args.seed), today.replace(year=today.year - args.years, day=1), today)
+        print(f"exchange_rates: +{rates}")
+
+        totals: Dict[str, int] = {}
+        for index in range(1, args.users + 1):
+            for table, count in seed_user(conn, index, args, achievements, thresholds, today).items():
+                totals[table] = totals.get(table, 0) + count
+            if index % 10 == 0 or index == args.users:
+                print(f"  users {index}/{args.users}", file=sys.stderr)
+
+        with conn.cursor() as cur:
+            for table in ("expenses", "income", "exchange_rates"):
+                cur.execute(f"ANALYZE {table}")
+        conn.commit()
+
+    print(f"users: +{args.users}")
+    for table, count in totals.items():
+        print(f"{table}: +{count}")
+    print(f"done in {time.perf_counter() - started:.1f}s (seed {args.seed}, "
+          f"chat ids {bench_user_id(1)}..{bench_user_id(args.users)})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,280 @@
+"""Bench endpoints: latency percentiles and SQL per request for the hot API paths.
+
+Drives the endpoints the mini-app hits most against a local API whose database
+was seeded with tools/bench_dataset.py:
+  batch         GET  /analytics/batch
+  dashboard     GET  /analytics/dashboard
+  transactions  GET  /transactions?page=1..5
+  export        GET  /export/transactions?format=csv
+  create        POST /expenses
+Each scenario runs --requests requests at every --concurrency level, spread
+over the bench users in a seeded order (user 1 is the heaviest). Reported per
+scenario and level: p50 / p95 / p99 latency, throughput, errors and the mean
+SQL statements per request from X-DB-Queries.
+
+Start the server with QUERY_DEBUG_HEADERS=true (otherwise queries show "-"),
+without REDIS_URL and with the same settings each run: the cache hit ratio is
+part of the result. "create" writes expenses for bench users only; reseed with
+bench_dataset.py --reset to return to the same dataset.
+
+--save-baseline stores the results as JSON; --baseline compares against it and
+flags a regression when p95 grows by more than --tolerance (and at least
+--min-delta-ms) or when queries per request grow.
+
+Usage:
+  python tools/bench_endpoints.py [--base-url http://127.0.0.1:8000] [--users 20]
+                                  [--concurrency 1,8,32] [--requests 200]
+                                  [--scenarios batch,dashboard,transactions,export,create]
+                                  [--save-baseline PATH] [--baseline PATH] [--tolerance 0.2]
+                                  [--json]
+
+Exit code 1 on a regression against the baseline, 2 if the bench could not
+run (no bench users, auth failed).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from bench_dataset import EXPENSE_CATEGORIES, bench_user_id
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    method: str
+    # (rng) -> (путь, query, json)
+    build: Callable[[random.Random], tuple]
+
+
+def _create_expense(rng: random.Random) -> tuple:
+    category = rng.choice(EXPENSE_CATEGORIES)[0]
+    payload = {
+        "amount": round(rng.uniform(50, 3000), 2),
+        "currency": "KGS",
+        "category": category,
+        "description": "bench",
+        "date": (date.today() - timedelta(days=rng.randint(0, 3))).isoformat(),
+    }
+    return "/expenses", None, payload
+
+
+SCENARIOS: Dict[str, Scenario] = {s.name: s for s in (
+    Scenario("batch", "GET", lambda rng: ("/analytics/batch", {"period": "month"}, None)),
+    Scenario("dashboard", "GET", lambda rng: ("/analytics/dashboard", {"period": "month"}, None)),
+    Scenario("transactions", "GET", lambda rng: ("/transactions", {"page": rng.randint(1, 5)}, None)),
+    Scenario("export", "GET", lambda rng: ("/export/transactions", {"format": "csv"}, None)),
+    Scenario("create", "POST", _create_expense),
+)}
+
+
+@dataclass
+class Sample:
+    elapsed_ms: float
+    status: Optional[int]
+    queries: Optional[int]
+
+
+@dataclass
+class LevelResult:
+    scenario: str
+    concurrency: int
+    requests: int
+    errors: int
+    rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    queries: Optional[float]
+    max_queries: Optional[int]
+    regressions: List[str] = field(default_factory=list)
+
+    @property
+    def key(self) -> str:
+        return f"{self.scenario}@{self.concurrency}"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Процентиль методом ближайшего ранга"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return round(ordered[int(rank) - 1], 1)
+
+
+def summarize(scenario: str, concurrency: int, samples: List[Sample], wall: float) -> LevelResult:
+    latencies = [s.elapsed_ms for s in samples]
+    queries = [s.queries for s in samples if s.queries is not None]
+    return LevelResult(
+        scenario=scenario,
+        concurrency=concurrency,
+        requests=len(samples),
+        errors=sum(1 for s in samples if s.status is None or s.status >= 400),
+        rps=round(len(samples) / wall, 1) if wall > 0 else 0.0,
+        p50_ms=percentile(latencies, 50),
+        p95_ms=percentile(latencies, 95),
+        p99_ms=percentile(latencies, 99),
+        queries=round(sum(queries) / len(queries), 2) if queries else None,
+        max_queries=max(queries) if queries else None,
+    )
+
+
+async def authenticate(client: httpx.AsyncClient, api: str, chat_id: int) -> Optional[str]:
+    res = await client.post(f"{api}/auth/telegram", json={"telegram_chat_id": str(chat_id)})
+    if res.status_code != 200:
+        print(f"auth failed for {chat_id}: {res.status_code} {res.text[:200]}", file=sys.stderr)
+        return None
+    return res.json().get("access_token")
+
+
+async def _request(client: httpx.AsyncClient, api: str, scenario: Scenario, token: str,
+                   rng: random.Random) -> Sample:
+    path, params, payload = scenario.build(rng)
+    start = time.perf_counter()
+    try:
+        res = await client.request(scenario.method, f"{api}{path}", params=params, json=payload,
+                                   headers={"Authorization": f"Bearer {token}"})
+    except httpx.HTTPError:
+        return Sample((time.perf_counter() - start) * 1000, None, None)
+    elapsed = (time.perf_counter() - start) * 1000
+    queries = res.headers.get("x-db-queries")
+    return Sample(elapsed, res.status_code, int(queries) if queries is not None else None)
+
+
+async def run_level(client: httpx.AsyncClient, api: str, scenario: Scenario, tokens: List[str],
+                    concurrency: int, requests: int, warmup: int, seed: int) -> LevelResult:
+    """requests запросов сценария при concurrency одновременных воркерах"""
+    rng = random.Random(f"{seed}:{scenario.name}:{concurrency}")
+    plan = [(tokens[i % len(tokens)], random.Random(rng.random())) for i in range(warmup + requests)]
+    rng.shuffle(plan)
+
+    for token, req_rng in plan[:warmup]:
+        await _request(client, api, scenario, token, req_rng)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in plan[warmup:]:
+        queue.put_nowait(item)
+    samples: List[Sample] = []
+
+    async def worker() -> None:
+        while not queue.empty():
+            token, req_rng = queue.get_nowait()
+            samples.append(await _request(client, api, scenario, token, req_rng))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(scenario.name, concurrency, samples, time.perf_counter() - start)
+
+
+def compare(results: List[LevelResult], baseline: Dict[str, Any], tolerance: float, min_delta_ms: float) -> None:
+    """Отметить регрессии относительно сохранённого baseline"""
+    previous = baseline.get("results", {})
+    for r in results:
+        base = previous.get(r.key)
+        if not base:
+            continue
+        limit = max(base["p95_ms"] * (1 + tolerance), base["p95_ms"] + min_delta_ms)
+        if r.p95_ms > limit:
+            r.regressions.append(f"p95 {base['p95_ms']} -> {r.p95_ms} ms")
+        if r.queries is not None and base.get("queries") is not None and r.queries > base["queries"] + 0.5:
+            r.regressions.append(f"queries {base['queries']} -> {r.queries}")
+        if r.errors > base.get("errors", 0):
+            r.regressions.append(f"errors {base.get('errors', 0)} -> {r.errors}")
+
+
+async def run(args: argparse.Namespace) -> Optional[List[LevelResult]]:
+    api = args.base_url.rstrip("/") + args.api_prefix
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        tokens = await asyncio.gather(*(authenticate(client, api, bench_user_id(i)) for i in range(1, args.users + 1)))
+        if not all(tokens):
+            print("run tools/bench_dataset.py first (bench users must exist)", file=sys.stderr)
+            return None
+
+        results = []
+        for name in args.scenarios:
+            for concurrency in args.concurrency:
+                result = await run_level(client, api, SCENARIOS[name], tokens, concurrency,
+                                         args.requests, args.warmup, args.seed)
+                results.append(result)
+                print(f"  {result.key}: p95 {result.p95_ms} ms", file=sys.stderr)
+        return results
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _scenario_list(value: str) -> List[str]:
+    names = [v.strip() for v in value.split(",") if v.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown scenarios: {', '.join(unknown)}")
+    return names
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark hot API endpoints on a seeded local instance")
+    parser.add_argument("--base-url", default=os.getenv("API_BASE_URL", "http://127.0.0.1:8000"))
+    parser.add_argument("--api-prefix", default=os.getenv("API_PREFIX", "/api/v1"))
+    parser.add_argument("--users", type=int, default=20, help="Bench users to spread requests over")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario and level")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--scenarios", type=_scenario_list, default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--save-baseline", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative p95 growth")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="Ignore p95 growth below this")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if results is None:
+        return 2
+
+    if args.baseline:
+        compare(results, json.loads(args.baseline.read_text(encoding="utf-8")),
+                args.tolerance, args.min_delta_ms)
+
+    if args.json:
+        print(json.dumps([asdict(r) for r in results], ensure_ascii=False, indent=2))
+    else:
+        print(f"{'scenario':22} {'reqs':>5} {'err':>4} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8}")
+        for r in results:
+            verdict = f"  REGRESSION: {'; '.join(r.regressions)}" if r.regressions else ""
+            queries = f"{r.queries}" if r.queries is not None else "-"
+            print(f"{r.key:22} {r.requests:>5} {r.errors:>4} {r.rps:>7} {r.p50_ms:>8} {r.p95_ms:>8} "
+                  f"{r.p99_ms:>8} {queries:>8}{verdict}")
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps({
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "base_url": args.base_url,
+            "users": args.users,
+            "requests": args.requests,
+            "seed": args.seed,
+            "results": {r.key: {k: v for k, v in asdict(r).items() if k != "regressions"} for r in results},
+        }, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"baseline saved to {args.save_baseline}")
+
+    return 1 if any(r.regressions for r in results) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
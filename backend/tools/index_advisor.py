@@ -0,0 +1,243 @@
+"""Index advisor: apply covering indexes and verify query plans of the hot endpoints.
+
+Runs EXPLAIN (FORMAT JSON) for the main read queries (dashboard, transactions list,
+category breakdown, batch) against DATABASE_URL and checks that:
+  * expenses / income are never read with a Seq Scan;
+  * the expected partial index is used;
+  * list queries do not need a Sort node (index order matches ORDER BY);
+  * total cost did not grow compared to a saved baseline.
+
+Usage:
+  python tools/index_advisor.py [--user-id N] [--apply] [--analyze]
+                                [--save-baseline PATH] [--baseline PATH] [--tolerance 0.2]
+
+Exit code 1 if any check fails (usable in CI against a local database).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+import psycopg
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+MIGRATION_PATH = BACKEND_DIR / "migrations" / "008_soft_delete_covering_indexes.sql"
+
+HOT_TABLES = ("expenses", "income")
+
+
+@dataclass
+class PlanCheck:
+    name: str
+    sql: str
+    expect_indexes: tuple = ()
+    forbid_sort: bool = False
+
+
+@dataclass
+class PlanReport:
+    name: str
+    total_cost: float
+    execution_ms: Optional[float]
+    node_types: List[str]
+    indexes: List[str]
+    problems: List[str] = field(default_factory=list)
+
+
+CHECKS: List[PlanCheck] = [
+    PlanCheck(
+        name="transactions_list",
+        sql="""
+            SELECT * FROM (
+                SELECT id, amount, currency, category, description, date, created_at, 'expense' AS type
+                FROM expenses WHERE user_id = %(user_id)s AND deleted_at IS NULL
+                UNION ALL
+                SELECT id, amount, currency, category, description, date, created_at, 'income' AS type
+                FROM income WHERE user_id = %(user_id)s AND deleted_at IS NULL
+            ) t
+            ORDER BY date DESC, created_at DESC
+            LIMIT 50
+        """,
+        expect_indexes=("idx_expenses_live_user_date_cover", "idx_income_live_user_date_cover"),
+    ),
+    PlanCheck(
+        name="expenses_page",
+        sql="""
+            SELECT id, amount, currency, category, description, date, created_at
+            FROM expenses
+            WHERE user_id = %(user_id)s AND deleted_at IS NULL
+            ORDER BY date DESC, created_at DESC
+            LIMIT 50
+        """,
+        expect_indexes=("idx_expenses_live_user_date_cover",),
+        forbid_sort=True,
+    ),
+    PlanCheck(
+        name="dashboard_period_totals",
+        sql="""
+            SELECT
+                (SELECT COALESCE(SUM(amount), 0) FROM income
+                 WHERE user_id = %(user_id)s AND date >= %(start_date)s AND date <= %(end_date)s
+                   AND deleted_at IS NULL) AS total_income,
+                (SELECT COALESCE(SUM(amount), 0) FROM expenses
+                 WHERE user_id = %(user_id)s AND date >= %(start_date)s AND date <= %(end_date)s
+                   AND deleted_at IS NULL) AS total_expense
+        """,
+        expect_indexes=("idx_expenses_live_user_date_cover", "idx_income_live_user_date_cover"),
+    ),
+    PlanCheck(
+        name="category_breakdown",
+        sql="""
+            SELECT category, currency, SUM(amount), COUNT(*)
+            FROM expenses
+            WHERE user_id = %(user_id)s AND date >= %(start_date)s AND date <= %(end_date)s
+              AND deleted_at IS NULL
+            GROUP BY category, currency
+        """,
+        expect_indexes=(
+            "idx_expenses_live_user_date_cover",
+            "idx_expenses_live_user_category_date_cover",
+        ),
+    ),
+    PlanCheck(
+        name="batch_recent_expenses",
+        sql="""
+            SELECT id, amount, currency, category, description, date, created_at
+            FROM expenses
+            WHERE user_id = %(user_id)s AND deleted_at IS NULL
+            ORDER BY created_at DESC
+            LIMIT 5
+        """,
+        expect_indexes=("idx_expenses_live_user_created",),
+        forbid_sort=True,
+    ),
+]
+
+
+def _dsn() -> str:
+    load_dotenv(BACKEND_DIR / ".env")
+    dsn = os.environ.get("DATABASE_URL", "").strip().strip('"').strip("'")
+    return dsn.replace("postgresql+asyncpg://", "postgresql://")
+
+
+def _walk(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []) or []:
+        yield from _walk(child)
+
+
+def analyze_plan(check: PlanCheck, explain: Dict[str, Any]) -> PlanReport:
+    root = explain["Plan"]
+    nodes = list(_walk(root))
+    indexes = sorted({n["Index Name"] for n in nodes if n.get("Index Name")})
+    report = PlanReport(
+        name=check.name,
+        total_cost=float(root.get("Total Cost", 0)),
+        execution_ms=explain.get("Execution Time"),
+        node_types=[n["Node Type"] for n in nodes],
+        indexes=indexes,
+    )
+
+    for n in nodes:
+        if n["Node Type"] == "Seq Scan" and n.get("Relation Name") in HOT_TABLES:
+            report.problems.append(f"Seq Scan on {n['Relation Name']}")
+    if check.expect_indexes and not any(i in indexes for i in check.expect_indexes):
+        report.problems.append(f"none of {', '.join(check.expect_indexes)} used (got: {', '.join(indexes) or '-'})")
+    if check.forbid_sort and any(n["Node Type"] in ("Sort", "Incremental Sort") for n in nodes):
+        report.problems.append("plan contains Sort")
+    return report
+
+
+def apply_migration(conn: psycopg.Connection) -> None:
+    sql = MIGRATION_PATH.read_text(encoding="utf-8")
+    with conn.cursor() as cur:
+        cur.execute(sql)
+    conn.commit()
+    print(f"Applied {MIGRATION_PATH.name}")
+
+
+def pick_user_id(conn: psycopg.Connection) -> Optional[int]:
+    """Пользователь с наибольшим числом расходов — самый показательный план"""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT user_id FROM expenses WHERE deleted_at IS NULL "
+            "GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1"
+        )
+        row = cur.fetchone()
+    return row[0] if row else None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Verify hot-path query plans")
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--days", type=int, default=30, help="Period for date-range queries")
+    parser.add_argument("--apply", action="store_true", help="Apply migration 008 before checking")
+    parser.add_argument("--analyze", action="store_true", help="Use EXPLAIN ANALYZE (executes queries)")
+    parser.add_argument("--baseline", type=Path, default=None, help="Compare costs with a saved baseline")
+    parser.add_argument("--save-baseline", type=Path, default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative cost growth")
+    args = parser.parse_args()
+
+    dsn = _dsn()
+    if not dsn:
+        print("DATABASE_URL is not set")
+        return 2
+
+    with psycopg.connect(dsn) as conn:
+        if args.apply:
+            apply_migration(conn)
+
+        user_id = args.user_id or pick_user_id(conn)
+        if user_id is None:
+            print("No expenses found; pass --user-id")
+            return 2
+
+        end = date.today()
+        params = {"user_id": user_id, "start_date": end - timedelta(days=args.days), "end_date": end}
+        explain = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " if args.analyze else "EXPLAIN (FORMAT JSON) "
+
+        reports: List[PlanReport] = []
+        with conn.cursor() as cur:
+            for check in CHECKS:
+                cur.execute(explain + check.sql, params)
+                raw = cur.fetchone()[0]
+                plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+                reports.append(analyze_plan(check, plan))
+        conn.rollback()
+
+    baseline: Dict[str, float] = {}
+    if args.baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+
+    failed = 0
+    print(f"user_id={user_id} period={params['start_date']}..{params['end_date']}")
+    for r in reports:
+        prev = baseline.get(r.name)
+        if prev and r.total_cost > prev * (1 + args.tolerance):
+            r.problems.append(f"cost regression {prev:.1f} -> {r.total_cost:.1f}")
+
+        status = "FAIL" if r.problems else "ok"
+        timing = f" {r.execution_ms:.2f}ms" if r.execution_ms is not None else ""
+        print(f"[{status}] {r.name}: cost={r.total_cost:.1f}{timing} indexes={', '.join(r.indexes) or '-'}")
+        for p in r.problems:
+            print(f"       - {p}")
+        failed += bool(r.problems)
+
+    if args.save_baseline:
+        args.save_baseline.write_text(
+            json.dumps({r.name: r.total_cost for r in reports}, indent=2), encoding="utf-8"
+        )
+        print(f"Baseline saved to {args.save_baseline}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
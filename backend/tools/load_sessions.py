@@ -0,0 +1,370 @@
+"""Load sessions: replay mini-app sessions with ramping virtual users.
+
+A session is what one app open does: authenticate, fire the launch requests
+in parallel and keep the WebSocket open while the user looks at the screen:
+  POST /auth/telegram
+  GET  /auth/me, /analytics/batch, /categories/all, /gamification/profile,
+       /transactions?page=1                                    (in parallel)
+  WS   /ws?token=...                                           (held open)
+Sessions are picked by weight; some of them write (expense / income), which
+invalidates the user's caches and runs gamification, then re-read what the
+app refreshes after a write:
+  launch        6  app open only
+  add_expense   3  + POST /expenses, then /analytics/batch + /gamification/profile
+  browse        2  + /transactions?page=2..3 + /analytics/dashboard
+  add_income    1  + POST /income, then /analytics/batch
+
+Virtual users start at --start-users and grow by --step-users every
+--step-seconds up to --max-users; each one loops sessions with an exponential
+think time (--think). Every stage reports requests/s, sessions/s, latency
+percentiles, error rate and the slowest endpoint. Saturation is the first
+stage where the error rate exceeds --max-error-rate, p95 exceeds
+--p95-limit-ms or throughput stops growing with users; the report names the
+last healthy stage before it.
+
+Run against a local instance seeded with tools/bench_dataset.py: virtual
+users log in as the bench users (--users of them, round robin).
+
+Usage:
+  python tools/load_sessions.py [--base-url http://127.0.0.1:8000] [--users 50]
+                                [--start-users 10] [--step-users 10] [--max-users 200]
+                                [--step-seconds 30] [--think 2.0] [--hold-ws 5.0]
+                                [--p95-limit-ms 1000] [--max-error-rate 0.01] [--json]
+
+Exit code 1 if a stage exceeded --max-error-rate, 2 if the harness could not
+start (server unreachable, bench users missing).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import websockets
+
+from bench_dataset import EXPENSE_CATEGORIES, INCOME_CATEGORIES, bench_user_id
+from bench_endpoints import percentile
+
+LAUNCH = (
+    ("me", "GET", "/auth/me", None),
+    ("batch", "GET", "/analytics/batch", {"period": "month"}),
+    ("categories", "GET", "/categories/all", None),
+    ("gamification", "GET", "/gamification/profile", None),
+    ("transactions", "GET", "/transactions", {"page": 1}),
+)
+
+# Сессия: (имя, вес, группы шагов после запуска); шаги группы идут параллельно
+SESSIONS = (
+    ("launch", 6, ()),
+    ("add_expense", 3, (
+        (("create_expense", "POST", "/expenses", None),),
+        (("batch", "GET", "/analytics/batch", {"period": "month"}),
+         ("gamification", "GET", "/gamification/profile", None)),
+    )),
+    ("browse", 2, (
+        (("transactions_p2", "GET", "/transactions", {"page": 2}),),
+        (("transactions_p3", "GET", "/transactions", {"page": 3}),
+         ("dashboard", "GET", "/analytics/dashboard", {"period": "month"})),
+    )),
+    ("add_income", 1, (
+        (("create_income", "POST", "/income", None),),
+        (("batch", "GET", "/analytics/batch", {"period": "month"}),),
+    )),
+)
+
+
+@dataclass
+class StageResult:
+    stage: int
+    users: int
+    seconds: float
+    requests: int
+    sessions: int
+    errors: int
+    error_rate: float
+    rps: float
+    sessions_per_s: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    slowest: str
+    endpoints: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    saturated: List[str] = field(default_factory=list)
+
+
+class Recorder:
+    """Замеры по стадиям нагрузки: латентность и ошибки по имени шага"""
+
+    def __init__(self) -> None:
+        self.stage = 0
+        self.samples: Dict[int, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+        self.errors: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.sessions: Dict[int, int] = defaultdict(int)
+        self.error_messages: Dict[str, int] = defaultdict(int)
+
+    def record(self, name: str, elapsed_ms: float, error: Optional[str] = None) -> None:
+        self.samples[self.stage][name].append(elapsed_ms)
+        if error:
+            self.errors[self.stage][name] += 1
+            self.error_messages[f"{name}: {error}"] += 1
+
+    def stage_result(self, stage: int, users: int, seconds: float) -> StageResult:
+        by_name = self.samples.get(stage, {})
+        errors = self.errors.get(stage, {})
+        latencies = [v for values in by_name.values() for v in values]
+        requests = len(latencies)
+        error_count = sum(errors.values())
+        endpoints = {
+            name: {
+                "requests": len(values),
+                "errors": errors.get(name, 0),
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+            }
+            for name, values in sorted(by_name.items())
+        }
+        slowest = max(endpoints, key=lambda n: endpoints[n]["p95_ms"], default="-")
+        return StageResult(
+            stage=stage,
+            users=users,
+            seconds=round(seconds, 1),
+            requests=requests,
+            sessions=self.sessions.get(stage, 0),
+            errors=error_count,
+            error_rate=round(error_count / requests, 4) if requests else 0.0,
+            rps=round(requests / seconds, 1) if seconds else 0.0,
+            sessions_per_s=round(self.sessions.get(stage, 0) / seconds, 2) if seconds else 0.0,
+            p50_ms=percentile(latencies, 50),
+            p95_ms=percentile(latencies, 95),
+            p99_ms=percentile(latencies, 99),
+            slowest=slowest,
+            endpoints=endpoints,
+        )
+
+
+class VirtualUser:
+    """Один пользователь мини-приложения: сессия за сессией с паузами"""
+
+    def __init__(self, index: int, chat_id: int, args: argparse.Namespace, client: httpx.AsyncClient,
+                 recorder: Recorder) -> None:
+        self.chat_id = chat_id
+        self.args = args
+        self.client = client
+        self.recorder = recorder
+        self.rng = random.Random(f"{args.seed}:{index}")
+        self.api = args.base_url.rstrip("/") + args.api_prefix
+        self.ws_url = self.api.replace("http://", "ws://", 1).replace("https://", "wss://", 1) + "/ws"
+
+    async def run(self, stop: asyncio.Event) -> None:
+        # Разнести старт, чтобы новая стадия не начиналась залпом
+        await self._sleep(stop, self.rng.uniform(0, self.args.think))
+        while not stop.is_set():
+            _, _, steps = self.rng.choices(SESSIONS, weights=[s[1] for s in SESSIONS])[0]
+            if await self.session(steps):
+                self.recorder.sessions[self.recorder.stage] += 1
+            await self._sleep(stop, self.rng.expovariate(1 / self.args.think) if self.args.think > 0 else 0)
+
+    async def session(self, steps: tuple) -> bool:
+        token = await self.login()
+        if not token:
+            return False
+        headers = {"Authorization": f"Bearer {token}"}
+        ws_task = asyncio.create_task(self._websocket(token))
+        try:
+            results = await asyncio.gather(*(self._step(step, headers) for step in LAUNCH))
+            for group in steps:
+                results += await asyncio.gather(*(self._step(step, headers) for step in group))
+        finally:
+            ws_ok = await ws_task
+        return all(results) and ws_ok
+
+    async def login(self) -> Optional[str]:
+        payload = {"telegram_chat_id": str(self.chat_id)}
+        ok, res = await self._call("auth", "POST", "/auth/telegram", None, payload, {})
+        return res.json().get("access_token") if ok and res is not None else None
+
+    async def _step(self, step: tuple, headers: dict) -> bool:
+        name, method, path, params = step
+        payload = self._payload(name)
+        ok, _ = await self._call(name, method, path, params, payload, headers)
+        return ok
+
+    def _payload(self, name: str) -> Optional[dict]:
+        if name not in ("create_expense", "create_income"):
+            return None
+        categories = EXPENSE_CATEGORIES if name == "create_expense" else INCOME_CATEGORIES
+        category, _, low, high = self.rng.choice(categories)
+        return {
+            "amount": round(self.rng.uniform(low, high), 2),
+            "currency": "KGS",
+            "category": category,
+            "description": "load",
+            "date": (date.today() - timedelta(days=self.rng.randint(0, 2))).isoformat(),
+        }
+
+    async def _call(self, name: str, method: str, path: str, params: Optional[dict], payload: Optional[dict],
+                    headers: dict) -> Tuple[bool, Optional[httpx.Response]]:
+        start = time.perf_counter()
+        try:
+            res = await self.client.request(method, f"{self.api}{path}", params=params, json=payload, headers=headers)
+        except httpx.HTTPError as e:
+            self.recorder.record(name, (time.perf_counter() - start) * 1000, type(e).__name__)
+            return False, None
+        elapsed = (time.perf_counter() - start) * 1000
+        error = f"HTTP {res.status_code}" if res.status_code >= 400 else None
+        self.recorder.record(name, elapsed, error)
+        return error is None, res
+
+    async def _websocket(self, token: str) -> bool:
+        """Подключение до приветствия сервера, затем удержание на время сессии"""
+        start = time.perf_counter()
+        try:
+            async with websockets.connect(f"{self.ws_url}?token={token}", open_timeout=self.args.timeout) as ws:
+                await asyncio.wait_for(ws.recv(), self.args.timeout)
+                self.recorder.record("ws_connect", (time.perf_counter() - start) * 1000)
+                await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.args.hold_ws)
+        except Exception as e:
+            self.recorder.record("ws_connect", (time.perf_counter() - start) * 1000, type(e).__name__)
+            return False
+        return True
+
+    @staticmethod
+    async def _sleep(stop: asyncio.Event, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(stop.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+
+def detect_saturation(stages: List[StageResult], p95_limit_ms: float, max_error_rate: float) -> None:
+    """Отметить стадии, где система перестала масштабироваться"""
+    for previous, stage in zip([None, *stages], stages):
+        if stage.error_rate > max_error_rate:
+            stage.saturated.append(f"error rate {stage.error_rate:.2%}")
+        if stage.p95_ms > p95_limit_ms:
+            stage.saturated.append(f"p95 {stage.p95_ms} ms")
+        if previous and previous.users and previous.rps:
+            # Рост пользователей должен давать хотя бы половину пропорционального роста rps
+            expected = previous.rps * (1 + 0.5 * (stage.users / previous.users - 1))
+            if stage.rps < expected:
+                stage.saturated.append(f"throughput {previous.rps} -> {stage.rps} req/s")
+
+
+async def run(args: argparse.Namespace) -> Optional[List[StageResult]]:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.max_users * 4, max_keepalive_connections=args.max_users * 2)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        probe = VirtualUser(0, bench_user_id(1), args, client, recorder)
+        if not await probe.login():
+            print("auth failed: is the server up and tools/bench_dataset.py applied?", file=sys.stderr)
+            return None
+        recorder.samples.clear()
+        recorder.errors.clear()
+        recorder.error_messages.clear()
+
+        stop = asyncio.Event()
+        tasks: List[asyncio.Task] = []
+        stages: List[StageResult] = []
+        users = 0
+        target = args.start_users
+        while target <= args.max_users:
+            while users < target:
+                vu = VirtualUser(users, bench_user_id(users % args.users + 1), args, client, recorder)
+                tasks.append(asyncio.create_task(vu.run(stop)))
+                users += 1
+            recorder.stage = len(stages)
+            started = time.perf_counter()
+            await asyncio.sleep(args.step_seconds)
+            stages.append(recorder.stage_result(recorder.stage, users, time.perf_counter() - started))
+            s = stages[-1]
+            print(f"  {users:>4} users: {s.rps} req/s, p95 {s.p95_ms} ms, errors {s.error_rate:.2%}", file=sys.stderr)
+            if s.error_rate > args.abort_error_rate:
+                print(f"  stopping ramp: error rate above {args.abort_error_rate:.0%}", file=sys.stderr)
+                break
+            target += args.step_users
+
+        recorder.stage = len(stages)
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    detect_saturation(stages, args.p95_limit_ms, args.max_error_rate)
+    if recorder.error_messages:
+        print("errors:", file=sys.stderr)
+        for message, count in sorted(recorder.error_messages.items(), key=lambda item: -item[1])[:10]:
+            print(f"  {count:>6}  {message}", file=sys.stderr)
+    return stages
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay weighted mini-app sessions with ramping virtual users")
+    parser.add_argument("--base-url", default=os.getenv("API_BASE_URL", "http://127.0.0.1:8000"))
+    parser.add_argument("--api-prefix", default=os.getenv("API_PREFIX", "/api/v1"))
+    parser.add_argument("--users", type=int, default=50, help="Bench users to log in as")
+    parser.add_argument("--start-users", type=int, default=10)
+    parser.add_argument("--step-users", type=int, default=10)
+    parser.add_argument("--max-users", type=int, default=200)
+    parser.add_argument("--step-seconds", type=float, default=30.0)
+    parser.add_argument("--think", type=float, default=2.0, help="Mean pause between sessions, seconds")
+    parser.add_argument("--hold-ws", type=float, default=5.0, help="Mean WebSocket hold time per session")
+    parser.add_argument("--p95-limit-ms", type=float, default=1000.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--abort-error-rate", type=float, default=0.5, help="Stop ramping above this error rate")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    if args.start_users <= 0 or args.step_users <= 0 or args.max_users < args.start_users:
+        print("need 0 < --start-users <= --max-users and --step-users > 0", file=sys.stderr)
+        return 2
+
+    stages = asyncio.run(run(args))
+    if stages is None:
+        return 2
+
+    healthy = None
+    for stage in stages:
+        if stage.saturated:
+            break
+        healthy = stage
+
+    if args.json:
+        print(json.dumps({
+            "stages": [asdict(s) for s in stages],
+            "last_healthy_users": healthy.users if healthy else None,
+        }, ensure_ascii=False, indent=2))
+    else:
+        print(f"{'users':>5} {'req/s':>7} {'sess/s':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'err%':>6}  slowest")
+        for s in stages:
+            note = f"  <- {'; '.join(s.saturated)}" if s.saturated else ""
+            print(f"{s.users:>5} {s.rps:>7} {s.sessions_per_s:>7} {s.p50_ms:>7} {s.p95_ms:>7} {s.p99_ms:>7} "
+                  f"{s.error_rate * 100:>6.2f}  {s.slowest}{note}")
+        saturated = next((s for s in stages if s.saturated), None)
+        if saturated:
+            print(f"saturation at {saturated.users} users; last healthy stage: "
+                  f"{healthy.users if healthy else 'none'} users")
+        else:
+            print(f"no saturation up to {stages[-1].users if stages else 0} users")
+
+        report = saturated or (stages[-1] if stages else None)
+        if report:
+            print(f"\nendpoints at {report.users} users:")
+            for name, e in report.endpoints.items():
+                print(f"  {name:18} {e['requests']:>7} req  p50 {e['p50_ms']:>8}  p95 {e['p95_ms']:>8}  "
+                      f"errors {e['errors']}")
+
+    return 1 if any(s.error_rate > args.max_error_rate for s in stages) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
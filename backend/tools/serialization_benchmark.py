@@ -0,0 +1,196 @@
+"""Serialization benchmark: encode time of the heaviest API payloads.
+
+Builds synthetic payloads shaped like /analytics/batch, /transactions (one page)
+and /export/summary and times the encoders used by the API:
+  * fastapi  — jsonable_encoder + json.dumps (what JSONResponse with response_model did);
+  * stdlib   — json.dumps of the ready dict (response_model bypass without orjson);
+  * fast     — app.utils.serialization.dumps (orjson when installed);
+  * csv      — csv.writer into StringIO (current /export/summary CSV path).
+
+No database is needed.
+
+Usage:
+  python tools/serialization_benchmark.py [--rows 50] [--categories 10]
+                                          [--repeat 5] [--number 200] [--json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import importlib.util
+import io
+import json
+import random
+import timeit
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+SERIALIZATION_PATH = BACKEND_DIR / "app" / "utils" / "serialization.py"
+
+CATEGORIES = [
+    "Продукты", "Транспорт", "Кафе и рестораны", "Коммунальные услуги", "Здоровье",
+    "Развлечения", "Одежда", "Связь", "Образование", "Подарки", "Дом", "Путешествия",
+]
+
+
+def load_serialization():
+    """app.utils.serialization без импорта пакета app.utils (он тянет settings)"""
+    spec = importlib.util.spec_from_file_location("serialization", SERIALIZATION_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _transaction(rng: random.Random, idx: int, kind: str, today: date) -> Dict[str, Any]:
+    day = today - timedelta(days=rng.randint(0, 90))
+    return {
+        "id": idx,
+        "amount": round(rng.uniform(50, 15000), 2),
+        "currency": rng.choice(("KGS", "KGS", "KGS", "USD", "RUB")),
+        "category": rng.choice(CATEGORIES),
+        "description": f"Операция #{idx} — {rng.choice(CATEGORIES).lower()}",
+        "type": kind,
+        "date": day.isoformat(),
+        "created_at": datetime.combine(day, datetime.min.time()).isoformat(),
+    }
+
+
+def batch_payload(rng: random.Random, rows: int, categories: int) -> Dict[str, Any]:
+    today = date.today()
+    top = []
+    for name in CATEGORIES[:categories]:
+        top.append({
+            "category": name,
+            "total_amount": round(rng.uniform(500, 50000), 2),
+            "transaction_count": rng.randint(1, 60),
+            "percentage": round(rng.uniform(1, 40), 1),
+            "currency": "KGS",
+        })
+    return {
+        "balance": {
+            "total_income": 120000.0, "total_expense": 87654.32, "balance": 32345.68,
+            "income_count": 12, "expense_count": 140, "currency": "KGS",
+            "period": {"start": str(today - timedelta(days=30)), "end": str(today)},
+        },
+        "top_categories": top,
+        "trends": {
+            "expenses": {"current": 87654.32, "previous": 80000.0, "change_percent": 9.6},
+            "income": {"current": 120000.0, "previous": 118000.0, "change_percent": 1.7},
+            "projection": {"estimated_total": 95000.0, "days_left": 11},
+        },
+        "patterns": {"weekday_patterns": []},
+        "budget": {"has_budget": True, "budget_amount": 100000.0, "spent": 87654.32,
+                   "remaining": 12345.68, "percentage_used": 87.7, "month": today.strftime("%Y-%m")},
+        "exchange_rates": [
+            {"from_currency": c, "to_currency": "KGS", "rate": rng.uniform(0.9, 100), "date": str(today)}
+            for c in ("USD", "EUR", "RUB", "KZT", "CNY")
+        ],
+        "recent_transactions": {
+            "expenses": [_transaction(rng, i, "expense", today) for i in range(rows // 2)],
+            "income": [_transaction(rng, i, "income", today) for i in range(rows // 2)],
+        },
+    }
+
+
+def transactions_payload(rng: random.Random, rows: int) -> Dict[str, Any]:
+    today = date.today()
+    return {
+        "items": [_transaction(rng, i, rng.choice(("expense", "income")), today) for i in range(rows)],
+        "total": rows * 20,
+        "page": 1,
+        "page_size": rows,
+        "has_next": True,
+        "has_prev": False,
+    }
+
+
+def summary_rows(rng: random.Random, categories: int) -> List[list]:
+    return [
+        [name, rng.randint(1, 80), round(rng.uniform(500, 50000), 2), round(rng.uniform(50, 3000), 2), "KGS"]
+        for name in CATEGORIES[:categories]
+    ]
+
+
+def encode_csv(rows: List[list]) -> bytes:
+    """Как export_csv: BOM, ';', QUOTE_MINIMAL"""
+    output = io.StringIO()
+    writer = csv.writer(output, delimiter=";", quoting=csv.QUOTE_MINIMAL)
+    output.write("\ufeff")
+    writer.writerow(["Категория", "Количество", "Всего", "Среднее", "Валюта"])
+    writer.writerows(rows)
+    return output.getvalue().encode("utf-8")
+
+
+def encoders(serialization) -> Dict[str, Callable[[Any], bytes]]:
+    def stdlib(data: Any) -> bytes:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    result = {"stdlib": stdlib, "fast": serialization.dumps}
+    try:
+        from fastapi.encoders import jsonable_encoder
+    except ImportError:
+        return result
+
+    def fastapi(data: Any) -> bytes:
+        return stdlib(jsonable_encoder(data))
+
+    return {"fastapi": fastapi, **result}
+
+
+def measure(func: Callable[[], Any], repeat: int, number: int) -> float:
+    """Лучшее время одного вызова, мкс"""
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare encode time of API payloads")
+    parser.add_argument("--rows", type=int, default=50, help="Transactions per payload")
+    parser.add_argument("--categories", type=int, default=10, help="Categories in summary/top lists")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    serialization = load_serialization()
+    rng = random.Random(args.seed)
+    categories = min(args.categories, len(CATEGORIES))
+
+    payloads = {
+        "/analytics/batch": batch_payload(rng, args.rows, categories),
+        "/transactions": transactions_payload(rng, args.rows),
+        "/export/summary": summary_rows(rng, categories),
+    }
+    available = encoders(serialization)
+
+    results: List[Dict[str, Any]] = []
+    for endpoint, data in payloads.items():
+        candidates = dict(available)
+        if endpoint == "/export/summary":
+            candidates["csv"] = encode_csv
+        for name, encode in candidates.items():
+            size = len(encode(data))
+            micros = measure(lambda: encode(data), args.repeat, args.number)
+            results.append({"endpoint": endpoint, "encoder": name, "us": round(micros, 1), "bytes": size})
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return 0
+
+    backend = "orjson" if serialization.orjson is not None else "stdlib json (orjson not installed)"
+    print(f"fast encoder: {backend}")
+    print(f"{'endpoint':<20} {'encoder':<8} {'us/op':>10} {'bytes':>8} {'speedup':>8}")
+    for endpoint in payloads:
+        rows = [r for r in results if r["endpoint"] == endpoint]
+        reference = next((r["us"] for r in rows if r["encoder"] == "fastapi"), rows[0]["us"])
+        for r in rows:
+            speedup = reference / r["us"] if r["us"] else 0.0
+            print(f"{endpoint:<20} {r['encoder']:<8} {r['us']:>10.1f} {r['bytes']:>8} {speedup:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
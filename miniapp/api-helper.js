@@ -187,6 +187,18 @@ class APIHelper {
         return this.get('/transactions', params);
     }
 
+    // ===== SYNC =====
+
+    /**
+     * Изменения после курсора: { cursor, full, has_more, changes }
+     * Без since — полный снимок. cursor из ответа передаётся в следующий вызов
+     */
+    async getChanges(since = null, limit = 500) {
+        const params = { limit };
+        if (since) params.since = since;
+        return this.get('/sync', params);
+    }
+
     // ===== EXPENSES =====
     
     async getExpenses(params = {}) {